@@ -1,11 +1,16 @@
+import numpy as np
 import torch
 from qiskit import QuantumCircuit, execute, Aer
 from torch.quantization import quantize_dynamic
 
+SEED_BITS = 128
+ROUND_CHUNK = 1 << 22
+
 class ModelQuantizer:
     def __init__(self, model_path: str):
         self.model = torch.jit.load(model_path)
         self.quantum_rng = Aer.get_backend('qasm_simulator')
+        self._rng = None
         
     def hybrid_quantize(self) -> torch.jit.ScriptModule:
         """动态量化与量子感知训练补偿"""
@@ -24,20 +29,31 @@ class ModelQuantizer:
                     
         return quantized_model
     
-    def _quantum_aware_round(self, tensor: torch.Tensor) -> torch.Tensor:
-        """量子随机舍入算法"""
-        qc = QuantumCircuit(1)
+    def _quantum_seed(self) -> int:
+        """一次多shot量子作业生成 SEED_BITS 位种子"""
+        qc = QuantumCircuit(1, 1)
         qc.h(0)
-        
-        rounded = torch.zeros_like(tensor)
-        for idx in torch.ndindex(tensor.size()):
-            result = execute(qc, self.quantum_rng, shots=1).result()
-            if result.get_counts().get('0', 0) == 1:
-                rounded[idx] = torch.floor(tensor[idx])
-            else:
-                rounded[idx] = torch.ceil(tensor[idx])
-                
-        return rounded
+        qc.measure(0, 0)
+        result = execute(qc, self.quantum_rng, shots=SEED_BITS, memory=True).result()
+        return int(''.join(result.get_memory()), 2)
+
+    def _uniform(self, count: int) -> np.ndarray:
+        """量子种子的计数器型PRNG (Philox)，按块批量生成 [0, 1) 均匀数"""
+        if self._rng is None:
+            self._rng = np.random.Generator(np.random.Philox(key=self._quantum_seed()))
+        return self._rng.random(count, dtype=np.float32)
+
+    def _quantum_aware_round(self, tensor: torch.Tensor) -> torch.Tensor:
+        """量子随机舍入算法: floor(x + u)，以小数部分为概率向上取整(无偏)，按块向量化"""
+        flat = tensor.detach().reshape(-1)
+        rounded = torch.empty_like(flat)
+        # fp16/bf16 下 x + u 会被重新舍入而引入偏差，噪声相加与取整在 float32 (或更高) 中完成再转回
+        work_dtype = torch.promote_types(flat.dtype, torch.float32)
+        for start in range(0, flat.numel(), ROUND_CHUNK):
+            stop = min(start + ROUND_CHUNK, flat.numel())
+            noise = torch.from_numpy(self._uniform(stop - start)).to(device=flat.device, dtype=work_dtype)
+            rounded[start:stop] = torch.floor(flat[start:stop].to(work_dtype) + noise)
+        return rounded.view_as(tensor)
 
     def export_quantized_model(self, output_path: str):
         """导出量化模型"""
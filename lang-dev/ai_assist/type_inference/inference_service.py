@@ -1,23 +1,97 @@
-import onnxruntime as ort
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from phase4.ai.session_factory import get_session
 from quantum_integration import QuantumFeatureExtractor
 
+TYPE_LABELS = np.array(['dynamic', 'static', 'generic'])
+
+def snippet_key(code_snippet):
+    """统一换行符后的代码片段哈希(空白可能影响语义，其余内容原样保留)"""
+    normalized = code_snippet.replace('\r\n', '\n').replace('\r', '\n')
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
 class TypeInferenceEngine:
-    def __init__(self):
-        self.session = ort.InferenceSession("model.onnx")
+    def __init__(self, model_path="model.onnx", warmup_runs=1, cache_size=8192,
+                 max_batch_size=256, workers=None):
+        self.session = get_session(model_path, warmup_runs=warmup_runs)
         self.qfe = QuantumFeatureExtractor()
-        
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
     def infer_type(self, code_snippet):
-        quantum_features = self.qfe.extract(code_snippet)
-        ast_features = parse_ast(code_snippet)
-        
-        inputs = {
-            'quantum_input': quantum_features,
-            'ast_input': ast_features
-        }
-        
-        outputs = self.session.run(None, inputs)
-        return decode_predictions(outputs[0])
+        return self.infer_types([code_snippet])[0]
+
+    def infer_types(self, snippets):
+        """批量推断: 缓存命中的片段直接返回，其余去重后并行提取特征，
+        按 max_batch_size 分批各跑一次会话(模型 batch 维是动态的)。"""
+        keys = [snippet_key(s) for s in snippets]
+        results = [None] * len(snippets)
+        pending = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                elif key not in pending:
+                    pending[key] = snippets[i]
+
+        if pending:
+            miss_keys = list(pending)
+            features = list(self._pool().map(self._features, pending.values())) \
+                if len(pending) > 1 else [self._features(next(iter(pending.values())))]
+            labels = []
+            for start in range(0, len(features), self.max_batch_size):
+                chunk = features[start:start + self.max_batch_size]
+                inputs = {
+                    'quantum_input': np.stack([q for q, _ in chunk]),
+                    'ast_input': np.stack([a for _, a in chunk]),
+                }
+                outputs = self.session.run(None, inputs)
+                labels.extend(decode_batch(outputs[0]))
+            predicted = dict(zip(miss_keys, labels))
+            with self._lock:
+                for key, label in predicted.items():
+                    self._cache[key] = label
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for i, key in enumerate(keys):
+                if results[i] is None:
+                    results[i] = predicted[key]
+        return results
+
+    def _features(self, code_snippet):
+        """单个片段的 (量子特征, AST 特征)，保持 extract/parse_ast 返回的形状，批处理时只加 batch 维"""
+        quantum_features = np.asarray(self.qfe.extract(code_snippet), dtype=np.float32)
+        ast_features = np.asarray(parse_ast(code_snippet), dtype=np.float32)
+        return quantum_features, ast_features
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='type-features')
+            return self._executor
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
 def decode_predictions(tensor):
-    type_labels = ['dynamic', 'static', 'generic']
-    return type_labels[tensor.argmax()]
+    return TYPE_LABELS[np.asarray(tensor).argmax()].item()
+
+def decode_batch(logits):
+    """逐行 argmax 一次完成整批解码"""
+    return TYPE_LABELS[np.asarray(logits).argmax(axis=1)].tolist()
@@ -2,7 +2,7 @@ import numpy as np
 from numba import njit, prange
 import cpuinfo
 
-@njit(parallel=True, fastmath=True)
+@njit(parallel=True, fastmath=True, cache=True)
 def simd_amplitude_estimation(state_vector: np.ndarray, 
                              oracle: np.ndarray,
                              iterations: int):
@@ -26,7 +26,7 @@ class HardwareAwareScheduler:
         else:
             return "BASIC_SIMULATOR"
 
-@njit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def avx2_state_initialization(qubits: int):
     state = np.zeros(2**qubits, dtype=np.complex128)
     state[0] = 1.0
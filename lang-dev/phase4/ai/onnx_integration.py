@@ -1,20 +1,216 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 import onnxruntime as ort
 import numpy as np
+from .session_factory import get_session
+
+ORT_DTYPES = {
+    'tensor(float)': np.float32, 'tensor(double)': np.float64, 'tensor(float16)': np.float16,
+    'tensor(int64)': np.int64, 'tensor(int32)': np.int32, 'tensor(int8)': np.int8, 'tensor(uint8)': np.uint8,
+}
+
+def default_thread_counts(cores=None):
+    """intra-op 用满物理核心，inter-op 只在并行执行模式下生效，取核心数的四分之一"""
+    cores = cores or os.cpu_count() or 1
+    return cores, max(1, cores // 4)
 
 class QuantumAIModel:
-    def __init__(self, model_path):
-        self.session = ort.InferenceSession(model_path)
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None, warmup_runs=0):
+        intra, inter = default_thread_counts()
+        # 同进程内相同模型与选项共享一个会话，优化后的图缓存在磁盘上
+        self.session = get_session(model_path,
+                                   intra_op_threads=intra_op_threads or intra,
+                                   inter_op_threads=inter_op_threads or inter,
+                                   warmup_runs=warmup_runs)
         self.io_binding = self.session.io_binding()
-    
+        self._lock = threading.Lock()
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+        self.input_dtype = ORT_DTYPES.get(model_input.type, np.float32)
+        self.output_dtype = ORT_DTYPES.get(model_output.type, np.float32)
+        # 除 batch 维外的形状；含符号维度时为 None
+        self.input_sample_shape = self._static_shape(model_input.shape)
+        self.output_sample_shape = self._static_shape(model_output.shape)
+
+    @staticmethod
+    def _static_shape(shape):
+        dims = shape[1:]
+        return tuple(dims) if all(isinstance(d, int) for d in dims) else None
+
     def infer(self, tensor_input: np.ndarray):
         """执行量子增强的模型推理"""
-        self.io_binding.bind_cpu_input('input', tensor_input)
-        self.io_binding.bind_output('output')
-        self.session.run_with_iobinding(self.io_binding)
-        return self.io_binding.copy_outputs_to_cpu()[0]
+        with self._lock:
+            self.io_binding.bind_cpu_input(self.input_name, tensor_input)
+            self.io_binding.bind_output(self.output_name)
+            self.session.run_with_iobinding(self.io_binding)
+            return self.io_binding.copy_outputs_to_cpu()[0]
+
+    def infer_into(self, inputs: np.ndarray, outputs: np.ndarray = None):
+        """用调用方预分配的连续缓冲区运行一个批次(经 IO binding 直接读写，无额外拷贝)
+
+        ``outputs`` 为空时由 ORT 分配输出并拷回。
+        """
+        with self._lock:
+            binding = self.io_binding
+            binding.clear_binding_inputs()
+            binding.clear_binding_outputs()
+            binding.bind_input(self.input_name, 'cpu', 0, inputs.dtype, list(inputs.shape),
+                               inputs.ctypes.data)
+            if outputs is None:
+                binding.bind_output(self.output_name)
+                self.session.run_with_iobinding(binding)
+                return binding.copy_outputs_to_cpu()[0]
+            binding.bind_output(self.output_name, 'cpu', 0, outputs.dtype, list(outputs.shape),
+                                outputs.ctypes.data)
+            self.session.run_with_iobinding(binding)
+            return outputs
 
     @staticmethod
     def quantize_model(model_path):
         """模型量子化压缩"""
         from onnxruntime.quantization import quantize_dynamic
         quantize_dynamic(model_path, model_path.replace('.onnx', '_quant.onnx'))
+
+class MicroBatchServer:
+    """动态微批处理: 并发请求按 max_batch_size / max_wait_ms 合批，结果经 Future 返回
+
+    每个请求是一个样本(形状为模型输入去掉 batch 维)或带 batch 维的小批次；
+    模型输入含符号维度且未给出 sample_shape 时无法区分两者，须用 ``batched`` 显式说明。
+    一个批次内按样本形状分组分别执行，形状不同的请求互不影响；
+    输入/输出缓冲区按 (样本形状, max_batch_size) 预分配并在各批次间复用。
+    """
+
+    # 最多保留几种样本形状的缓冲区
+    MAX_BUFFER_SHAPES = 4
+
+    def __init__(self, model: QuantumAIModel, max_batch_size=32, max_wait_ms=2.0, sample_shape=None):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.sample_shape = tuple(sample_shape) if sample_shape is not None else model.input_sample_shape
+        self._buffer_cache = OrderedDict()
+        self._requests = queue.Queue()
+        self._stop = threading.Event()
+        # submit 的 "检查已关闭 + 入队" 与 close 的 "置位 + 放入哨兵" 互斥，哨兵之后不会再有请求
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='micro-batch', daemon=True)
+        self._worker.start()
+
+    def _buffers(self, sample_shape):
+        """某一样本形状的 (输入, 输出) 缓冲区；仅由工作线程调用"""
+        buffers = self._buffer_cache.get(sample_shape)
+        if buffers is None:
+            inputs = np.empty((self.max_batch_size,) + sample_shape, dtype=self.model.input_dtype)
+            out_shape = self.model.output_sample_shape
+            outputs = None if out_shape is None else \
+                np.empty((self.max_batch_size,) + out_shape, dtype=self.model.output_dtype)
+            buffers = self._buffer_cache[sample_shape] = (inputs, outputs)
+            if len(self._buffer_cache) > self.MAX_BUFFER_SHAPES:
+                self._buffer_cache.popitem(last=False)
+        self._buffer_cache.move_to_end(sample_shape)
+        return buffers
+
+    def submit(self, tensor_input, batched=None) -> Future:
+        """提交一个请求；``batched`` 指明第 0 维是否为 batch 维
+
+        样本形状已知时可省略(按形状判断，不匹配则 ValueError)；
+        模型输入含符号维度时必须显式给出。
+        """
+        tensor_input = np.asarray(tensor_input, dtype=self.model.input_dtype)
+        if self.sample_shape is not None:
+            if tensor_input.shape == self.sample_shape and batched is not True:
+                batched = False
+            elif tensor_input.shape[1:] == self.sample_shape and batched is not False:
+                batched = True
+            else:
+                raise ValueError(f"Input shape {tensor_input.shape} does not match sample shape "
+                                 f"{self.sample_shape}" + ("" if batched is None else f" (batched={batched})"))
+        elif batched is None:
+            raise ValueError("Model input has symbolic dimensions; pass batched=True or batched=False")
+        single = not batched
+        if single:
+            tensor_input = tensor_input[np.newaxis]
+        if tensor_input.ndim == 0 or len(tensor_input) == 0:
+            raise ValueError("Request batch is empty")
+        if len(tensor_input) > self.max_batch_size:
+            raise ValueError(f"Request batch {len(tensor_input)} exceeds max_batch_size {self.max_batch_size}")
+        future = Future()
+        with self._submit_lock:
+            if self._stop.is_set():
+                raise RuntimeError("MicroBatchServer is closed")
+            self._requests.put((tensor_input, single, future))
+        return future
+
+    def infer(self, tensor_input, timeout=None, batched=None):
+        return self.submit(tensor_input, batched).result(timeout)
+
+    def _collect(self, carry):
+        """阻塞等待第一个请求，然后在 max_wait 内尽量凑满一个批次；放不下的请求顺延到下一批"""
+        first = carry if carry is not None else self._requests.get()
+        if first is None:
+            return None, None
+        batch, size = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._requests.put(None)
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                return batch, item
+            batch.append(item)
+            size += len(item[0])
+        return batch, None
+
+    def _run(self):
+        carry = None
+        while True:
+            batch, carry = self._collect(carry)
+            if batch is None:
+                break
+            self._execute(batch)
+
+    def _execute(self, batch):
+        live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        groups = OrderedDict()
+        for item in live:
+            groups.setdefault(item[0].shape[1:], []).append(item)
+        for sample_shape, group in groups.items():
+            self._execute_group(sample_shape, group)
+
+    def _execute_group(self, sample_shape, live):
+        """运行同一样本形状的请求；失败只影响本组"""
+        try:
+            inputs, outputs = self._buffers(sample_shape)
+            offset = 0
+            for tensor_input, _, _ in live:
+                inputs[offset:offset + len(tensor_input)] = tensor_input
+                offset += len(tensor_input)
+            result = self.model.infer_into(inputs[:offset], None if outputs is None else outputs[:offset])
+            offset = 0
+            for tensor_input, single, future in live:
+                part = result[offset:offset + len(tensor_input)]
+                offset += len(tensor_input)
+                # 输出缓冲区会被下一批复用，返回副本
+                future.set_result(part[0].copy() if single else part.copy())
+        except Exception as e:
+            for _, _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+
+    def close(self):
+        with self._submit_lock:
+            if not self._stop.is_set():
+                self._stop.set()
+                self._requests.put(None)
+        self._worker.join()
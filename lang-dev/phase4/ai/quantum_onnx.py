@@ -1,18 +1,56 @@
+import os
+import threading
 from qiskit import QuantumCircuit
 from qiskit.circuit.library import QuantumConvolution
-import onnxruntime
+from qiskit.quantum_info import Operator
+import onnx
 import numpy as np
-from typing import Dict, Any
-from math.simd import vectorize
-from scipy.linalg.blas import sgemm
-from intel_extension_for_pytorch import optimize
+from typing import Dict, Any, Tuple, List, Optional
+from .session_factory import CACHE_DIR, get_session, model_digest
+
+QUANTUM_DOMAIN = 'quantum'
+
+# (op_type, qubits, depth) -> 编译好的门和酉矩阵，所有节点与内核实例共享
+_GATE_CACHE: Dict[Tuple[str, int, int], Tuple[Any, np.ndarray]] = {}
+_GATE_CACHE_LOCK = threading.Lock()
+
+def _conv_circuit(qubits: int, depth: int) -> QuantumCircuit:
+    qc = QuantumCircuit(qubits)
+    for _ in range(depth):
+        qc.append(QuantumConvolution(qubits), range(qubits))
+        qc.barrier()
+    return qc
+
+_CIRCUIT_BUILDERS = {'QuantumConv': _conv_circuit}
+
+def compiled_gate(op_type: str, qubits: int, depth: int) -> Tuple[Any, np.ndarray]:
+    """按 (op_type, qubits, depth) 缓存门及其酉矩阵(complex64)"""
+    key = (op_type, qubits, depth)
+    with _GATE_CACHE_LOCK:
+        entry = _GATE_CACHE.get(key)
+    if entry is None:
+        builder = _CIRCUIT_BUILDERS.get(op_type)
+        if builder is None:
+            raise NotImplementedError(f"Operation {op_type} not supported")
+        qc = builder(qubits, depth)
+        entry = (qc.to_gate(label=op_type), Operator(qc).data.astype(np.complex64))
+        with _GATE_CACHE_LOCK:
+            entry = _GATE_CACHE.setdefault(key, entry)
+    return entry
+
+def z_expectation_matrix(qubits: int) -> np.ndarray:
+    """(2^q, q) 矩阵，第 k 行为基态 k 上各比特的 <Z> 本征值(小端序)"""
+    basis = np.arange(1 << qubits)[:, None]
+    bits = (basis >> np.arange(qubits)[None, :]) & 1
+    return (1 - 2 * bits).astype(np.float32)
 
 class QuantumOpKernel:
     def __init__(self, provider: str = 'qiskit'):
         self.provider = provider
         self.backend = self._init_backend(provider)
         self.compiled_gates: Dict[str, Any] = {}
-    
+        self.node_keys: Dict[str, Tuple[str, int, int]] = {}
+
     def _init_backend(self, provider):
         if provider == 'qiskit':
             from qiskit import Aer
@@ -20,50 +58,126 @@ class QuantumOpKernel:
         raise ValueError(f"Unsupported provider: {provider}")
 
     def bind(self, node_proto):
-        if node_proto.op_type == "QuantumConv":
-            return self._compile_qiskit_conv(node_proto)
-        elif node_proto.op_type == "QuantumPool":
-            return self._compile_qiskit_pool(node_proto)
-        raise NotImplementedError(f"Operation {node_proto.op_type} not supported")
-
-    def _compile_qiskit_conv(self, node_proto):
-        qubits = node_proto.attribute[0].i
-        depth = node_proto.attribute[1].i if len(node_proto.attribute) > 1 else 3
-        
-        qc = QuantumCircuit(qubits)
-        for _ in range(depth):
-            qc.append(QuantumConvolution(qubits), range(qubits))
-            qc.barrier()
-        
-        gate = qc.to_gate(label="QuantumConv")
+        if node_proto.op_type in _CIRCUIT_BUILDERS:
+            return self._compile_qiskit(node_proto)
+        raise NotImplementedError(f"Quantum operation {node_proto.op_type} not supported; "
+                                  f"available: {', '.join(sorted(_CIRCUIT_BUILDERS))}")
+
+    def _compile_qiskit(self, node_proto):
+        # 按名字取属性(onnx.helper.make_node 会按名字排序)，无名字时按位置
+        attrs = {attr.name: attr.i for attr in node_proto.attribute}
+        qubits = attrs.get('qubits', node_proto.attribute[0].i)
+        depth = attrs.get('depth', node_proto.attribute[1].i if len(node_proto.attribute) > 1 else 3)
+        key = (node_proto.op_type, qubits, depth)
+        gate, _ = compiled_gate(*key)
+        self.node_keys[node_proto.name] = key
         self.compiled_gates[node_proto.name] = gate
         return gate
 
-    @vectorize(backend='avx512')
-    def _postprocess(self, statevector: np.ndarray) -> np.ndarray:
-        real_part = np.array(statevector.real, dtype=np.float32)
-        imag_part = np.array(statevector.imag, dtype=np.float32)
-        return sgemm(alpha=1.0, a=real_part, b=imag_part, trans_b=True)
+    def execute(self, name: str, batch: np.ndarray) -> np.ndarray:
+        """整批执行: 振幅编码为 (B, 2^q) 态矢量，一次矩阵乘演化，再批量归约为各比特 <Z>"""
+        if name not in self.node_keys:
+            raise KeyError(f"Quantum node {name} has not been bound")
+        op_type, qubits, depth = self.node_keys[name]
+        _, unitary = compiled_gate(op_type, qubits, depth)
+        states = self._encode(np.asarray(batch), qubits)
+        evolved = states @ unitary.T
+        return self._postprocess(evolved, qubits)
+
+    @staticmethod
+    def _encode(batch: np.ndarray, qubits: int) -> np.ndarray:
+        """每个样本展平、补零到 2^q 并归一化；全零样本映射到 |0...0>，特征数超过 2^q 时报错"""
+        dim = 1 << qubits
+        flat = batch.reshape(len(batch), -1)
+        if flat.shape[1] > dim:
+            raise ValueError(f"{flat.shape[1]} features do not fit the {dim} amplitudes of {qubits} qubits")
+        states = np.zeros((len(batch), dim), dtype=np.complex64)
+        states[:, :flat.shape[1]] = flat
+        norms = np.linalg.norm(states, axis=1)
+        empty = norms == 0
+        states[empty, 0] = 1
+        norms[empty] = 1
+        states /= norms[:, None]
+        return states
+
+    @staticmethod
+    def _postprocess(statevectors: np.ndarray, qubits: int) -> np.ndarray:
+        probabilities = statevectors.real ** 2 + statevectors.imag ** 2
+        return probabilities @ z_expectation_matrix(qubits)
+
+def classical_model(model: onnx.ModelProto, quantum_nodes: List[onnx.NodeProto],
+                    output_widths: Dict[str, int]) -> onnx.ModelProto:
+    """去掉量子节点后的纯经典图: 量子节点输出变为图输入，只被量子节点消费的图输入被删除"""
+    classical = onnx.ModelProto()
+    classical.CopyFrom(model)
+    graph = classical.graph
+    kept = [node for node in graph.node if node.domain != QUANTUM_DOMAIN]
+    used = {name for node in kept for name in node.input} | {out.name for out in graph.output}
+    graph_inputs = [value for value in graph.input if value.name in used]
+    for node in quantum_nodes:
+        graph_inputs.append(onnx.helper.make_tensor_value_info(
+            node.output[0], onnx.TensorProto.FLOAT, [None, output_widths[node.name]]))
+    del graph.node[:]
+    graph.node.extend(kept)
+    del graph.input[:]
+    graph.input.extend(graph_inputs)
+    opsets = [opset for opset in classical.opset_import if opset.domain != QUANTUM_DOMAIN]
+    del classical.opset_import[:]
+    classical.opset_import.extend(opsets)
+    return classical
 
 class QuantumONNXRuntime:
-    def __init__(self, model_path: str):
-        optimize()  # Intel MKL优化
-        self.session = onnxruntime.InferenceSession(
-            model_path,
-            providers=['QuantumExecutionProvider'],
-            provider_options=[{'device_type': 'GPU'}]
+    """量子域节点由共享的 QuantumOpKernel 整批执行，其余部分交给 ORT 会话
+
+    量子节点的输入须是图输入或前一个量子节点的输出；其输出作为经典图的输入喂给会话。
+    """
+
+    def __init__(self, model_path: str, warmup_runs: int = 0,
+                 providers: Optional[List[str]] = None,
+                 provider_options: Optional[List[Dict[str, Any]]] = None):
+        model = onnx.load(model_path)
+        graph_inputs = {value.name for value in model.graph.input}
+        # 所有量子节点共享一个内核，编译结果经 _GATE_CACHE 共享
+        self.kernel = QuantumOpKernel()
+        self.quantum_nodes: List[onnx.NodeProto] = []
+        for node in model.graph.node:
+            if node.domain != QUANTUM_DOMAIN:
+                continue
+            if not node.name or node.name in self.kernel.node_keys:
+                raise ValueError(f"Quantum nodes need unique names: {node.op_type} {node.name!r}")
+            if node.input[0] not in graph_inputs:
+                raise NotImplementedError(
+                    f"Quantum node {node.name} must consume a graph input or another quantum node's output")
+            self.kernel.bind(node)
+            self.quantum_nodes.append(node)
+            graph_inputs.add(node.output[0])
+        widths = {name: key[1] for name, key in self.kernel.node_keys.items()}
+        self.session = get_session(
+            self._classical_path(model_path, model, widths),
+            providers=providers,
+            provider_options=provider_options,
+            warmup_runs=warmup_runs
         )
-        self.quantum_kernels = {
-            node.name: QuantumOpKernel() 
-            for node in self.session.get_modelmeta().custom_metadata 
-            if node.domain == 'quantum'
-        }
-
-    def infer(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
-        for name, kernel in self.quantum_kernels.items():
-            inputs[name] = kernel.execute(name, inputs[name])
-        
+        self.input_names = [value.name for value in self.session.get_inputs()]
+
+    def _classical_path(self, model_path: str, model: onnx.ModelProto, widths: Dict[str, int]) -> str:
+        """纯经典图按模型内容哈希落盘在会话缓存目录，没有量子节点时直接用原模型"""
+        if not self.quantum_nodes:
+            return model_path
+        path = os.path.join(CACHE_DIR, f"{model_digest(model_path)}-classical.onnx")
+        if not os.path.exists(path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            onnx.save(classical_model(model, self.quantum_nodes, widths), tmp_path)
+            os.replace(tmp_path, path)
+        return path
+
+    def infer(self, inputs: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        """量子节点按图中顺序整批执行，其输出与其余输入一起喂给经典会话"""
+        feed = dict(inputs)
+        for node in self.quantum_nodes:
+            feed[node.output[0]] = self.kernel.execute(node.name, feed[node.input[0]])
         return self.session.run(
             output_names=None,
-            inputs=inputs
+            input_feed={name: feed[name] for name in self.input_names}
         )
@@ -0,0 +1,173 @@
+"""
+Shared ONNX Runtime session factory.
+
+The first load of a model serialises ORT's graph-optimised form to
+``QC_ONNX_CACHE`` (default ``~/.cache/quantum-compiler/onnx``), keyed by the
+model's content hash, the session options and the host CPU's instruction-set
+flags (ORT_ENABLE_ALL bakes ISA-specific kernels into the graph); later
+processes load that artifact with graph optimisation disabled. Sessions are
+additionally cached per process, so every component asking for the same model
+and options shares one session (``InferenceSession.run`` is thread-safe).
+Sessions for different models are created concurrently.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import contextlib
+import logging
+import platform
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import onnxruntime as ort
+
+CACHE_DIR = os.environ.get('QC_ONNX_CACHE', os.path.join(
+    os.path.expanduser('~'), '.cache', 'quantum-compiler', 'onnx'))
+READ_SIZE = 1 << 20
+
+OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+_NUMPY_TYPES = {
+    'tensor(float)': np.float32, 'tensor(double)': np.float64, 'tensor(float16)': np.float16,
+    'tensor(int64)': np.int64, 'tensor(int32)': np.int32, 'tensor(int8)': np.int8,
+    'tensor(uint8)': np.uint8, 'tensor(bool)': np.bool_,
+}
+
+logger = logging.getLogger('SessionFactory')
+
+_sessions: Dict[Tuple[str, str, str], ort.InferenceSession] = {}
+_digests: Dict[Tuple[str, int, int], str] = {}
+_lock = threading.Lock()
+# One lock per session key being created, so creation does not hold _lock
+_creating: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+def model_digest(model_path: str) -> str:
+    """Content hash of the model file, memoised on (path, mtime, size)"""
+    st = os.stat(model_path)
+    stamp = (os.path.abspath(model_path), st.st_mtime_ns, st.st_size)
+    digest = _digests.get(stamp)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(model_path, 'rb') as f:
+            while chunk := f.read(READ_SIZE):
+                h.update(chunk)
+        digest = _digests[stamp] = h.hexdigest()
+    return digest
+
+@lru_cache(maxsize=1)
+def cpu_features() -> str:
+    """Hash of the CPU's ISA flags (e.g. avx512/amx/neon); ``platform.processor()`` if unavailable"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith(('flags', 'Features')):
+                    flags = ' '.join(sorted(line.split(':', 1)[1].split()))
+                    return hashlib.blake2b(flags.encode(), digest_size=8).hexdigest()
+    except OSError:
+        pass
+    return platform.processor()
+
+def _options_key(providers, provider_options, level) -> str:
+    """Options that change the optimised graph (thread counts do not)"""
+    options = {
+        'providers': providers, 'provider_options': provider_options, 'level': level,
+        # Optimised graphs can contain layout- and ISA-specific kernels
+        'machine': platform.machine(), 'cpu': cpu_features(), 'ort': ort.__version__,
+    }
+    return hashlib.blake2b(json.dumps(options, sort_keys=True, default=str).encode(),
+                           digest_size=8).hexdigest()
+
+def optimized_model_path(model_path: str, options_key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{model_digest(model_path)}-{options_key}.onnx")
+
+def get_session(model_path: str, providers: Optional[List[str]] = None,
+                provider_options: Optional[List[Dict[str, Any]]] = None,
+                intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                optimization: str = 'all', warmup_runs: int = 0) -> ort.InferenceSession:
+    """Process-wide cached session; loads or writes the optimised model artifact"""
+    if optimization not in OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown optimization level: {optimization}")
+    options_key = _options_key(providers, provider_options, optimization)
+    key = (os.path.abspath(model_path), model_digest(model_path),
+           f"{options_key}:{intra_op_threads}:{inter_op_threads}")
+    with _lock:
+        session = _sessions.get(key)
+        if session is not None:
+            return session
+        creating = _creating.setdefault(key, threading.Lock())
+    # Only callers asking for this same key wait for the build
+    with creating:
+        with _lock:
+            session = _sessions.get(key)
+        if session is None:
+            session = _create_session(model_path, options_key, providers, provider_options,
+                                      intra_op_threads, inter_op_threads, optimization)
+            if warmup_runs:
+                warm_up(session, warmup_runs)
+            with _lock:
+                _sessions[key] = session
+                _creating.pop(key, None)
+    return session
+
+def _create_session(model_path, options_key, providers, provider_options, intra, inter, optimization):
+    options = ort.SessionOptions()
+    if intra:
+        options.intra_op_num_threads = intra
+    if inter:
+        options.inter_op_num_threads = inter
+    kwargs = {'sess_options': options}
+    if providers is not None:
+        kwargs['providers'] = providers
+    if provider_options is not None:
+        kwargs['provider_options'] = provider_options
+
+    cached = optimized_model_path(model_path, options_key)
+    if optimization != 'disable' and os.path.exists(cached):
+        options.graph_optimization_level = OPTIMIZATION_LEVELS['disable']
+        try:
+            return ort.InferenceSession(cached, **kwargs)
+        except Exception as e:
+            logger.warning("Discarding unusable optimized model %s: %s", cached, e)
+            # Another process may have discarded it already
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(cached)
+
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[optimization]
+    if optimization == 'disable':
+        return ort.InferenceSession(model_path, **kwargs)
+    # ORT writes the optimised graph to a unique temp file (threads of one process can build
+    # the same artifact with different thread counts); readers only ever see a complete file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cached) + '.', suffix='.tmp', dir=CACHE_DIR)
+    os.close(fd)
+    options.optimized_model_filepath = tmp_path
+    try:
+        session = ort.InferenceSession(model_path, **kwargs)
+        if os.path.getsize(tmp_path):
+            os.replace(tmp_path, cached)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+    return session
+
+def warm_up(session: ort.InferenceSession, runs: int = 1,
+            inputs: Optional[Dict[str, np.ndarray]] = None) -> None:
+    """Run the session on zero inputs (symbolic dims set to 1) to trigger lazy allocations"""
+    if inputs is None:
+        inputs = {}
+        for meta in session.get_inputs():
+            shape = [d if isinstance(d, int) and d > 0 else 1 for d in meta.shape]
+            inputs[meta.name] = np.zeros(shape, dtype=_NUMPY_TYPES.get(meta.type, np.float32))
+    for _ in range(runs):
+        session.run(None, inputs)
+
+def clear_sessions() -> None:
+    with _lock:
+        _sessions.clear()
@@ -1,8 +1,9 @@
 import numpy as np
-from numba import njit, prange
+from numba import prange
+from .simd.kernel_registry import kernel
 import cpuinfo
 
-@njit(parallel=True, fastmath=True)
+@kernel(['(float32[:, :], float32[:, :])'])
 def amx_matmul(a: np.float32, b: np.float32) -> np.float32:
     """利用AMX指令进行矩阵乘法"""
     m, k = a.shape
@@ -0,0 +1,149 @@
+"""
+Numba kernel registry: runtime target selection and on-disk compilation cache.
+
+Kernels register with ``@kernel(signatures=[...])``. CPU kernels are
+compiled with ``cache=True`` into ``NUMBA_CACHE_DIR`` (default
+``~/.cache/quantum-compiler/numba``), so only the first process on a host
+pays for compilation; ``python -m phase4.math.simd.kernel_registry warmup``
+compiles every registered signature ahead of time.
+
+Target order: ``QC_KERNEL_TARGET`` if set, else ``cuda`` (vectorize kernels
+only, when a GPU is present), ``parallel`` on multi-core hosts, ``cpu``.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import importlib
+from typing import Dict, List, Optional, Sequence
+
+import numba
+import numpy as np
+from numba.core.sigutils import normalize_signature
+from numba.np.numpy_support import as_dtype
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'quantum-compiler', 'numba')
+# numba 在首次导入时读取 NUMBA_CACHE_DIR，内核模块可能先于本模块导入 numba，
+# 因此直接写 numba.config (缓存定位器在编译时才读取)；环境变量留给子进程
+if not numba.config.CACHE_DIR:
+    numba.config.CACHE_DIR = os.environ.setdefault('NUMBA_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+TARGETS = ('cuda', 'parallel', 'cpu')
+# Modules whose kernels the warm-up command compiles
+KERNEL_MODULES = (
+    'phase4.math.simd.simd_vector',
+    'phase4.math.tensor_ops',
+    'phase4.math.amx_ops',
+)
+
+logger = logging.getLogger('KernelRegistry')
+
+def _cuda_available() -> bool:
+    try:
+        from numba import cuda
+        return cuda.is_available()
+    except Exception:
+        return False
+
+def best_target(allow_cuda: bool = True) -> str:
+    forced = os.environ.get('QC_KERNEL_TARGET')
+    if forced:
+        if forced not in TARGETS:
+            raise ValueError(f"QC_KERNEL_TARGET must be one of {TARGETS}, got {forced!r}")
+        if forced != 'cuda' or allow_cuda:
+            return forced
+    if allow_cuda and _cuda_available():
+        return 'cuda'
+    return 'parallel' if (os.cpu_count() or 1) > 1 else 'cpu'
+
+class KernelRegistry:
+    def __init__(self):
+        self.kernels: Dict[str, dict] = {}
+
+    def register(self, signatures: Sequence[str] = (), kind: str = 'jit', parallel: bool = True,
+                 fastmath: bool = True, name: Optional[str] = None):
+        """Decorator compiling ``func`` for the best target with persistent caching
+
+        ``kind='jit'`` builds an njit dispatcher (``parallel`` is honoured only
+        when the selected target is ``parallel``); ``kind='vectorize'`` builds
+        a ufunc eagerly for ``signatures`` on ``cpu``/``parallel``/``cuda``.
+        """
+        def decorator(func):
+            key = name or f"{func.__module__}.{func.__qualname__}"
+            if kind == 'vectorize':
+                if not signatures:
+                    raise ValueError(f"Vectorize kernel {key} needs explicit signatures")
+                target = best_target(allow_cuda=True)
+                options = {'target': target}
+                if target != 'cuda':
+                    options['cache'] = True
+                compiled = numba.vectorize(list(signatures), **options)(func)
+            elif kind == 'jit':
+                target = best_target(allow_cuda=False)
+                compiled = numba.njit(parallel=parallel and target == 'parallel',
+                                      fastmath=fastmath, cache=True)(func)
+            else:
+                raise ValueError(f"Unknown kernel kind: {kind}")
+            self.kernels[key] = {'kernel': compiled, 'kind': kind, 'target': target,
+                                 'signatures': list(signatures)}
+            return compiled
+        return decorator
+
+    def warm_up(self, names: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """Compile (or load from the disk cache) every registered signature"""
+        timings = {}
+        for key in names or list(self.kernels):
+            entry = self.kernels[key]
+            start = time.perf_counter()
+            for signature in entry['signatures']:
+                if entry['kind'] == 'jit':
+                    entry['kernel'].compile(signature)
+                else:
+                    # ufunc 没有 compile()：按签名的输入类型调用一次，触发编译/缓存加载 (cuda 还会建立上下文)
+                    args, _ = normalize_signature(signature)
+                    entry['kernel'](*(np.zeros(1, dtype=as_dtype(arg)) for arg in args))
+            timings[key] = time.perf_counter() - start
+        return timings
+
+    def describe(self) -> List[str]:
+        return [f"{key} [{entry['kind']}, {entry['target']}] {len(entry['signatures'])} signatures"
+                for key, entry in sorted(self.kernels.items())]
+
+KERNELS = KernelRegistry()
+kernel = KERNELS.register
+
+def load_kernel_modules(modules: Sequence[str] = KERNEL_MODULES) -> List[str]:
+    """Import kernel modules so their kernels register; returns the ones that failed"""
+    failed = []
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning("跳过 %s: %s", module, e)
+            failed.append(module)
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Numba 内核注册表')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('warmup', help='预编译所有已注册内核并写入磁盘缓存')
+    sub.add_parser('list', help='列出已注册内核及其目标')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    failed = load_kernel_modules()
+    # 以 -m 运行时本文件是 __main__，内核注册在按包名导入的那份模块里
+    registry = importlib.import_module(__spec__.name if __spec__ else __name__).KERNELS
+    if args.command == 'list':
+        for line in registry.describe():
+            print(line)
+    else:
+        print(f"缓存目录: {numba.config.CACHE_DIR}")
+        for key, seconds in registry.warm_up().items():
+            print(f"{seconds:8.2f}s  {key}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,151 @@
 import numba
 import numpy as np
+from .kernel_registry import kernel
 
 class SIMDProcessor:
     @staticmethod
-    @numba.vectorize(['float32(complex64)'], target='avx1024')
+    @kernel(['float32(complex64)'], kind='vectorize')
     def avx1024_prob(x):
-        """AVX-1024加速的概率计算"""
+        """向量化概率计算(目标在运行时选择: cuda/parallel/cpu)"""
         return x.real**2 + x.imag**2
 
     @staticmethod
-    @numba.jit(nopython=True)
-    def quantize_block(data, bits=4):
-        """SIMD加速的量化函数"""
-        scale = 2**bits - 1
-        max_val = np.max(np.abs(data))
-        normalized = data / max_val
-        return np.round(normalized * scale) / scale * max_val
-
-def vectorize(backend='avx1024'):
-    """向量化装饰器工厂"""
+    def quantize_block(data, bits=4, block_size=32):
+        """SIMD加速的量化函数(按块缩放后反量化回浮点，用于误差评估)"""
+        return SIMDProcessor.quantize_blocks(data, bits, block_size).dequantize()
+
+    @staticmethod
+    def quantize_blocks(data, bits=4, block_size=32):
+        """真实的分块量化: 每块一个缩放因子，4/8 位值打包进 uint8"""
+        return BlockQuantizedTensor.quantize(data, bits, block_size)
+
+    @staticmethod
+    def quantized_matmul(x, weight):
+        """x @ weight.T，weight 为 (N, K) 的 BlockQuantizedTensor，逐块反量化不展开整个矩阵"""
+        return weight.matmul_t(x)
+
+# 打包格式: 对称量化 q ∈ [-qmax, qmax]，scale = 块内 max|x| / qmax。
+# 8 位直接存 int8 (按 uint8 视图)；4 位存 q + 8，偶数下标在低半字节。
+
+@kernel(['(float32[:, ::1], int64)'])
+def _pack_blocks(blocks, bits):
+    n_blocks, block_size = blocks.shape
+    qmax = (1 << (bits - 1)) - 1
+    per_byte = 8 // bits
+    packed = np.zeros((n_blocks, block_size // per_byte), dtype=np.uint8)
+    scales = np.empty(n_blocks, dtype=np.float32)
+    for b in numba.prange(n_blocks):
+        amax = 0.0
+        for i in range(block_size):
+            v = abs(blocks[b, i])
+            if v > amax:
+                amax = v
+        scale = amax / qmax if amax > 0 else 1.0
+        scales[b] = scale
+        inv = 1.0 / scale
+        for i in range(block_size):
+            q = int(round(blocks[b, i] * inv))
+            q = min(max(q, -qmax), qmax)
+            if bits == 8:
+                packed[b, i] = np.uint8(q & 0xFF)
+            else:
+                packed[b, i >> 1] |= np.uint8((q + 8) << ((i & 1) * 4))
+    return packed, scales
+
+@numba.njit(inline='always')
+def _decode(packed, b, i, bits):
+    if bits == 8:
+        v = np.int32(packed[b, i])
+        return v - 256 if v > 127 else v
+    return np.int32((packed[b, i >> 1] >> ((i & 1) * 4)) & 0xF) - 8
+
+@kernel(['(uint8[:, ::1], float32[::1], int64, int64)'])
+def _unpack_blocks(packed, scales, bits, block_size):
+    n_blocks = packed.shape[0]
+    out = np.empty((n_blocks, block_size), dtype=np.float32)
+    for b in numba.prange(n_blocks):
+        scale = scales[b]
+        for i in range(block_size):
+            out[b, i] = _decode(packed, b, i, bits) * scale
+    return out
+
+@kernel(['(float32[:, ::1], uint8[:, ::1], float32[:, ::1], int64, int64)'])
+def _dequant_matmul_t(x, packed, scales, bits, block_size):
+    """out[m, n] = sum_k x[m, k] * W[n, k]; W 的每行按块解码到寄存器大小的缓冲区"""
+    m_rows, k_dim = x.shape
+    n_rows, blocks_per_row = scales.shape
+    out = np.zeros((m_rows, n_rows), dtype=np.float32)
+    for n in numba.prange(n_rows):
+        w = np.empty(block_size, dtype=np.float32)
+        for kb in range(blocks_per_row):
+            b = n * blocks_per_row + kb
+            scale = scales[n, kb]
+            for i in range(block_size):
+                w[i] = _decode(packed, b, i, bits) * scale
+            start = kb * block_size
+            stop = min(start + block_size, k_dim)
+            for m in range(m_rows):
+                acc = 0.0
+                for k in range(start, stop):
+                    acc += x[m, k] * w[k - start]
+                out[m, n] += acc
+    return out
+
+class BlockQuantizedTensor:
+    """沿最后一维分块量化的张量；最后一维补零到 block_size 的整数倍"""
+
+    def __init__(self, shape, bits, block_size, packed, scales):
+        self.shape = tuple(shape)
+        self.bits = bits
+        self.block_size = block_size
+        self.packed = packed      # (rows * blocks_per_row, block_size * bits / 8) uint8
+        self.scales = scales      # (rows, blocks_per_row) float32
+
+    @classmethod
+    def quantize(cls, data, bits=4, block_size=32):
+        if bits not in (4, 8):
+            raise ValueError("bits must be 4 or 8")
+        if block_size % 2:
+            raise ValueError("block_size must be even")
+        data = np.asarray(data, dtype=np.float32)
+        shape = data.shape if data.ndim else (1,)
+        rows = data.reshape(-1, shape[-1])
+        k_dim = rows.shape[1]
+        blocks_per_row = -(-k_dim // block_size)
+        padded = k_dim if k_dim == blocks_per_row * block_size else blocks_per_row * block_size
+        if padded != k_dim:
+            rows = np.concatenate([rows, np.zeros((rows.shape[0], padded - k_dim), np.float32)], axis=1)
+        packed, scales = _pack_blocks(np.ascontiguousarray(rows).reshape(-1, block_size), bits)
+        return cls(shape, bits, block_size, packed, scales.reshape(rows.shape[0], blocks_per_row))
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes + self.scales.nbytes
+
+    def dequantize(self):
+        flat = _unpack_blocks(self.packed, self.scales.reshape(-1), self.bits, self.block_size)
+        rows = flat.reshape(self.scales.shape[0], -1)[:, :self.shape[-1]]
+        return rows.reshape(self.shape)
+
+    def matmul_t(self, x):
+        """x @ W.T (W 为二维 (N, K))，融合反量化"""
+        if len(self.shape) != 2:
+            raise ValueError("matmul_t requires a 2-D quantized weight")
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        squeeze = x.ndim == 1
+        x2 = x.reshape(1, -1) if squeeze else x
+        if x2.shape[1] != self.shape[1]:
+            raise ValueError("Matrix dimensions mismatch")
+        out = _dequant_matmul_t(x2, self.packed, self.scales, self.bits, self.block_size)
+        return out[0] if squeeze else out
+
+def vectorize(backend=None, signatures=('float32(complex64)',)):
+    """向量化装饰器工厂: backend 为空(或旧的 'avx1024')时在运行时选择 cuda/parallel/cpu"""
     def decorator(func):
-        if backend == 'avx1024':
-            return numba.vectorize(['float32(complex64)'], target='avx1024')(func)
-        elif backend == 'cuda':
-            return numba.vectorize(['float32(complex64)'], target='cuda')(func)
-        return numba.vectorize(func)
+        if backend in (None, 'auto', 'avx1024'):
+            return kernel(signatures, kind='vectorize')(func)
+        options = {'target': backend}
+        if backend != 'cuda':
+            options['cache'] = True
+        return numba.vectorize(list(signatures), **options)(func)
     return decorator
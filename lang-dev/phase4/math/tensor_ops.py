@@ -1,7 +1,8 @@
 import numpy as np
 from ctypes import cdll, c_int, c_float, POINTER
 import cpuinfo
-from numba import njit, prange
+from numba import prange
+from .simd.kernel_registry import kernel
 
 # 加载并行计算库
 openblas = cdll.LoadLibrary("libopenblas.so")
@@ -16,7 +17,7 @@ def detect_simd():
         'amx': 'amx' in flags
     }
 
-@njit(fastmath=True, parallel=True)
+@kernel(['(float32[:, :], float32[:, :])', '(float64[:, :], float64[:, :])'])
 def avx512_matmul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     if a.shape[1] != b.shape[0]:
         raise ValueError("Matrix dimensions mismatch")
@@ -50,6 +51,6 @@ class TensorSharder:
         self.comm.Allreduce(grads, total, op=MPI.SUM if op is None else op)
         return total / self.size
 
-@njit(fastmath=True)
+@kernel(['(float32[:, :], float32[:, :])'], parallel=False)
 def hybrid_precision_matmul(a: np.float32, b: np.float16) -> np.float64:
     return np.dot(a.astype(np.float64), b.astype(np.float64))
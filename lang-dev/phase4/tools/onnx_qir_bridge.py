@@ -1,6 +1,20 @@
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from qiskit import QuantumCircuit
+import onnx
 from onnx import helper
 
+# 输出文件写缓冲
+WRITE_BUFFER = 1 << 20
+# 未指定 workers 时，去重后的层数达到该值才启用进程池(进程启动与 pickle 开销大于小模型的转换耗时)
+PARALLEL_THRESHOLD = 64
+
+QIR_INSTRUCTIONS = {
+    "h": "  call void @__quantum__qis__h__body(i8* null, i64 0)\n",
+    "cx": "  call void @__quantum__qis__cnot__body(i8* null, i8* null)\n",
+}
+
 class ONNXQIRConverter:
     def __init__(self, qir_version="1.2"):
         self.qir_version = qir_version
@@ -8,32 +22,119 @@ class ONNXQIRConverter:
             "Conv": self._convert_conv,
             "Gemm": self._convert_gemm
         }
-    
+
     def convert_layer(self, onnx_node):
+        return self._generate_qir(self._layer_circuit(onnx_node))
+
+    def layer_body(self, onnx_node):
+        """单个节点的 QIR 指令行(不含函数头尾)"""
+        return self._qir_body(self._layer_circuit(onnx_node))
+
+    def _layer_circuit(self, onnx_node):
         op_type = onnx_node.op_type
         if op_type not in self.gate_mapping:
             raise ValueError(f"Unsupported operation: {op_type}")
         return self.gate_mapping[op_type](onnx_node)
-    
+
     def _convert_conv(self, node):
         qc = QuantumCircuit(node.attribute[0].i)
         qc.append(QuantumConvolution(node.attribute[0].i), range(node.attribute[0].i))
-        return self._generate_qir(qc)
-    
+        return qc
+
     def _convert_gemm(self, node):
         qc = QuantumCircuit(4)
         qc.h(range(4))
         qc.cx(0, 1)
         qc.cx(2, 3)
-        return self._generate_qir(qc)
-    
+        return qc
+
+    def _qir_body(self, circuit):
+        return [QIR_INSTRUCTIONS[instr.operation.name] for instr in circuit.data
+                if instr.operation.name in QIR_INSTRUCTIONS]
+
     def _generate_qir(self, circuit):
-        qir = f"; QIR Version: {self.qir_version}\n"
-        qir += "define void @main() {\n"
-        for instr in circuit.data:
-            if instr.operation.name == "h":
-                qir += f"  call void @__quantum__qis__h__body(i8* null, i64 0)\n"
-            elif instr.operation.name == "cx":
-                qir += f"  call void @__quantum__qis__cnot__body(i8* null, i8* null)\n"
-        qir += "  ret void\n}"
-        return qir
+        return "".join([f"; QIR Version: {self.qir_version}\n",
+                        "define void @main() {\n",
+                        *self._qir_body(circuit),
+                        "  ret void\n}"])
+
+    @staticmethod
+    def structural_key(onnx_node):
+        """结构相同(算子类型与全部属性一致)的节点生成相同的 QIR，共享一个函数定义"""
+        return (onnx_node.op_type,
+                tuple(sorted((a.name, a.SerializeToString()) for a in onnx_node.attribute)))
+
+    def convert_model(self, onnx_path, out, workers=None):
+        """整模型转换: 单次遍历计算图，结构相同的层只转换一次并定义为共享函数，
+        @main 按节点顺序调用；结果经缓冲写入 ``out``(路径或文本文件对象)。
+
+        gate_mapping 之外的(经典)算子不中断转换，在 @main 中原位留下 passthrough 注释并记录下来。
+        不同结构的层互不依赖: 给出 ``workers`` (>1) 时在多个进程中并行转换；未给出时默认串行，
+        仅当去重后的层数达到 PARALLEL_THRESHOLD 才按 CPU 核数并行。
+        工作进程用 ``worker_factory()`` 构造转换器，子类的映射与转换方法同样生效。
+        返回 {'nodes': 节点数, 'functions': 共享函数数, 'passthrough': [(算子类型, 节点名), ...]}。
+        """
+        # 转换只用到图结构与节点属性，不加载外部权重
+        model = onnx.load(onnx_path, load_external_data=False)
+        functions = {}
+        unique_nodes = []
+        calls = []
+        passthrough = []
+        for node in model.graph.node:
+            if node.op_type not in self.gate_mapping:
+                passthrough.append((node.op_type, node.name))
+                calls.append(f"  ; passthrough: {node.op_type} {node.name}\n")
+                continue
+            key = self.structural_key(node)
+            index = functions.get(key)
+            if index is None:
+                index = functions[key] = len(unique_nodes)
+                unique_nodes.append(node)
+            calls.append(index)
+
+        names = [f"@{node.op_type.lower()}_layer_{i}" for i, node in enumerate(unique_nodes)]
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "w", buffering=WRITE_BUFFER) as f:
+                self._write_module(f, unique_nodes, names, calls, workers)
+        else:
+            self._write_module(out, unique_nodes, names, calls, workers)
+        return {"nodes": len(calls), "functions": len(unique_nodes), "passthrough": passthrough}
+
+    def worker_factory(self):
+        """可 pickle 的无参可调用对象，在工作进程中构造等价的转换器；构造参数不止 qir_version 的子类需覆盖"""
+        return partial(type(self), self.qir_version)
+
+    def _write_module(self, f, unique_nodes, names, calls, workers):
+        f.write(f"; QIR Version: {self.qir_version}\n")
+        if workers is None:
+            workers = (os.cpu_count() or 1) if len(unique_nodes) >= PARALLEL_THRESHOLD else 1
+        if workers > 1 and len(unique_nodes) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(unique_nodes)),
+                                     initializer=_init_worker, initargs=(self.worker_factory(),)) as pool:
+                chunksize = max(1, len(unique_nodes) // (workers * 4))
+                bodies = pool.map(_layer_body, unique_nodes, chunksize=chunksize)
+                self._write_functions(f, names, bodies)
+        else:
+            self._write_functions(f, names, map(self.layer_body, unique_nodes))
+        f.write("\ndefine void @main() {\n")
+        f.writelines(call if isinstance(call, str) else f"  call void {names[call]}()\n" for call in calls)
+        f.write("  ret void\n}\n")
+
+    @staticmethod
+    def _write_functions(f, names, bodies):
+        # 按定义顺序逐个写出，不在内存中拼接整个模块
+        for name, body in zip(names, bodies):
+            f.write(f"\ndefine void {name}() {{\n")
+            f.writelines(body)
+            f.write("  ret void\n}\n")
+
+# 每个工作进程一个转换器，由 _init_worker 构造
+_worker_converter = None
+
+def _init_worker(factory):
+    global _worker_converter
+    _worker_converter = factory()
+
+def _layer_body(onnx_node):
+    """进程池工作函数"""
+    return _worker_converter.layer_body(onnx_node)
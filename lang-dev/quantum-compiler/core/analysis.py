@@ -0,0 +1,120 @@
+import hashlib
+from typing import Dict, Any, List, Tuple, Callable, Iterable
+from .compact_ir import CompactQuantumIR
+
+# Gates encoded per digest update in ir_digest
+DIGEST_CHUNK = 4096
+
+# Gates that are diagonal in the computational basis commute with each other
+DIAGONAL_GATES = {'z', 's', 'sdg', 't', 'tdg', 'rz', 'p', 'u1', 'cz', 'cp', 'crz', 'cu1', 'rzz'}
+
+def iter_gates(qir) -> Iterable:
+    """Iterate over gate records exposing name/qubits/params"""
+    return qir.gates
+
+def ir_digest(qir) -> str:
+    """Stable content hash of the IR, computed in one streaming pass
+
+    IRs exposing ``content_digest()`` (the array-backed IR) hash their
+    storage directly; others are hashed gate by gate in fixed-size chunks,
+    so memory stays constant regardless of circuit size.
+    """
+    content_digest = getattr(qir, 'content_digest', None)
+    if content_digest is not None:
+        return content_digest()
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(qir.qubit_count).encode())
+    chunk = []
+    for gate in iter_gates(qir):
+        chunk.append(repr((gate.name, tuple(gate.qubits), tuple(getattr(gate, 'params', ()) or ()))))
+        if len(chunk) == DIGEST_CHUNK:
+            h.update('\n'.join(chunk).encode())
+            h.update(b'\n')
+            chunk = []
+    if chunk:
+        h.update('\n'.join(chunk).encode())
+    return h.hexdigest()
+
+def gate_count(qir) -> int:
+    """Total number of gates in the IR"""
+    gates = iter_gates(qir)
+    try:
+        return len(gates)
+    except TypeError:
+        return sum(1 for _ in gates)
+
+def circuit_depth(qir) -> int:
+    """Critical-path depth computed from a per-qubit frontier"""
+    if isinstance(qir, CompactQuantumIR):
+        return qir.depth()
+    frontier: Dict[int, int] = {}
+    depth = 0
+    for gate in iter_gates(qir):
+        level = max((frontier.get(q, 0) for q in gate.qubits), default=0) + 1
+        for q in gate.qubits:
+            frontier[q] = level
+        depth = max(depth, level)
+    return depth
+
+def interaction_graph(qir) -> Dict[Tuple[int, int], int]:
+    """Weighted qubit interaction graph of multi-qubit gates"""
+    if isinstance(qir, CompactQuantumIR):
+        return qir.interaction_graph()
+    edges: Dict[Tuple[int, int], int] = {}
+    for gate in iter_gates(qir):
+        qubits = sorted(gate.qubits)
+        for i in range(len(qubits)):
+            for j in range(i + 1, len(qubits)):
+                key = (qubits[i], qubits[j])
+                edges[key] = edges.get(key, 0) + 1
+    return edges
+
+def commutation_sets(qir) -> Dict[int, List[List[int]]]:
+    """Runs of mutually commuting (diagonal) gate indices per qubit"""
+    sets: Dict[int, List[List[int]]] = {}
+    open_run: Dict[int, bool] = {}
+    for index, gate in enumerate(iter_gates(qir)):
+        diagonal = gate.name in DIAGONAL_GATES
+        for q in gate.qubits:
+            runs = sets.setdefault(q, [])
+            if diagonal and open_run.get(q):
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+            open_run[q] = diagonal
+    return sets
+
+ANALYSES: Dict[str, Callable[[Any], Any]] = {
+    'gate_count': gate_count,
+    'depth': circuit_depth,
+    'interaction_graph': interaction_graph,
+    'commutation_sets': commutation_sets,
+}
+
+class AnalysisCache:
+    """Lazily computed analyses, invalidated only by passes that change them"""
+
+    def __init__(self, analyses: Dict[str, Callable[[Any], Any]] = None):
+        self.analyses = dict(ANALYSES if analyses is None else analyses)
+        self._results: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, qir) -> Any:
+        if name in self._results:
+            self.hits += 1
+            return self._results[name]
+        if name not in self.analyses:
+            raise KeyError(f"Unknown analysis: {name}")
+        self.misses += 1
+        result = self.analyses[name](qir)
+        self._results[name] = result
+        return result
+
+    def invalidate(self, preserved: Iterable[str] = ()):
+        """Drop every cached analysis except the preserved ones"""
+        keep = set(preserved)
+        self._results = {k: v for k, v in self._results.items() if k in keep}
+
+    def clear(self):
+        self._results.clear()
@@ -0,0 +1,440 @@
+import json
+import math
+import hashlib
+from collections import namedtuple
+from typing import Dict, List, Tuple, Optional
+import numpy as np
+
+Gate = namedtuple('Gate', ['name', 'qubits', 'params', 'clbits'], defaults=((),))
+
+MAGIC = b'QIRC0001'
+_ALIGN = 64
+_ARRAYS = ('opcodes', 'qubits', 'clbits', 'param_start', 'param_count', 'params')
+
+class CompactQuantumIR:
+    """Struct-of-arrays quantum IR for very large circuits
+
+    Each gate is one row across parallel arrays:
+      - ``opcodes``: index into ``names``
+      - ``qubits``: (n, width) operand matrix, unused slots are -1
+      - ``clbits``: measurement target, -1 when unused
+      - ``param_start``/``param_count``: slice of the shared ``params`` pool
+    Barriers (arbitrary width), classical conditions and parameters that
+    are not plain floats (unbound ``Parameter`` expressions and the like)
+    are rare and live in sparse side tables keyed by gate index; the pool
+    holds NaN placeholders for the latter.
+    """
+
+    def __init__(self, names: List[str], opcodes: np.ndarray, qubits: np.ndarray,
+                 clbits: np.ndarray, param_start: np.ndarray, param_count: np.ndarray,
+                 params: np.ndarray, qubit_count: int, clbit_count: int = 0,
+                 barriers: Optional[Dict[int, Tuple[int, ...]]] = None,
+                 conditions: Optional[Dict[int, Tuple[int, int, int]]] = None,
+                 symbolic: Optional[Dict[int, Tuple]] = None):
+        self.names = names
+        self.opcodes = opcodes
+        self.qubits = qubits
+        self.clbits = clbits
+        self.param_start = param_start
+        self.param_count = param_count
+        self.params = params
+        self.qubit_count = qubit_count
+        self.clbit_count = clbit_count
+        self.barriers = barriers or {}
+        self.conditions = conditions or {}
+        self.symbolic = symbolic or {}
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __getitem__(self, index):
+        """Slicing returns a view sharing the underlying arrays"""
+        if not isinstance(index, slice):
+            return self.gate(index)
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("CompactQuantumIR only supports contiguous slices")
+        return CompactQuantumIR(
+            self.names, self.opcodes[start:stop], self.qubits[start:stop],
+            self.clbits[start:stop], self.param_start[start:stop],
+            self.param_count[start:stop], self.params,
+            self.qubit_count, self.clbit_count,
+            {i - start: v for i, v in self.barriers.items() if start <= i < stop},
+            {i - start: v for i, v in self.conditions.items() if start <= i < stop},
+            {i - start: v for i, v in self.symbolic.items() if start <= i < stop},
+        )
+
+    def select(self, mask: np.ndarray) -> 'CompactQuantumIR':
+        """Keep the gates where ``mask`` is True (copies the gate rows)"""
+        kept = np.flatnonzero(mask)
+        sparse = self.barriers.keys() | self.conditions.keys() | self.symbolic.keys()
+        remap = {int(old): new for new, old in enumerate(kept) if int(old) in sparse}
+        return CompactQuantumIR(
+            self.names, self.opcodes[kept], self.qubits[kept], self.clbits[kept],
+            self.param_start[kept], self.param_count[kept], self.params,
+            self.qubit_count, self.clbit_count,
+            {remap[i]: v for i, v in self.barriers.items() if i in remap},
+            {remap[i]: v for i, v in self.conditions.items() if i in remap},
+            {remap[i]: v for i, v in self.symbolic.items() if i in remap},
+        )
+
+    @property
+    def width(self) -> int:
+        return self.qubits.shape[1]
+
+    def opcode(self, name: str) -> int:
+        return self.names.index(name)
+
+    def gate(self, index: int) -> Gate:
+        row = self.qubits[index]
+        qubits = self.barriers.get(index) or tuple(int(q) for q in row if q >= 0)
+        start, count = int(self.param_start[index]), int(self.param_count[index])
+        clbit = int(self.clbits[index])
+        params = self.symbolic.get(index) or tuple(self.params[start:start + count].tolist())
+        return Gate(self.names[self.opcodes[index]], qubits, params,
+                    (clbit,) if clbit >= 0 else ())
+
+    @property
+    def gates(self) -> '_GateSequence':
+        return _GateSequence(self)
+
+    def content_digest(self) -> str:
+        """blake2b over the raw gate arrays and side tables (no per-gate decoding)"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps([
+            self.names, self.qubit_count, self.clbit_count,
+            sorted(self.barriers.items()), sorted(self.conditions.items()),
+            sorted(self.symbolic.items()),
+        ], default=repr).encode())
+        for name in _ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            h.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+            h.update(array.reshape(-1).view(np.uint8))
+        return h.hexdigest()
+
+    def arity(self) -> np.ndarray:
+        """Number of qubit operands per gate"""
+        return (self.qubits >= 0).sum(axis=1)
+
+    def gate_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.opcodes, minlength=len(self.names))
+        return {name: int(c) for name, c in zip(self.names, counts) if c}
+
+    def mask(self, *names: str) -> np.ndarray:
+        codes = [self.names.index(n) for n in names if n in self.names]
+        return np.isin(self.opcodes, codes)
+
+    def touches(self, qubit: int) -> np.ndarray:
+        return (self.qubits == qubit).any(axis=1)
+
+    def operands(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(gate index, qubit) for every operand, barrier operands included, in gate order"""
+        rows, cols = np.nonzero(self.qubits >= 0)
+        gates, qubits = rows, self.qubits[rows, cols].astype(np.int64)
+        if self.barriers:
+            extra = [(i, q) for i, qs in self.barriers.items() for q in qs]
+            if extra:
+                extra_gates, extra_qubits = np.array(extra, dtype=np.int64).T
+                gates = np.concatenate([gates, extra_gates])
+                qubits = np.concatenate([qubits, extra_qubits])
+                order = np.argsort(gates, kind='stable')
+                gates, qubits = gates[order], qubits[order]
+        return gates, qubits
+
+    def depth(self) -> int:
+        """Critical-path depth over raw operand rows (no per-gate decoding)"""
+        frontier = [0] * self.qubit_count
+        barriers = self.barriers
+        chunk = _GateSequence.CHUNK
+        for base in range(0, len(self), chunk):
+            rows = self.qubits[base:base + chunk].tolist()
+            if self.width == 2:
+                for i, (a, b) in enumerate(rows):
+                    if b >= 0:
+                        level = max(frontier[a], frontier[b]) + 1
+                        frontier[a] = frontier[b] = level
+                    elif a >= 0:
+                        frontier[a] += 1
+                    elif base + i in barriers:
+                        qs = barriers[base + i]
+                        level = max(frontier[q] for q in qs) + 1
+                        for q in qs:
+                            frontier[q] = level
+                continue
+            for i, row in enumerate(rows):
+                qs = barriers.get(base + i) or [q for q in row if q >= 0]
+                if qs:
+                    level = max(frontier[q] for q in qs) + 1
+                    for q in qs:
+                        frontier[q] = level
+        return max(frontier, default=0)
+
+    def interaction_graph(self) -> Dict[Tuple[int, int], int]:
+        """Weighted interaction graph from column pairs of the operand matrix"""
+        n = max(self.qubit_count, 1)
+        keys = []
+        for i in range(self.width):
+            for j in range(i + 1, self.width):
+                a, b = self.qubits[:, i].astype(np.int64), self.qubits[:, j].astype(np.int64)
+                valid = (a >= 0) & (b >= 0)
+                a, b = a[valid], b[valid]
+                keys.append(np.minimum(a, b) * n + np.maximum(a, b))
+        for qs in self.barriers.values():
+            qs = sorted(qs)
+            keys.append(np.array([qs[i] * n + qs[j] for i in range(len(qs))
+                                  for j in range(i + 1, len(qs))], dtype=np.int64))
+        if not keys:
+            return {}
+        unique, counts = np.unique(np.concatenate(keys), return_counts=True)
+        return {(int(k // n), int(k % n)): int(c) for k, c in zip(unique, counts)}
+
+    # --- QuantumCircuit conversion ---
+
+    @classmethod
+    def from_circuit(cls, qc) -> 'CompactQuantumIR':
+        builder = CompactIRBuilder()
+        builder.add_qreg('q', qc.num_qubits)
+        builder.add_creg('c', qc.num_clbits)
+        for instruction in qc.data:
+            op = instruction.operation
+            qubits = tuple(qc.find_bit(q).index for q in instruction.qubits)
+            condition = None
+            if getattr(op, 'condition', None) is not None:
+                register, value = op.condition
+                bits = list(register) if hasattr(register, '__len__') else [register]
+                condition = (qc.find_bit(bits[0]).index, len(bits), value)
+            if op.name == 'barrier':
+                builder.barrier(qubits)
+            elif op.name == 'measure':
+                builder._append('measure', qubits, (), qc.find_bit(instruction.clbits[0]).index, condition)
+            else:
+                try:
+                    params = tuple(float(p) for p in op.params)
+                except (TypeError, ValueError):
+                    # Unbound Parameter(Expression)s and other non-numeric values
+                    builder.symbolic[builder._n] = tuple(op.params)
+                    params = (math.nan,) * len(op.params)
+                builder._append(op.name, qubits, params, -1, condition)
+        return builder.finish()
+
+    def to_circuit(self):
+        """Rebuild a QuantumCircuit; gates resolve through qasm_stream.QISKIT_GATES like the parser,
+        fused ``unitary`` gates become UnitaryGates and opaque gates definition-less Gates"""
+        from qiskit import QuantumCircuit
+        from qiskit.circuit import Gate
+        from .qasm_stream import resolve_qiskit_gate, qiskit_operation
+        from .gate_fusion import gate_matrix
+        qc = QuantumCircuit(self.qubit_count, self.clbit_count)
+        resolved = {}
+        for index, gate in enumerate(self.gates):
+            if gate.name == 'barrier':
+                instructions = qc.barrier(*gate.qubits)
+            elif gate.name == 'measure':
+                instructions = qc.measure(gate.qubits[0], gate.clbits[0])
+            elif gate.name == 'reset':
+                instructions = qc.reset(gate.qubits[0])
+            elif gate.name == 'unitary':
+                instructions = qc.unitary(gate_matrix('unitary', gate.params), list(gate.qubits))
+            else:
+                if gate.name not in resolved:
+                    resolved[gate.name] = resolve_qiskit_gate(gate.name)
+                entry = resolved[gate.name]
+                operation = Gate(gate.name, len(gate.qubits), list(gate.params)) if entry is None \
+                    else qiskit_operation(entry, gate.params)
+                instructions = qc.append(operation, list(gate.qubits))
+            if index in self.conditions:
+                offset, size, value = self.conditions[index]
+                instructions.c_if(qc.clbits[offset:offset + size], value)
+        return qc
+
+    # --- Binary serialization ---
+
+    def save(self, path: str):
+        """Write a memory-mappable file: magic, JSON header, aligned raw arrays"""
+        if self.symbolic:
+            raise ValueError(f"Cannot save an IR with {len(self.symbolic)} gate(s) carrying "
+                             f"unbound or non-numeric parameters; bind them first")
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({
+            'names': self.names,
+            'qubit_count': self.qubit_count,
+            'clbit_count': self.clbit_count,
+            'barriers': {str(k): list(v) for k, v in self.barriers.items()},
+            'conditions': {str(k): list(v) for k, v in self.conditions.items()},
+            'arrays': layout,
+        }).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                array.tofile(f)
+            f.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'CompactQuantumIR':
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a compact IR file: {path}")
+            header_len = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_len))
+        data_start = -(-(len(MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                                         offset=data_start + spec['offset'], shape=shape)
+            else:
+                arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                           offset=data_start + spec['offset']).reshape(shape)
+        return cls(
+            header['names'], arrays['opcodes'], arrays['qubits'], arrays['clbits'],
+            arrays['param_start'], arrays['param_count'], arrays['params'],
+            header['qubit_count'], header['clbit_count'],
+            {int(k): tuple(v) for k, v in header['barriers'].items()},
+            {int(k): tuple(v) for k, v in header['conditions'].items()},
+        )
+
+class _GateSequence:
+    """Sized, chunk-decoded iteration over gates for the generic analyses"""
+
+    CHUNK = 65536
+
+    def __init__(self, ir: CompactQuantumIR):
+        self.ir = ir
+
+    def __len__(self) -> int:
+        return len(self.ir)
+
+    def __iter__(self):
+        ir = self.ir
+        names, params, symbolic = ir.names, ir.params, ir.symbolic
+        for base in range(0, len(ir), self.CHUNK):
+            opcodes = ir.opcodes[base:base + self.CHUNK].tolist()
+            rows = ir.qubits[base:base + self.CHUNK].tolist()
+            starts = ir.param_start[base:base + self.CHUNK].tolist()
+            counts = ir.param_count[base:base + self.CHUNK].tolist()
+            clbits = ir.clbits[base:base + self.CHUNK].tolist()
+            for i, (op, row, start, count, clbit) in enumerate(zip(opcodes, rows, starts, counts, clbits)):
+                qubits = ir.barriers.get(base + i) or tuple(q for q in row if q >= 0)
+                if symbolic and base + i in symbolic:
+                    values = symbolic[base + i]
+                else:
+                    values = tuple(params[start:start + count].tolist()) if count else ()
+                yield Gate(names[op], qubits, values, (clbit,) if clbit >= 0 else ())
+
+class CompactIRBuilder:
+    """Growable-array builder; also usable as a QasmStreamParser sink"""
+
+    def __init__(self, capacity: int = 1024, width: int = 2):
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._n = 0
+        self._opcodes = np.empty(capacity, dtype=np.uint16)
+        self._qubits = np.full((capacity, width), -1, dtype=np.int32)
+        self._clbits = np.full(capacity, -1, dtype=np.int32)
+        self._param_start = np.zeros(capacity, dtype=np.int64)
+        self._param_count = np.zeros(capacity, dtype=np.uint16)
+        self._params = np.empty(capacity, dtype=np.float64)
+        self._n_params = 0
+        self.qubit_count = 0
+        self.clbit_count = 0
+        self._cregs: Dict[str, Tuple[int, int]] = {}
+        self.barriers: Dict[int, Tuple[int, ...]] = {}
+        self.conditions: Dict[int, Tuple[int, int, int]] = {}
+        self.symbolic: Dict[int, Tuple] = {}
+
+    def _grow(self):
+        capacity = len(self._opcodes) * 2
+        for attr in ('_opcodes', '_clbits', '_param_start', '_param_count'):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, attr, new)
+        qubits = np.full((capacity, self._qubits.shape[1]), -1, dtype=np.int32)
+        qubits[:self._n] = self._qubits[:self._n]
+        self._qubits = qubits
+
+    def _widen(self, width: int):
+        qubits = np.full((len(self._opcodes), width), -1, dtype=np.int32)
+        qubits[:, :self._qubits.shape[1]] = self._qubits
+        self._qubits = qubits
+
+    def _append(self, name: str, qubits: Tuple[int, ...], params: Tuple[float, ...],
+                clbit: int = -1, condition: Optional[Tuple[int, int, int]] = None):
+        if self._n == len(self._opcodes):
+            self._grow()
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        i = self._n
+        self._opcodes[i] = code
+        if name == 'barrier':
+            self._qubits[i] = -1
+            self.barriers[i] = tuple(qubits)
+        else:
+            if len(qubits) > self._qubits.shape[1]:
+                self._widen(len(qubits))
+            row = self._qubits[i]
+            row[:] = -1
+            row[:len(qubits)] = qubits
+        self._clbits[i] = clbit
+        self._param_start[i] = self._n_params
+        self._param_count[i] = len(params)
+        if params:
+            if self._n_params + len(params) > len(self._params):
+                self._params = np.concatenate([self._params, np.empty(len(self._params) + len(params))])
+            self._params[self._n_params:self._n_params + len(params)] = params
+            self._n_params += len(params)
+        if condition is not None:
+            self.conditions[i] = condition
+        self._n += 1
+
+    def _condition(self, condition):
+        if condition is None:
+            return None
+        offset, size = self._cregs[condition[0]]
+        return (offset, size, condition[1])
+
+    # Sink interface shared with qasm_stream.CircuitSink
+
+    def add_qreg(self, name: str, size: int):
+        self.qubit_count += size
+
+    def add_creg(self, name: str, size: int):
+        self._cregs[name] = (self.clbit_count, size)
+        self.clbit_count += size
+
+    def gate(self, name: str, qubits: Tuple[int, ...], params: Tuple[float, ...], condition=None):
+        self._append(name, qubits, params, -1, self._condition(condition))
+
+    def measure(self, qubit: int, clbit: Tuple[str, int], condition=None):
+        offset, _ = self._cregs[clbit[0]]
+        self._append('measure', (qubit,), (), offset + clbit[1], self._condition(condition))
+
+    def reset(self, qubit: int, condition=None):
+        self._append('reset', (qubit,), (), -1, self._condition(condition))
+
+    def barrier(self, qubits: Tuple[int, ...]):
+        self._append('barrier', qubits, ())
+
+    def finish(self) -> CompactQuantumIR:
+        # Views over the growth buffers: no second copy at peak size
+        n = self._n
+        return CompactQuantumIR(
+            list(self.names), self._opcodes[:n], self._qubits[:n],
+            self._clbits[:n], self._param_start[:n],
+            self._param_count[:n], self._params[:self._n_params],
+            self.qubit_count, self.clbit_count, dict(self.barriers), dict(self.conditions),
+            dict(self.symbolic),
+        )
@@ -10,10 +10,26 @@ from .codegen import (
     LLVMIRGenerator
 )
 from .optimizers import (
-    GateFusionPass,
     ErrorMitigationPass,
     QuantumTopologyOptimization
 )
+from .gate_fusion import GateFusionPass
+from .pass_manager import PassManager
+from .security import SecurityVerifier
+from .qasm_stream import parse_qasm_file, QasmParseError
+from .compact_ir import CompactQuantumIR, CompactIRBuilder
+from .stream_codegen import (
+    StreamingCodeGenerator,
+    QASMStreamEmitter,
+    LLVMStreamEmitter,
+    WholeProgramEmitter,
+    CodegenError
+)
+
+# Targets whose generators can lower the dense ``unitary`` gates emitted by
+# GateFusionPass in 'unitary' mode (state-vector simulation kernels)
+UNITARY_TARGETS = {'cuda'}
+FUSION_MODES = ('gates', 'unitary')
 
 class CompilationError(Exception):
     """Custom compilation error class"""
@@ -38,31 +54,72 @@ class CompilerPipeline:
     
     def __init__(self, config: Dict[str, Any]):
         self.optimization_level = config.get('optimization', 1)
+        # max_fused_qubits only applies to fusion_mode 'unitary'; 'gates' fuses single-qubit runs
+        self.fusion_mode = config.get('fusion_mode', 'gates')
+        if self.fusion_mode not in FUSION_MODES:
+            raise CompilationError(f"Unknown fusion_mode: {self.fusion_mode} (expected one of {FUSION_MODES})")
+        self.max_fused_qubits = config.get('max_fused_qubits', 2)
+        self.compact_ir = config.get('ir') == 'compact'
         self.security_policy = load_security_policy()
+        self.security_verifier = SecurityVerifier(
+            self.security_policy,
+            formal_verification,
+            timeout=config.get('verification_timeout', 30.0)
+        )
+        self._generators: Dict[str, Any] = {}
+        self._streaming_codegen: Optional[StreamingCodeGenerator] = None
         self._setup_passes()
 
     def _setup_passes(self):
         """Initialize optimization passes based on config"""
         self.passes = []
         if self.optimization_level >= 1:
-            self.passes.append(GateFusionPass())
+            self.passes.append(GateFusionPass(self.max_fused_qubits, mode=self.fusion_mode))
         if self.optimization_level >= 2:
             self.passes.append(ErrorMitigationPass())
         if self.optimization_level >= 3:
             self.passes.append(QuantumTopologyOptimization())
+        self.pass_manager = PassManager(self.passes, fixpoint=self.optimization_level >= 3)
 
     def compile(self, input_file: str, target: str) -> str:
         """Full compilation process with error handling"""
+        self._check_targets([target])
         try:
-            qc = self._parse_input(input_file)
-            qir = self._generate_ir(qc)
-            if not self._security_check(qir):
-                raise CompilationError("Security policy violation detected")
-            optimized_ir = self._apply_optimizations(qir)
+            optimized_ir = self._build_ir(input_file)
             return self._generate_code(optimized_ir, target)
         except Exception as e:
             raise CompilationError(f"Compilation failed: {str(e)}")
 
+    def compile_to(self, input_file: str, outputs: Dict[str, Any]) -> Dict[str, int]:
+        """Compile once and stream every requested target to its path, file or socket"""
+        self._check_targets(outputs)
+        try:
+            qir = self._build_ir(input_file)
+            return self._stream_code(qir, outputs)
+        except Exception as e:
+            raise CompilationError(f"Compilation failed: {str(e)}")
+
+    def _check_targets(self, targets):
+        """'unitary' fusion output can only be lowered by simulator targets"""
+        if self.fusion_mode == 'unitary' and self.optimization_level >= 1:
+            unsupported = sorted(set(targets) - UNITARY_TARGETS)
+            if unsupported:
+                raise CompilationError(
+                    f"fusion_mode 'unitary' cannot be lowered to {', '.join(unsupported)}; "
+                    f"supported targets: {', '.join(sorted(UNITARY_TARGETS))}")
+
+    def _build_ir(self, input_file: str) -> QuantumIR:
+        """Parse, verify and optimize the input into the final IR"""
+        if self.compact_ir and Path(input_file).suffix.lower() == '.qasm':
+            qir = self._parse_qasm_compact(input_file)
+        else:
+            qc = self._parse_input(input_file)
+            qir = self._generate_ir(qc)
+        verdict = self.security_verifier.verify(qir)
+        if not verdict.ok:
+            raise CompilationError(f"Security policy violation detected: {verdict.reason}")
+        return self._apply_optimizations(qir)
+
     def _parse_input(self, file_path: str) -> QuantumCircuit:
         """Complete input parser with format detection"""
         ext = Path(file_path).suffix.lower()
@@ -87,16 +144,17 @@ class CompilerPipeline:
         return namespace['QuantumCircuit']
 
     def _parse_qasm(self, file_path: str) -> QuantumCircuit:
-        """QASM parser implementation"""
-        from qiskit.qasm import Qasm
-        from qiskit.converters import ast_to_dag
-        from qiskit.converters import dag_to_circuit
+        """QASM parser implementation (single streaming pass)"""
         try:
-            qasm = Qasm(file_path)
-            ast = qasm.parse()
-            dag = ast_to_dag(ast)
-            return dag_to_circuit(dag)
-        except Exception as e:
+            return parse_qasm_file(file_path)
+        except (QasmParseError, OSError) as e:
+            raise CompilationError(f"QASM parsing failed: {str(e)}")
+
+    def _parse_qasm_compact(self, file_path: str) -> CompactQuantumIR:
+        """Parse QASM straight into the array-backed IR, skipping QuantumCircuit"""
+        try:
+            return parse_qasm_file(file_path, CompactIRBuilder())
+        except (QasmParseError, OSError) as e:
             raise CompilationError(f"QASM parsing failed: {str(e)}")
 
     def _parse_qsharp(self, file_path: str) -> QuantumCircuit:
@@ -114,30 +172,44 @@ class CompilerPipeline:
         """Generate Quantum Intermediate Representation"""
         return QuantumIRGenerator(qc).generate()
 
-    def _security_check(self, qir: QuantumIR) -> bool:
-        """Complete security verification chain"""
-        if not formal_verification(qir, self.security_policy):
-            return False
-        if qir.qubit_count > self.security_policy.get('max_qubit_usage', 1024):
-            return False
-        return True
-
     def _apply_optimizations(self, qir: QuantumIR) -> QuantumIR:
         """Full optimization pass application"""
-        for pass_instance in self.passes:
-            try:
-                qir = pass_instance.apply(qir)
-            except Exception as e:
-                raise CompilationError(f"Optimization failed: {str(e)}")
-        return qir
+        try:
+            return self.pass_manager.run(qir)
+        except Exception as e:
+            raise CompilationError(f"Optimization failed: {str(e)}")
+
+    def optimization_report(self) -> str:
+        """Per-pass timing and gate/depth deltas of the last compilation"""
+        return self.pass_manager.format_report()
 
     def _generate_code(self, qir: QuantumIR, target: str) -> str:
         """Complete code generation with validation"""
-        generators = {
-            'qasm': QASMGenerator(),
-            'cuda': CUDAKernelGenerator(),
-            'llvm': LLVMIRGenerator()
-        }
-        if target not in generators:
-            raise CompilationError(f"Unsupported target: {target}")
-        return generators[target].generate(qir)
+        return self._get_generator(target).generate(qir)
+
+    def _get_generator(self, target: str):
+        """Generator instances are built once per pipeline and reused"""
+        generator = self._generators.get(target)
+        if generator is None:
+            factories = {
+                'qasm': QASMGenerator,
+                'cuda': CUDAKernelGenerator,
+                'llvm': LLVMIRGenerator
+            }
+            if target not in factories:
+                raise CompilationError(f"Unsupported target: {target}")
+            generator = self._generators[target] = factories[target]()
+        return generator
+
+    def _stream_code(self, qir: QuantumIR, outputs: Dict[str, Any]) -> Dict[str, int]:
+        """Emit all targets incrementally in a single traversal of the IR"""
+        if self._streaming_codegen is None:
+            self._streaming_codegen = StreamingCodeGenerator({
+                'qasm': QASMStreamEmitter(),
+                'llvm': LLVMStreamEmitter(),
+                'cuda': WholeProgramEmitter(self._get_generator('cuda'))
+            })
+        try:
+            return self._streaming_codegen.generate_to(qir, outputs)
+        except CodegenError as e:
+            raise CompilationError(str(e))
@@ -0,0 +1,420 @@
+import copy
+import cmath
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional
+import numpy as np
+from .analysis import iter_gates
+from .compact_ir import CompactIRBuilder, CompactQuantumIR, Gate
+
+# Matrices follow the little-endian convention: the first listed qubit is
+# the least significant bit of the basis index.
+_I = np.eye(2, dtype=complex)
+_X = np.array([[0, 1], [1, 0]], dtype=complex)
+_Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+_Z = np.diag([1, -1]).astype(complex)
+_H = np.array([[1, 1], [1, -1]], dtype=complex) / math.sqrt(2)
+_SX = np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]], dtype=complex) / 2
+_SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex)
+
+NON_UNITARY = {'measure', 'reset', 'barrier'}
+
+def _u3(theta: float, phi: float, lam: float) -> np.ndarray:
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([
+        [c, -cmath.exp(1j * lam) * s],
+        [cmath.exp(1j * phi) * s, cmath.exp(1j * (phi + lam)) * c]
+    ], dtype=complex)
+
+def _rx(theta: float) -> np.ndarray:
+    return np.cos(theta / 2) * _I - 1j * np.sin(theta / 2) * _X
+
+def _ry(theta: float) -> np.ndarray:
+    return np.cos(theta / 2) * _I - 1j * np.sin(theta / 2) * _Y
+
+def _rz(theta: float) -> np.ndarray:
+    return np.diag([cmath.exp(-0.5j * theta), cmath.exp(0.5j * theta)])
+
+def _phase(lam: float) -> np.ndarray:
+    return np.diag([1, cmath.exp(1j * lam)])
+
+def _controlled(u: np.ndarray, controls: int = 1) -> np.ndarray:
+    """Controls on the low qubits, ``u`` on the high qubits"""
+    dim_u = u.shape[0]
+    m = np.eye(dim_u << controls, dtype=complex)
+    ones = (1 << controls) - 1
+    idx = [ones + (t << controls) for t in range(dim_u)]
+    m[np.ix_(idx, idx)] = u
+    return m
+
+_FIXED = {
+    'id': _I, 'x': _X, 'y': _Y, 'z': _Z, 'h': _H,
+    's': _phase(math.pi / 2), 'sdg': _phase(-math.pi / 2),
+    't': _phase(math.pi / 4), 'tdg': _phase(-math.pi / 4),
+    'sx': _SX, 'sxdg': _SX.conj().T,
+    'cx': _controlled(_X), 'cy': _controlled(_Y), 'cz': _controlled(_Z),
+    'ch': _controlled(_H), 'csx': _controlled(_SX), 'swap': _SWAP,
+    'ccx': _controlled(_X, 2), 'cswap': _controlled(_SWAP),
+}
+_PARAMETRIC = {
+    'rx': _rx, 'ry': _ry, 'rz': _rz, 'p': _phase, 'u1': _phase,
+    'u2': lambda phi, lam: _u3(math.pi / 2, phi, lam),
+    'u3': _u3, 'u': _u3,
+    'crx': lambda t: _controlled(_rx(t)), 'cry': lambda t: _controlled(_ry(t)),
+    'crz': lambda t: _controlled(_rz(t)), 'cp': lambda t: _controlled(_phase(t)),
+    'cu1': lambda t: _controlled(_phase(t)),
+    'cu3': lambda t, p, l: _controlled(_u3(t, p, l)),
+    'rzz': lambda t: np.diag([cmath.exp(-0.5j * t), cmath.exp(0.5j * t),
+                              cmath.exp(0.5j * t), cmath.exp(-0.5j * t)]),
+    'rxx': lambda t: math.cos(t / 2) * np.eye(4) - 1j * math.sin(t / 2) * np.kron(_X, _X),
+}
+
+def gate_matrix(name: str, params: Tuple[float, ...] = ()) -> Optional[np.ndarray]:
+    """Unitary of a gate, or None when it has no known matrix"""
+    if name == 'unitary':
+        flat = np.asarray(params, dtype=float)
+        dim = int(round(math.sqrt(len(flat) // 2)))
+        return (flat[0::2] + 1j * flat[1::2]).reshape(dim, dim)
+    if name in _FIXED:
+        return _FIXED[name]
+    if name in _PARAMETRIC:
+        return np.asarray(_PARAMETRIC[name](*params), dtype=complex)
+    return None
+
+def apply_to_block(block: np.ndarray, gate: np.ndarray, positions: List[int], width: int) -> np.ndarray:
+    """Left-multiply ``block`` by ``gate`` acting on the given bit positions"""
+    k = len(positions)
+    tensor = block.reshape([2] * width + [block.shape[1]])
+    g = gate.reshape([2] * (2 * k))
+    axes = [width - 1 - positions[k - 1 - j] for j in range(k)]
+    out = np.tensordot(g, tensor, axes=(list(range(k, 2 * k)), axes))
+    return np.moveaxis(out, list(range(k)), axes).reshape(block.shape)
+
+def zyz_angles(u: np.ndarray) -> Tuple[float, float, float]:
+    """u3 angles reproducing a 2x2 unitary up to global phase"""
+    a, b, c, d = u[0, 0], u[0, 1], u[1, 0], u[1, 1]
+    theta = 2 * math.atan2(abs(c), abs(a))
+    if abs(a) < 1e-12:
+        return theta, cmath.phase(c) - cmath.phase(-b), 0.0
+    if abs(c) < 1e-12:
+        return theta, 0.0, cmath.phase(d) - cmath.phase(a)
+    return theta, cmath.phase(c) - cmath.phase(a), cmath.phase(-b) - cmath.phase(a)
+
+def zyz_angles_batch(u: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorised ``zyz_angles`` over a stack of 2x2 unitaries"""
+    a, b, c, d = u[:, 0, 0], u[:, 0, 1], u[:, 1, 0], u[:, 1, 1]
+    theta = 2 * np.arctan2(np.abs(c), np.abs(a))
+    a_zero, c_zero = np.abs(a) < 1e-12, np.abs(c) < 1e-12
+    phi = np.where(a_zero, np.angle(c) - np.angle(-b),
+                   np.where(c_zero, 0.0, np.angle(c) - np.angle(a)))
+    lam = np.where(a_zero, 0.0,
+                   np.where(c_zero, np.angle(d) - np.angle(a), np.angle(-b) - np.angle(a)))
+    return theta, phi, lam
+
+def _u3_batch(theta, phi, lam) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    m = np.empty((len(theta), 2, 2), dtype=complex)
+    m[:, 0, 0] = c
+    m[:, 0, 1] = -np.exp(1j * lam) * s
+    m[:, 1, 0] = np.exp(1j * phi) * s
+    m[:, 1, 1] = np.exp(1j * (phi + lam)) * c
+    return m
+
+def single_qubit_matrices(name: str, params: np.ndarray) -> np.ndarray:
+    """Stack of 2x2 unitaries for ``k`` applications of a single-qubit gate
+
+    ``params`` has shape (k, parameter count).
+    """
+    k = len(params)
+    if name in _FIXED:
+        return np.broadcast_to(_FIXED[name], (k, 2, 2))
+    t = params[:, 0] if params.shape[1] else None
+    if name in ('rx', 'ry'):
+        c, s = np.cos(t / 2), np.sin(t / 2)
+        m = np.empty((k, 2, 2), dtype=complex)
+        m[:, 0, 0] = m[:, 1, 1] = c
+        if name == 'rx':
+            m[:, 0, 1] = m[:, 1, 0] = -1j * s
+        else:
+            m[:, 0, 1], m[:, 1, 0] = -s, s
+        return m
+    if name in ('rz', 'p', 'u1'):
+        m = np.zeros((k, 2, 2), dtype=complex)
+        m[:, 0, 0] = np.exp(-0.5j * t) if name == 'rz' else 1
+        m[:, 1, 1] = np.exp(0.5j * t) if name == 'rz' else np.exp(1j * t)
+        return m
+    if name == 'u2':
+        return _u3_batch(np.full(k, math.pi / 2), params[:, 0], params[:, 1])
+    if name in ('u3', 'u'):
+        return _u3_batch(params[:, 0], params[:, 1], params[:, 2])
+    if name == 'unitary':
+        return (params[:, 0::2] + 1j * params[:, 1::2]).reshape(k, 2, 2)
+    return np.stack([gate_matrix(name, tuple(row)) for row in params.tolist()])
+
+def segmented_products(matrices: np.ndarray, run_ids: np.ndarray) -> np.ndarray:
+    """Product of each run of consecutive matrices (later @ earlier), one per run
+
+    Runs are contiguous and numbered 0..r-1 in order; pairs are combined
+    level by level, so the number of numpy calls grows with log(run length).
+    """
+    while True:
+        lengths = np.bincount(run_ids)
+        if len(lengths) == 0 or lengths.max() <= 1:
+            return matrices
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        pos = np.arange(len(run_ids)) - starts[run_ids]
+        even = pos % 2 == 0
+        paired = np.flatnonzero(even & (pos + 1 < lengths[run_ids]))
+        matrices = matrices.copy()
+        matrices[paired] = matrices[paired + 1] @ matrices[paired]
+        matrices, run_ids = matrices[even], run_ids[even]
+
+@dataclass
+class FusedBlock:
+    """A fused gate: ascending qubits (little-endian) and its unitary"""
+    qubits: Tuple[int, ...]
+    matrix: np.ndarray
+    gate_count: int = 1
+
+class _Block:
+    __slots__ = ('qubits', 'gates')
+
+    def __init__(self, qubits):
+        self.qubits = set(qubits)
+        self.gates = []
+
+class GateFusionPass:
+    """Fuses adjacent unitary gates into blocks of at most ``max_fused_qubits``
+
+    ``apply`` returns a reduced-gate-count IR of the same type it was given.
+    In the default ``'gates'`` mode only single-qubit runs are collapsed
+    (into one u3), so every code generator can still lower the result and
+    ``max_fused_qubits`` is not used. ``mode='unitary'`` emits each
+    multi-gate block of up to ``max_fused_qubits`` qubits as a ``unitary``
+    gate for simulator backends, and ``fuse`` returns the blocks with their
+    matrices directly.
+
+    On a ``CompactQuantumIR`` the ``'gates'`` mode runs entirely on the
+    gate arrays (``fuse_single_qubit_runs``) without decoding gates.
+    """
+
+    name = 'GateFusionPass'
+
+    def __init__(self, max_fused_qubits: int = 2, mode: str = 'gates', tolerance: float = 1e-10):
+        if not 1 <= max_fused_qubits <= 4:
+            raise ValueError("max_fused_qubits must be between 1 and 4")
+        if mode not in ('gates', 'unitary'):
+            raise ValueError(f"Unknown fusion mode: {mode}")
+        self.max_fused_qubits = max_fused_qubits
+        self.mode = mode
+        self.tolerance = tolerance
+
+    def _blocks(self, qir, max_width: int):
+        """Yield ('block', _Block) or ('gate', index, gate) in a dependency-safe order"""
+        conditions = getattr(qir, 'conditions', {})
+        symbolic = getattr(qir, 'symbolic', {})
+        owner: Dict[int, _Block] = {}
+
+        def close(block):
+            for q in block.qubits:
+                del owner[q]
+            return ('block', block)
+
+        for index, gate in enumerate(iter_gates(qir)):
+            fusable = (gate.name not in NON_UNITARY and index not in conditions
+                       and index not in symbolic and len(gate.qubits) <= max_width and gate_matrix(gate.name, gate.params) is not None)
+            touched = []
+            for q in gate.qubits:
+                block = owner.get(q)
+                if block is not None and all(block is not t for t in touched):
+                    touched.append(block)
+            if not fusable:
+                for block in touched:
+                    yield close(block)
+                yield ('gate', index, gate)
+                continue
+            merged = set(gate.qubits).union(*(b.qubits for b in touched))
+            if len(merged) > max_width:
+                for block in touched:
+                    yield close(block)
+                touched = []
+                merged = set(gate.qubits)
+            if touched:
+                # Grow the largest block in place so long runs stay linear
+                target = max(touched, key=lambda b: len(b.gates))
+                for block in touched:
+                    if block is not target:
+                        target.gates.extend(block.gates)
+                target.qubits = merged
+            else:
+                target = _Block(merged)
+            target.gates.append(gate)
+            for q in merged:
+                owner[q] = target
+        seen = set()
+        for block in list(owner.values()):
+            if id(block) not in seen:
+                seen.add(id(block))
+                yield ('block', block)
+
+    @staticmethod
+    def block_matrix(block: _Block) -> FusedBlock:
+        qubits = tuple(sorted(block.qubits))
+        position = {q: i for i, q in enumerate(qubits)}
+        width = len(qubits)
+        matrix = np.eye(1 << width, dtype=complex)
+        for gate in block.gates:
+            matrix = apply_to_block(matrix, gate_matrix(gate.name, gate.params),
+                                    [position[q] for q in gate.qubits], width)
+        return FusedBlock(qubits, matrix, len(block.gates))
+
+    def fuse(self, qir) -> List[object]:
+        """Fused-matrix form: FusedBlock items interleaved with non-unitary gates"""
+        conditions = getattr(qir, 'conditions', {})
+        program = []
+        for item in self._blocks(qir, self.max_fused_qubits):
+            if item[0] == 'block':
+                program.append(self.block_matrix(item[1]))
+                continue
+            _, index, gate = item
+            if (gate.name in NON_UNITARY or index in conditions
+                    or gate_matrix(gate.name, gate.params) is None):
+                program.append(gate)
+            else:
+                single = _Block(gate.qubits)
+                single.gates.append(gate)
+                program.append(self.block_matrix(single))
+        return program
+
+    def apply(self, qir):
+        """Fused IR of the same type as ``qir``"""
+        if isinstance(qir, CompactQuantumIR):
+            if self.mode == 'gates':
+                return self.fuse_single_qubit_runs(qir)
+            return self._apply_compact(qir)
+        conditions = getattr(qir, 'conditions', {})
+        gates, fused_conditions = [], {}
+        for gate, index in self._fused_gates(qir):
+            if index in conditions:
+                fused_conditions[len(gates)] = conditions[index]
+            gates.append(gate)
+        result = copy.copy(qir)
+        result.gates = gates
+        if hasattr(qir, 'conditions'):
+            result.conditions = fused_conditions
+        return result
+
+    def _apply_compact(self, qir: CompactQuantumIR) -> CompactQuantumIR:
+        builder = CompactIRBuilder()
+        builder.qubit_count = qir.qubit_count
+        builder.clbit_count = qir.clbit_count
+        for gate, index in self._fused_gates(qir):
+            clbit = gate.clbits[0] if getattr(gate, 'clbits', ()) else -1
+            params = gate.params
+            if index in qir.symbolic:
+                builder.symbolic[builder._n] = params
+                params = (math.nan,) * len(params)
+            builder._append(gate.name, gate.qubits, params, clbit, qir.conditions.get(index))
+        return builder.finish()
+
+    def _fused_gates(self, qir):
+        """Yield (gate, source index); the index is None for gates produced by fusion
+
+        Unfused gates are yielded as the original records.
+        """
+        width = self.max_fused_qubits if self.mode == 'unitary' else 1
+        for item in self._blocks(qir, width):
+            if item[0] == 'gate':
+                yield item[2], item[1]
+                continue
+            block = item[1]
+            if len(block.gates) == 1:
+                yield block.gates[0], None
+                continue
+            fused = self.block_matrix(block)
+            if self.mode == 'unitary':
+                flat = fused.matrix.ravel()
+                params = np.empty(2 * flat.size)
+                params[0::2], params[1::2] = flat.real, flat.imag
+                yield Gate('unitary', fused.qubits, tuple(params.tolist())), None
+                continue
+            theta, phi, lam = zyz_angles(fused.matrix)
+            identity = abs(theta) < self.tolerance and abs(cmath.exp(1j * (phi + lam)) - 1) < self.tolerance
+            if not identity:
+                yield Gate('u3', fused.qubits, (theta, phi, lam)), None
+
+    def fuse_single_qubit_runs(self, ir: CompactQuantumIR) -> CompactQuantumIR:
+        """Array form of the ``'gates'`` mode: collapse single-qubit runs into u3
+
+        A run is a maximal sequence of fusable single-qubit gates with no
+        other operation on that qubit in between; each run of two or more
+        gates is replaced by one u3 at the position of its last gate, or
+        dropped when the product is the identity.
+        """
+        n = len(ir)
+        if n == 0:
+            return ir
+        code_fusable = np.array([
+            name not in NON_UNITARY and (name in _FIXED or name in _PARAMETRIC or name == 'unitary')
+            for name in ir.names
+        ], dtype=bool)
+        single = code_fusable[ir.opcodes] & (ir.arity() == 1)
+        excluded = list(ir.conditions.keys() | ir.symbolic.keys())
+        if excluded:
+            single[excluded] = False
+
+        # Operands ordered by (qubit, time): neighbours are consecutive operations on a qubit
+        gates, qubits = ir.operands()
+        order = np.lexsort((gates, qubits))
+        gates, qubits = gates[order], qubits[order]
+        member = single[gates]
+        follows = np.zeros(len(gates), dtype=bool)
+        follows[1:] = (qubits[1:] == qubits[:-1]) & member[:-1]
+        members = np.flatnonzero(member)
+        run_gates = gates[members]
+        run_ids = np.cumsum(~follows[members]) - 1
+        lengths = np.bincount(run_ids)
+        if len(lengths) == 0 or lengths.max() < 2:
+            return ir
+
+        # Per-gate matrices, built one opcode at a time
+        matrices = np.empty((len(run_gates), 2, 2), dtype=complex)
+        codes = ir.opcodes[run_gates]
+        for code in np.unique(codes):
+            at = np.flatnonzero(codes == code)
+            idx = run_gates[at]
+            count = int(ir.param_count[idx[0]])
+            params = ir.params[ir.param_start[idx][:, None] + np.arange(count)] if count \
+                else np.empty((len(idx), 0))
+            matrices[at] = single_qubit_matrices(ir.names[code], params)
+
+        fused = run_ids[lengths[run_ids] >= 2]
+        keep_ids = np.flatnonzero(lengths >= 2)
+        products = segmented_products(matrices[lengths[run_ids] >= 2], np.searchsorted(keep_ids, fused))
+        ends = np.cumsum(lengths)[keep_ids] - 1
+        last = run_gates[ends]
+        theta, phi, lam = zyz_angles_batch(products)
+        identity = (np.abs(theta) < self.tolerance) & \
+            (np.abs(np.exp(1j * (phi + lam)) - 1) < self.tolerance)
+
+        keep = np.ones(n, dtype=bool)
+        keep[run_gates[lengths[run_ids] >= 2]] = False
+        replaced = last[~identity]
+        keep[replaced] = True
+
+        names = list(ir.names)
+        if 'u3' not in names:
+            names.append('u3')
+        opcodes = ir.opcodes.copy()
+        opcodes[replaced] = names.index('u3')
+        param_start = ir.param_start.copy()
+        param_count = ir.param_count.copy()
+        param_start[replaced] = len(ir.params) + 3 * np.arange(len(replaced))
+        param_count[replaced] = 3
+        angles = np.stack([theta, phi, lam], axis=1)[~identity].ravel()
+        result = CompactQuantumIR(
+            names, opcodes, ir.qubits, ir.clbits, param_start, param_count,
+            np.concatenate([ir.params, angles]), ir.qubit_count, ir.clbit_count,
+            ir.barriers, ir.conditions, ir.symbolic,
+        )
+        return result.select(keep)
@@ -0,0 +1,129 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+from .analysis import AnalysisCache, ir_digest
+
+logger = logging.getLogger('PassManager')
+
+@dataclass
+class PassRecord:
+    """Timing and effect of a single pass execution"""
+    name: str
+    iteration: int
+    elapsed: float = 0.0
+    gates_before: int = 0
+    gates_after: int = 0
+    depth_before: int = 0
+    depth_after: int = 0
+    changed: bool = False
+    skipped: Optional[str] = None
+
+    @property
+    def gate_delta(self) -> int:
+        return self.gates_after - self.gates_before
+
+    @property
+    def depth_delta(self) -> int:
+        return self.depth_after - self.depth_before
+
+def _pass_name(pass_instance) -> str:
+    return getattr(pass_instance, 'name', type(pass_instance).__name__)
+
+def ir_fingerprint(qir) -> str:
+    """Content hash used to detect whether a pass changed the IR (streaming, constant memory)"""
+    return ir_digest(qir)
+
+class PassManager:
+    """Runs optimization passes with timing, change detection and cached analyses
+
+    Passes only need ``apply(qir)``. They may additionally declare:
+      - ``preserves``: analysis names that stay valid when the pass changes the IR
+      - ``is_satisfied(qir, analyses)``: precondition check; the pass is skipped when True
+    """
+
+    def __init__(self, passes: List[Any], fixpoint: bool = False, max_iterations: int = 5):
+        self.passes = list(passes)
+        self.fixpoint = fixpoint
+        self.max_iterations = max_iterations if fixpoint else 1
+        self.analyses = AnalysisCache()
+        self.records: List[PassRecord] = []
+
+    def run(self, qir):
+        """Apply all passes, iterating to a fixpoint while they make progress"""
+        self.records = []
+        self.analyses.clear()
+        fingerprint = ir_fingerprint(qir)
+        # Fingerprint of the IR each pass last left unchanged
+        clean_on: Dict[int, str] = {}
+
+        for iteration in range(1, self.max_iterations + 1):
+            progressed = False
+            for index, pass_instance in enumerate(self.passes):
+                record = PassRecord(_pass_name(pass_instance), iteration)
+                record.gates_before = record.gates_after = self.analyses.get('gate_count', qir)
+                record.depth_before = record.depth_after = self.analyses.get('depth', qir)
+
+                if clean_on.get(index) == fingerprint:
+                    record.skipped = 'unchanged since last run'
+                    self.records.append(record)
+                    continue
+                is_satisfied = getattr(pass_instance, 'is_satisfied', None)
+                if is_satisfied is not None and is_satisfied(qir, self.analyses):
+                    record.skipped = 'precondition holds'
+                    clean_on[index] = fingerprint
+                    self.records.append(record)
+                    continue
+
+                start = time.perf_counter()
+                qir = pass_instance.apply(qir)
+                new_fingerprint = ir_fingerprint(qir)
+                record.elapsed = time.perf_counter() - start
+
+                if new_fingerprint != fingerprint:
+                    record.changed = True
+                    progressed = True
+                    fingerprint = new_fingerprint
+                    self.analyses.invalidate(getattr(pass_instance, 'preserves', ()))
+                    record.gates_after = self.analyses.get('gate_count', qir)
+                    record.depth_after = self.analyses.get('depth', qir)
+                else:
+                    clean_on[index] = fingerprint
+                self.records.append(record)
+                logger.debug(
+                    "%s iter=%d %.3fs gates %+d depth %+d",
+                    record.name, iteration, record.elapsed,
+                    record.gate_delta, record.depth_delta
+                )
+
+            if not progressed:
+                break
+        return qir
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregate per-pass totals over all iterations"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            entry = totals.setdefault(record.name, {
+                'runs': 0, 'skipped': 0, 'changed': 0,
+                'elapsed': 0.0, 'gate_delta': 0, 'depth_delta': 0
+            })
+            if record.skipped:
+                entry['skipped'] += 1
+                continue
+            entry['runs'] += 1
+            entry['changed'] += int(record.changed)
+            entry['elapsed'] += record.elapsed
+            entry['gate_delta'] += record.gate_delta
+            entry['depth_delta'] += record.depth_delta
+        return totals
+
+    def format_report(self) -> str:
+        """Human readable per-pass timing table"""
+        lines = [f"{'pass':<32}{'runs':>6}{'skip':>6}{'time(s)':>10}{'gates':>10}{'depth':>10}"]
+        for name, entry in self.summary().items():
+            lines.append(
+                f"{name:<32}{entry['runs']:>6}{entry['skipped']:>6}"
+                f"{entry['elapsed']:>10.3f}{entry['gate_delta']:>+10}{entry['depth_delta']:>+10}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,460 @@
+import re
+import ast
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Iterator
+
+# name -> (parameter count, qubit count) for qelib1.inc and the builtins U/CX
+QELIB_GATES: Dict[str, Tuple[int, int]] = {
+    'U': (3, 1), 'CX': (0, 2),
+    'u3': (3, 1), 'u2': (2, 1), 'u1': (1, 1), 'u0': (1, 1), 'u': (3, 1), 'p': (1, 1),
+    'id': (0, 1), 'x': (0, 1), 'y': (0, 1), 'z': (0, 1), 'h': (0, 1),
+    's': (0, 1), 'sdg': (0, 1), 't': (0, 1), 'tdg': (0, 1), 'sx': (0, 1), 'sxdg': (0, 1),
+    'rx': (1, 1), 'ry': (1, 1), 'rz': (1, 1),
+    'cx': (0, 2), 'cy': (0, 2), 'cz': (0, 2), 'ch': (0, 2), 'swap': (0, 2), 'csx': (0, 2),
+    'crx': (1, 2), 'cry': (1, 2), 'crz': (1, 2), 'cu1': (1, 2), 'cp': (1, 2),
+    'cu3': (3, 2), 'cu': (4, 2), 'rxx': (1, 2), 'rzz': (1, 2),
+    'ccx': (0, 3), 'cswap': (0, 3), 'rccx': (0, 3),
+    'c3x': (0, 4), 'c3sqrtx': (0, 4), 'rc3x': (0, 4), 'c4x': (0, 5),
+}
+BUILTIN_ALIASES = {'U': 'u', 'CX': 'cx'}
+
+# qelib1 name -> (qiskit.circuit.library class, takes parameters). u0 is an
+# idle of gamma time units with no unitary effect, lowered to an identity.
+QISKIT_GATES: Dict[str, Tuple[str, bool]] = {
+    'u3': ('U3Gate', True), 'u2': ('U2Gate', True), 'u1': ('U1Gate', True),
+    'u0': ('IGate', False), 'u': ('UGate', True), 'p': ('PhaseGate', True),
+    'id': ('IGate', False), 'x': ('XGate', False), 'y': ('YGate', False), 'z': ('ZGate', False),
+    'h': ('HGate', False), 's': ('SGate', False), 'sdg': ('SdgGate', False),
+    't': ('TGate', False), 'tdg': ('TdgGate', False), 'sx': ('SXGate', False), 'sxdg': ('SXdgGate', False),
+    'rx': ('RXGate', True), 'ry': ('RYGate', True), 'rz': ('RZGate', True),
+    'cx': ('CXGate', False), 'cy': ('CYGate', False), 'cz': ('CZGate', False), 'ch': ('CHGate', False),
+    'swap': ('SwapGate', False), 'csx': ('CSXGate', False),
+    'crx': ('CRXGate', True), 'cry': ('CRYGate', True), 'crz': ('CRZGate', True),
+    'cu1': ('CU1Gate', True), 'cp': ('CPhaseGate', True), 'cu3': ('CU3Gate', True),
+    'cu': ('CUGate', True), 'rxx': ('RXXGate', True), 'rzz': ('RZZGate', True),
+    'ccx': ('CCXGate', False), 'cswap': ('CSwapGate', False), 'rccx': ('RCCXGate', False),
+    'c3x': ('C3XGate', False), 'c3sqrtx': ('C3SXGate', False), 'rc3x': ('RC3XGate', False),
+    'c4x': ('C4XGate', False),
+}
+
+_EXPR_FUNCS = {
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'exp': math.exp,
+    'ln': math.log, 'sqrt': math.sqrt, 'pi': math.pi,
+}
+_EXPR_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+               ast.Call, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+_TOKEN_RE = re.compile(r'[;{}]')
+_REG_RE = re.compile(r'^(qreg|creg)\s+([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]$')
+_ARG_RE = re.compile(r'^([A-Za-z_]\w*)\s*(?:\[\s*(\d+)\s*\])?$')
+_CALL_RE = re.compile(r'^([A-Za-z_]\w*)\s*(?:\((.*)\))?\s*(.*)$', re.S)
+_IF_RE = re.compile(r'^if\s*\(\s*([A-Za-z_]\w*)\s*==\s*(\d+)\s*\)\s*(.*)$', re.S)
+_MEASURE_RE = re.compile(r'^measure\s+(.+?)\s*->\s*(.+)$', re.S)
+_GATE_DEF_RE = re.compile(r'^gate\s+([A-Za-z_]\w*)\s*(?:\((.*?)\))?\s*(.*?)\s*$', re.S)
+
+class QasmParseError(Exception):
+    """OpenQASM syntax or semantic error with source location"""
+
+    def __init__(self, message: str, path: str = '<qasm>', line: int = 0, column: int = 0):
+        location = f"{path}:{line}:{column}" if column else f"{path}:{line}"
+        super().__init__(f"{location}: {message}")
+        self.path = path
+        self.line = line
+        self.column = column
+
+class UnsupportedGateError(ValueError):
+    """Raised by a sink for a gate it cannot represent"""
+    pass
+
+@lru_cache(maxsize=4096)
+def _compile_expr(expr: str):
+    """Validate and compile a parameter expression once per distinct string"""
+    tree = ast.parse(expr.replace('^', '**'), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _EXPR_NODES):
+            raise ValueError(f"unsupported expression: {expr}")
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Name):
+            raise ValueError(f"unsupported call in expression: {expr}")
+    return compile(tree, '<qasm-expr>', 'eval')
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas that are not nested in parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    tail = text[start:].strip()
+    if tail:
+        parts.append(tail)
+    return parts
+
+def resolve_qiskit_gate(name: str):
+    """(gate class, takes_params) for a QISKIT_GATES name; None when it has no library class"""
+    from qiskit.circuit import library
+    entry = QISKIT_GATES.get(name)
+    if entry is None:
+        return None
+    gate_class = getattr(library, entry[0], None)
+    if gate_class is None:
+        raise UnsupportedGateError(f"gate {name} is not available in this qiskit version")
+    return gate_class, entry[1]
+
+def qiskit_operation(entry, params):
+    """Instantiate a resolved gate; parameters of gates that take none (u0) are dropped"""
+    gate_class, takes_params = entry
+    return gate_class(*params) if takes_params else gate_class()
+
+class CircuitSink:
+    """Builds a QuantumCircuit directly from parser events"""
+
+    def __init__(self):
+        from qiskit import QuantumCircuit
+        self.circuit = QuantumCircuit()
+        self._qubits = []
+        self._clbits = {}
+        self._gate_classes = {}
+
+    def add_qreg(self, name: str, size: int):
+        from qiskit import QuantumRegister
+        reg = QuantumRegister(size, name)
+        self.circuit.add_register(reg)
+        self._qubits.extend(reg)
+
+    def add_creg(self, name: str, size: int):
+        from qiskit import ClassicalRegister
+        reg = ClassicalRegister(size, name)
+        self.circuit.add_register(reg)
+        self._clbits[name] = reg
+
+    def gate(self, name: str, qubits: Tuple[int, ...], params: Tuple[float, ...],
+             condition: Optional[Tuple[str, int]] = None):
+        gate_class = self._gate_classes.get(name)
+        if gate_class is None:
+            gate_class = self._gate_classes[name] = self._resolve_gate(name)
+        instructions = self.circuit.append(qiskit_operation(gate_class, params),
+                                           [self._qubits[q] for q in qubits])
+        if condition is not None:
+            instructions.c_if(self._clbits[condition[0]], condition[1])
+
+    @staticmethod
+    def _resolve_gate(name: str):
+        entry = resolve_qiskit_gate(name)
+        if entry is None:
+            raise UnsupportedGateError(f"gate {name} has no QuantumCircuit equivalent (opaque or unknown)")
+        return entry
+
+    def measure(self, qubit: int, clbit: Tuple[str, int], condition=None):
+        instructions = self.circuit.measure(self._qubits[qubit], self._clbits[clbit[0]][clbit[1]])
+        if condition is not None:
+            instructions.c_if(self._clbits[condition[0]], condition[1])
+
+    def reset(self, qubit: int, condition=None):
+        instructions = self.circuit.reset(self._qubits[qubit])
+        if condition is not None:
+            instructions.c_if(self._clbits[condition[0]], condition[1])
+
+    def barrier(self, qubits: Tuple[int, ...]):
+        self.circuit.barrier(*(self._qubits[q] for q in qubits))
+
+    def finish(self):
+        return self.circuit
+
+class QasmStreamParser:
+    """Single-pass OpenQASM 2 parser emitting straight into a sink
+
+    The source is read line by line; only register tables and user gate
+    definitions are retained, so memory is bounded by the program header,
+    not by the number of gates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.qregs: Dict[str, Tuple[int, int]] = {}
+        self.cregs: Dict[str, int] = {}
+        self.gate_defs: Dict[str, Tuple[List[str], List[str], List[Tuple[str, List[str], List[str]]]]] = {}
+        self.opaque: Dict[str, None] = {}
+        self.num_qubits = 0
+        self._line = 0
+        self._column = 0
+        self._file = path
+        # Argument and constant-parameter strings repeat heavily in generated files
+        self._arg_cache: Dict[str, List[int]] = {}
+        self._param_cache: Dict[str, Tuple[float, ...]] = {}
+
+    def parse(self, sink=None):
+        sink = CircuitSink() if sink is None else sink
+        self._parse_file(self.path, sink)
+        return sink.finish()
+
+    def _error(self, message: str, column: int = 0):
+        raise QasmParseError(message, self._file, self._line, column)
+
+    def _statements(self, stream) -> Iterator[Tuple[str, str, int, int]]:
+        """Yield (statement, terminator, line, column) tuples; comments removed
+
+        ``column`` is the 1-based column where the statement starts.
+        """
+        buf: List[str] = []
+        start_line = start_column = 0
+        for lineno, line in enumerate(stream, 1):
+            code = line.split('//', 1)[0].strip()
+            if not code:
+                continue
+            indent = len(line) - len(line.lstrip())
+            # Fast path: the common one-statement-per-line layout
+            if not buf and code[-1] == ';' and code.count(';') == 1 and '{' not in code and '}' not in code:
+                yield code[:-1].rstrip(), ';', lineno, indent + 1
+                continue
+            pos = 0
+            for match in _TOKEN_RE.finditer(code):
+                piece = code[pos:match.start()]
+                if piece.strip() and not buf:
+                    start_line = lineno
+                    start_column = indent + pos + len(piece) - len(piece.lstrip()) + 1
+                buf.append(piece)
+                yield ' '.join(buf).strip(), match.group(), start_line or lineno, start_column or indent + pos + 1
+                buf = []
+                start_line = start_column = 0
+                pos = match.end()
+            rest = code[pos:]
+            if rest.strip():
+                if not buf:
+                    start_line = lineno
+                    start_column = indent + pos + len(rest) - len(rest.lstrip()) + 1
+                buf.append(rest)
+        if ''.join(buf).strip():
+            self._line = start_line
+            self._error("unterminated statement (missing ';')")
+
+    def _parse_file(self, path: str, sink):
+        saved = self._file
+        self._file = path
+        with open(path, 'r', encoding='utf-8') as stream:
+            statements = self._statements(stream)
+            for stmt, term, line, column in statements:
+                self._line, self._column = line, column
+                if term == '{':
+                    self._parse_gate_def(stmt, statements)
+                    continue
+                if term == '}':
+                    self._error("unexpected '}'")
+                if not stmt:
+                    continue
+                self._dispatch(stmt, sink)
+        self._file = saved
+
+    def _dispatch(self, stmt: str, sink):
+        head = stmt.split(None, 1)[0].split('(', 1)[0]
+        if head == 'OPENQASM':
+            if not stmt.split()[-1].startswith('2'):
+                self._error(f"unsupported OpenQASM version: {stmt}")
+        elif head == 'include':
+            target = stmt[len('include'):].strip().strip('"')
+            if target != 'qelib1.inc':
+                include = os.path.join(os.path.dirname(self._file), target)
+                if not os.path.exists(include):
+                    self._error(f"include not found: {target}")
+                self._parse_file(include, sink)
+        elif head in ('qreg', 'creg'):
+            match = _REG_RE.match(stmt)
+            if not match:
+                self._error(f"malformed register declaration: {stmt}")
+            kind, name, size = match.group(1), match.group(2), int(match.group(3))
+            if name in self.qregs or name in self.cregs:
+                self._error(f"duplicate register: {name}")
+            if kind == 'qreg':
+                self.qregs[name] = (self.num_qubits, size)
+                self.num_qubits += size
+                sink.add_qreg(name, size)
+            else:
+                self.cregs[name] = size
+                sink.add_creg(name, size)
+        elif head == 'opaque':
+            match = _CALL_RE.match(stmt[len('opaque'):].strip())
+            self.opaque[match.group(1)] = None
+        elif head == 'if':
+            match = _IF_RE.match(stmt)
+            if not match:
+                self._error(f"malformed if statement: {stmt}")
+            creg, value = match.group(1), int(match.group(2))
+            if creg not in self.cregs:
+                self._error(f"undefined classical register: {creg}")
+            self._operation(match.group(3), sink, (creg, value), match.start(3))
+        else:
+            self._operation(stmt, sink, None)
+
+    def _operation(self, stmt: str, sink, condition, offset: int = 0):
+        """``offset`` is the position of ``stmt`` within the full statement (for error columns)"""
+        if stmt.split(None, 1)[0] == 'measure':
+            match = _MEASURE_RE.match(stmt)
+            if not match:
+                self._error(f"malformed measure: {stmt}")
+            qubits = self._resolve_qubits(match.group(1))
+            clbits = self._resolve_clbits(match.group(2))
+            if len(qubits) != len(clbits):
+                self._error("measure register size mismatch")
+            for q, c in zip(qubits, clbits):
+                sink.measure(q, c, condition)
+            return
+        match = _CALL_RE.match(stmt)
+        if not match:
+            self._error(f"malformed statement: {stmt}")
+        name, param_text, arg_text = match.groups()
+        args = [self._resolve_qubits(a) for a in arg_text.split(',')]
+        if name == 'barrier':
+            sink.barrier(tuple(q for group in args for q in group))
+            return
+        if name == 'reset':
+            for q in args[0]:
+                sink.reset(q, condition)
+            return
+        params = self._params(param_text)
+        for qubits in self._broadcast(args):
+            if len(qubits) > 1 and len(set(qubits)) != len(qubits):
+                repeated = next(i for i in range(1, len(qubits)) if qubits[i] in qubits[:i])
+                self._error(f"repeated qubit argument in {name}: {arg_text.split(',')[repeated].strip()}",
+                            self._arg_column(arg_text, repeated, offset + match.start(3)))
+            self._apply(name, qubits, params, sink, condition)
+
+    def _arg_column(self, arg_text: str, index: int, start: int) -> int:
+        """1-based column of the ``index``-th comma-separated argument"""
+        pos = 0
+        for _ in range(index):
+            pos = arg_text.index(',', pos) + 1
+        pos += len(arg_text[pos:]) - len(arg_text[pos:].lstrip())
+        return self._column + start + pos
+
+    def _apply(self, name: str, qubits: Tuple[int, ...], params: Tuple[float, ...], sink, condition):
+        if name in QELIB_GATES:
+            n_params, n_qubits = QELIB_GATES[name]
+            if len(params) != n_params or len(qubits) != n_qubits:
+                self._error(f"gate {name} expects {n_params} parameters and {n_qubits} qubits")
+            self._emit_gate(BUILTIN_ALIASES.get(name, name), qubits, params, sink, condition)
+        elif name in self.gate_defs:
+            param_names, arg_names, body = self.gate_defs[name]
+            if len(params) != len(param_names) or len(qubits) != len(arg_names):
+                self._error(f"gate {name} expects {len(param_names)} parameters and {len(arg_names)} qubits")
+            env = dict(zip(param_names, params))
+            mapping = dict(zip(arg_names, qubits))
+            for sub_name, sub_params, sub_args in body:
+                values = tuple(self._eval(p, env) for p in sub_params)
+                self._apply(sub_name, tuple(mapping[a] for a in sub_args), values, sink, condition)
+        elif name in self.opaque:
+            self._emit_gate(name, qubits, params, sink, condition)
+        else:
+            self._error(f"undefined gate: {name}")
+
+    def _emit_gate(self, name: str, qubits: Tuple[int, ...], params: Tuple[float, ...], sink, condition):
+        try:
+            sink.gate(name, qubits, params, condition)
+        except UnsupportedGateError as e:
+            self._error(str(e), self._column)
+
+    def _parse_gate_def(self, header: str, statements):
+        match = _GATE_DEF_RE.match(header)
+        if not match:
+            self._error(f"malformed gate definition: {header}")
+        name = match.group(1)
+        param_names = _split_top_level(match.group(2) or '')
+        arg_names = _split_top_level(match.group(3))
+        if len(set(arg_names)) != len(arg_names):
+            self._error(f"repeated qubit argument in definition of gate {name}", self._column + match.start(3))
+        body = []
+        for stmt, term, line, column in statements:
+            self._line, self._column = line, column
+            if stmt:
+                if stmt.split(None, 1)[0] == 'barrier':
+                    if term == '}':
+                        break
+                    continue
+                call = _CALL_RE.match(stmt)
+                if not call:
+                    self._error(f"malformed statement in gate {name}: {stmt}")
+                sub_args = _split_top_level(call.group(3))
+                for i, arg in enumerate(sub_args):
+                    if arg not in arg_names:
+                        self._error(f"unknown qubit argument '{arg}' in gate {name}")
+                    if arg in sub_args[:i]:
+                        self._error(f"repeated qubit argument in {call.group(1)}: {arg}",
+                                    self._arg_column(call.group(3), i, call.start(3)))
+                sub_name = call.group(1)
+                if sub_name not in QELIB_GATES and sub_name not in self.gate_defs and sub_name not in self.opaque:
+                    self._error(f"undefined gate: {sub_name}")
+                body.append((sub_name, _split_top_level(call.group(2) or ''), sub_args))
+            if term == '}':
+                break
+            if term == '{':
+                self._error("nested gate definition")
+        else:
+            self._error(f"unterminated gate definition: {name}")
+        self.gate_defs[name] = (param_names, arg_names, body)
+
+    def _params(self, param_text: Optional[str]) -> Tuple[float, ...]:
+        if not param_text:
+            return ()
+        params = self._param_cache.get(param_text)
+        if params is None:
+            params = tuple(self._eval(p, {}) for p in _split_top_level(param_text))
+            if len(self._param_cache) < 65536:
+                self._param_cache[param_text] = params
+        return params
+
+    def _resolve_qubits(self, arg: str) -> List[int]:
+        cached = self._arg_cache.get(arg)
+        if cached is not None:
+            return cached
+        match = _ARG_RE.match(arg.strip())
+        if not match or match.group(1) not in self.qregs:
+            self._error(f"undefined quantum argument: {arg}")
+        offset, size = self.qregs[match.group(1)]
+        if match.group(2) is None:
+            resolved = list(range(offset, offset + size))
+        else:
+            index = int(match.group(2))
+            if index >= size:
+                self._error(f"qubit index out of range: {arg}")
+            resolved = [offset + index]
+        self._arg_cache[arg] = resolved
+        return resolved
+
+    def _resolve_clbits(self, arg: str) -> List[Tuple[str, int]]:
+        match = _ARG_RE.match(arg.strip())
+        if not match or match.group(1) not in self.cregs:
+            self._error(f"undefined classical argument: {arg}")
+        name, size = match.group(1), self.cregs[match.group(1)]
+        if match.group(2) is None:
+            return [(name, i) for i in range(size)]
+        index = int(match.group(2))
+        if index >= size:
+            self._error(f"clbit index out of range: {arg}")
+        return [(name, index)]
+
+    def _broadcast(self, args: List[List[int]]) -> Iterator[Tuple[int, ...]]:
+        if all(len(a) == 1 for a in args):
+            yield tuple(a[0] for a in args)
+            return
+        width = max((len(a) for a in args), default=0)
+        for a in args:
+            if len(a) not in (1, width):
+                self._error("register size mismatch in broadcast")
+        for i in range(width):
+            yield tuple(a[0] if len(a) == 1 else a[i] for a in args)
+
+    def _eval(self, expr: str, env: Dict[str, float]) -> float:
+        try:
+            return float(eval(_compile_expr(expr), {'__builtins__': {}, **_EXPR_FUNCS}, env))
+        except QasmParseError:
+            raise
+        except Exception as e:
+            self._error(f"invalid parameter expression '{expr}': {e}")
+
+def parse_qasm_file(path: str, sink=None):
+    """Parse an OpenQASM 2 file in one streaming pass"""
+    return QasmStreamParser(path).parse(sink)
@@ -0,0 +1,144 @@
+import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Set
+import numpy as np
+from .analysis import circuit_depth, iter_gates, ir_digest
+from .compact_ir import CompactQuantumIR
+
+logger = logging.getLogger('SecurityVerifier')
+
+@dataclass
+class SecurityVerdict:
+    """Outcome of a security verification"""
+    ok: bool
+    reason: str = ''
+    tier: str = 'static'
+    cached: bool = False
+
+# Never fork: the verifier runs inside the multi-threaded compile daemon, and a forked child
+# can deadlock on a lock another thread held. forkserver forks from a clean single-threaded
+# server; spawn where it is unavailable. The check and the IR are pickled to the child.
+_MP = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                                  else 'spawn')
+
+def _run_formal_check(formal_check, qir, policy, conn):
+    """Child-process entry: send back ('ok', bool) or ('error', exception)"""
+    try:
+        conn.send(('ok', bool(formal_check(qir, policy))))
+    except BaseException as e:
+        try:
+            conn.send(('error', e))
+        except Exception:
+            conn.send(('error', RuntimeError(repr(e))))
+    finally:
+        conn.close()
+
+def policy_digest(policy: Dict[str, Any]) -> str:
+    return hashlib.blake2b(json.dumps(policy, sort_keys=True, default=str).encode(),
+                           digest_size=20).hexdigest()
+
+class SecurityVerifier:
+    """Tiered verifier: cheap static checks first, then a memoized formal check
+
+    Each formal check runs in its own child process bounded by ``timeout``;
+    ``formal_check`` must be picklable (a module-level function).
+    A check that overruns is killed, so a hung solver cannot hold up later
+    compilations; the timeout fails closed and is not cached.
+    """
+
+    def __init__(self, policy: Dict[str, Any], formal_check: Callable[[Any, Dict[str, Any]], bool],
+                 timeout: float = 30.0, cache_size: int = 4096):
+        self.policy = policy
+        self.formal_check = formal_check
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._policy_hash = policy_digest(policy)
+        self._verdicts: OrderedDict = OrderedDict()
+        self._running: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def verify(self, qir) -> SecurityVerdict:
+        verdict = self.static_checks(qir)
+        if not verdict.ok:
+            return verdict
+        return self.formal_tier(qir)
+
+    def static_checks(self, qir) -> SecurityVerdict:
+        """Qubit budget, depth limit and forbidden gates"""
+        max_qubits = self.policy.get('max_qubit_usage', 1024)
+        if qir.qubit_count > max_qubits:
+            return SecurityVerdict(False, f"qubit usage {qir.qubit_count} exceeds {max_qubits}")
+
+        forbidden = set(self.policy.get('forbidden_gates', ()))
+        max_depth = self.policy.get('max_circuit_depth')
+        if forbidden and isinstance(qir, CompactQuantumIR):
+            hits = np.flatnonzero(qir.mask(*forbidden))
+            if len(hits):
+                return SecurityVerdict(False, f"forbidden gate: {qir.names[qir.opcodes[hits[0]]]}")
+        elif forbidden:
+            for gate in iter_gates(qir):
+                if gate.name in forbidden:
+                    return SecurityVerdict(False, f"forbidden gate: {gate.name}")
+        if max_depth is not None:
+            depth = circuit_depth(qir)
+            if depth > max_depth:
+                return SecurityVerdict(False, f"circuit depth {depth} exceeds {max_depth}")
+        return SecurityVerdict(True)
+
+    def formal_tier(self, qir) -> SecurityVerdict:
+        """Formal verification memoized by IR hash plus policy hash"""
+        key = (ir_digest(qir), self._policy_hash)
+        if key in self._verdicts:
+            self._verdicts.move_to_end(key)
+            ok = self._verdicts[key]
+            return SecurityVerdict(ok, '' if ok else 'formal verification failed', 'formal', True)
+
+        ok = self._run_isolated(qir)
+        if ok is None:
+            logger.warning("Formal verification timed out after %.1fs", self.timeout)
+            return SecurityVerdict(False, 'formal verification timed out', 'formal')
+
+        self._verdicts[key] = ok
+        if len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+        return SecurityVerdict(ok, '' if ok else 'formal verification failed', 'formal')
+
+    def _run_isolated(self, qir):
+        """Run the formal check in a child process; None on timeout (the child is killed)"""
+        receiver, sender = _MP.Pipe(duplex=False)
+        process = _MP.Process(target=_run_formal_check, name='formal-verify',
+                              args=(self.formal_check, qir, self.policy, sender), daemon=True)
+        with self._lock:
+            self._running.add(process)
+        try:
+            process.start()
+            sender.close()
+            try:
+                status, value = receiver.recv() if receiver.poll(self.timeout) else (None, None)
+            except EOFError:
+                status, value = 'crashed', None
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+            with self._lock:
+                self._running.discard(process)
+        if status == 'crashed':
+            raise RuntimeError(f"formal verification process exited with code {process.exitcode}")
+        if status == 'error':
+            raise value
+        return value
+
+    def shutdown(self):
+        """Kill any formal checks still running"""
+        with self._lock:
+            running = list(self._running)
+        for process in running:
+            if process.is_alive():
+                process.kill()
@@ -0,0 +1,193 @@
+import io
+import math
+from typing import Dict, Any, Callable, List, Union
+from .analysis import iter_gates
+
+FLUSH_BYTES = 1 << 20
+
+class CodegenError(Exception):
+    """Raised when a gate cannot be expressed in the requested target"""
+    pass
+
+class BufferedSink:
+    """Batches small string writes into large binary writes"""
+
+    def __init__(self, output, flush_bytes: int = FLUSH_BYTES):
+        self._owned = False
+        if isinstance(output, str):
+            output = open(output, 'wb')
+            self._owned = True
+        elif hasattr(output, 'sendall') and not hasattr(output, 'write'):
+            output = output.makefile('wb')
+            self._owned = True
+        self._raw = output
+        self._text = isinstance(output, io.TextIOBase)
+        self._parts: List[str] = []
+        self._pending = 0
+        self.flush_bytes = flush_bytes
+        self.bytes_written = 0
+
+    def write(self, text: str):
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self._parts:
+            return
+        data = ''.join(self._parts)
+        self._parts = []
+        self._pending = 0
+        if self._text:
+            self._raw.write(data)
+            self.bytes_written += len(data)
+        else:
+            encoded = data.encode('utf-8')
+            self._raw.write(encoded)
+            self.bytes_written += len(encoded)
+
+    def close(self):
+        self.flush()
+        if self._owned:
+            self._raw.close()
+        elif hasattr(self._raw, 'flush'):
+            self._raw.flush()
+
+class StreamEmitter:
+    """Incremental code emitter: begin once, emit per gate, end once"""
+
+    def begin(self, qir, write: Callable[[str], None]):
+        pass
+
+    def emit(self, index: int, gate, qir, write: Callable[[str], None]):
+        raise NotImplementedError
+
+    def end(self, qir, write: Callable[[str], None]):
+        pass
+
+class QASMStreamEmitter(StreamEmitter):
+    """OpenQASM 2 output over a single q/c register pair"""
+
+    def begin(self, qir, write):
+        write('OPENQASM 2.0;\ninclude "qelib1.inc";\n')
+        write(f"qreg q[{qir.qubit_count}];\n")
+        clbits = getattr(qir, 'clbit_count', 0)
+        if clbits:
+            write(f"creg c[{clbits}];\n")
+        self._conditions = getattr(qir, 'conditions', {})
+
+    def emit(self, index, gate, qir, write):
+        prefix = ''
+        if index in self._conditions:
+            offset, size, value = self._conditions[index]
+            if offset != 0 or size != qir.clbit_count:
+                raise CodegenError(f"QASM conditions must cover the whole register (gate {index})")
+            prefix = f"if(c=={value}) "
+        args = ','.join(f"q[{q}]" for q in gate.qubits)
+        if gate.name == 'measure':
+            write(f"{prefix}measure {args} -> c[{gate.clbits[0]}];\n")
+        elif gate.params:
+            params = ','.join(repr(float(p)) for p in gate.params)
+            write(f"{prefix}{gate.name}({params}) {args};\n")
+        else:
+            write(f"{prefix}{gate.name} {args};\n")
+
+class LLVMStreamEmitter(StreamEmitter):
+    """QIR base-profile LLVM IR; declarations follow the body so gates stream"""
+
+    QIS_NAMES = {
+        'h': 'h', 'x': 'x', 'y': 'y', 'z': 'z', 's': 's', 't': 't',
+        'sdg': 's__adj', 'tdg': 't__adj', 'rx': 'rx', 'ry': 'ry', 'rz': 'rz',
+        'cx': 'cnot', 'cz': 'cz', 'swap': 'swap', 'ccx': 'ccx',
+        'reset': 'reset', 'measure': 'mz',
+    }
+
+    def begin(self, qir, write):
+        write("; ModuleID = 'quantum'\n%Qubit = type opaque\n%Result = type opaque\n\n")
+        write("define void @main() #0 {\nentry:\n")
+        self._declared: Dict[str, str] = {}
+        self._conditions = getattr(qir, 'conditions', {})
+
+    @staticmethod
+    def _qubit(q: int) -> str:
+        return f"%Qubit* inttoptr (i64 {q} to %Qubit*)"
+
+    @staticmethod
+    def _lower(gate):
+        """Rewrite U-family gates into rz/ry (equal up to global phase)"""
+        name, params = gate.name, gate.params
+        if name in ('u1', 'p'):
+            return [('rz', params)]
+        if name == 'u2':
+            name, params = 'u3', (math.pi / 2,) + tuple(params)
+        if name in ('u3', 'u'):
+            theta, phi, lam = params
+            return [('rz', (lam,)), ('ry', (theta,)), ('rz', (phi,))]
+        return [(name, params)]
+
+    def emit(self, index, gate, qir, write):
+        if gate.name == 'barrier':
+            return
+        if index in self._conditions:
+            raise CodegenError(f"Classically conditioned gates are not supported in the QIR base profile (gate {index})")
+        for name, params in self._lower(gate):
+            qis = self.QIS_NAMES.get(name)
+            if qis is None:
+                raise CodegenError(f"Gate '{gate.name}' has no QIR lowering")
+            args = [f"double {float(p)!r}" for p in params]
+            args += [self._qubit(q) for q in gate.qubits]
+            types = ['double'] * len(params) + ['%Qubit*'] * len(gate.qubits)
+            if name == 'measure':
+                args.append(f"%Result* inttoptr (i64 {gate.clbits[0]} to %Result*)")
+                types.append('%Result*')
+            symbol = f"__quantum__qis__{qis}__body"
+            if symbol not in self._declared:
+                self._declared[symbol] = ', '.join(types)
+            write(f"  call void @{symbol}({', '.join(args)})\n")
+
+    def end(self, qir, write):
+        write("  ret void\n}\n\n")
+        for symbol, signature in self._declared.items():
+            write(f"declare void @{symbol}({signature})\n")
+        write('\nattributes #0 = { "EntryPoint" }\n')
+
+class WholeProgramEmitter(StreamEmitter):
+    """Adapter for generators that only offer generate(qir) -> str"""
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def emit(self, index, gate, qir, write):
+        pass
+
+    def end(self, qir, write):
+        write(self.generator.generate(qir))
+
+class StreamingCodeGenerator:
+    """Emits any number of targets in one traversal of the IR"""
+
+    def __init__(self, emitters: Dict[str, StreamEmitter]):
+        self.emitters = emitters
+
+    def generate_to(self, qir, outputs: Dict[str, Union[str, Any]]) -> Dict[str, int]:
+        """Write each target to a path, binary/text file or socket; returns bytes written"""
+        unknown = set(outputs) - set(self.emitters)
+        if unknown:
+            raise CodegenError(f"Unsupported target(s): {', '.join(sorted(unknown))}")
+        sinks = {target: BufferedSink(out) for target, out in outputs.items()}
+        active = [(self.emitters[t], sinks[t].write) for t in outputs]
+        streaming = [(e, w) for e, w in active if not isinstance(e, WholeProgramEmitter)]
+        try:
+            for emitter, write in active:
+                emitter.begin(qir, write)
+            if streaming:
+                for index, gate in enumerate(iter_gates(qir)):
+                    for emitter, write in streaming:
+                        emitter.emit(index, gate, qir, write)
+            for emitter, write in active:
+                emitter.end(qir, write)
+        finally:
+            for sink in sinks.values():
+                sink.close()
+        return {target: sink.bytes_written for target, sink in sinks.items()}
@@ -1,6 +1,14 @@
 import os
+import re
+import sys
+import json
+import mmap
+import zlib
 import logging
 import hashlib
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
 COMMENT_SYMBOLS = {
@@ -27,7 +35,14 @@ EXCLUDE_EXTS = {'.png', '.jpg', '.zip'}
 MAX_SIZE = 1 * 1024 * 1024  # 1MB
 OUTPUT_TEMPLATE = 'code{0}.txt'
 CHECKPOINT_FILE = '.merge_progress'
-CHUNK_SIZE = 8192
+HASH_CACHE_FILE = '.merge_cache.json'
+READ_SIZE = 1 << 20
+WRITE_BUFFER = 1 << 20
+HASH_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+INDEX_FILE = 'code_index.jsonl'
+INDEX_VERSION = 1
+CODEC_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+OUTPUT_PATTERN = re.compile(re.escape(OUTPUT_TEMPLATE).replace(r'\{0\}', r'\d+') + r'(\.gz|\.zst)?(\.tmp)?')
 
 def get_comment_symbol(filename):
     _, ext = os.path.splitext(filename)
@@ -37,92 +52,364 @@ def get_comment_symbol(filename):
     return COMMENT_SYMBOLS.get(ext, DEFAULT_SYMBOL)
 
 def file_hash(file_path):
-    h = hashlib.md5()
+    h = hashlib.blake2b(digest_size=16)
     with open(file_path, 'rb') as f:
-        while chunk := f.read(CHUNK_SIZE):
+        while chunk := f.read(READ_SIZE):
             h.update(chunk)
     return h.hexdigest()
 
-def write_chunk(output_file, content_chunk):
+def write_chunk(output_file, data):
     try:
-        output_file.write(''.join(content_chunk))
-        output_file.flush()
+        output_file.write(data)
     except IOError as e:
         logging.error(f"写入失败: {str(e)}")
         raise
 
-def merge_files(root_dir):
-    processed_hashes = set()
-    code_num = 1
-    current_size = 0
-    current_output = None
-    
-    # 加载进度
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, 'r') as f:
-            processed_hashes = set(line.strip() for line in f)
+def is_generated_file(file_path):
+    """本脚本自身的输出、缓存与进度文件不参与合并"""
+    path = os.path.abspath(file_path)
+    if os.path.dirname(path) != os.getcwd():
+        return False
+    name = os.path.basename(path)
+    return name in (CHECKPOINT_FILE, HASH_CACHE_FILE, HASH_CACHE_FILE + '.tmp', INDEX_FILE, INDEX_FILE + '.tmp') or \
+        OUTPUT_PATTERN.fullmatch(name) is not None
 
+def collect_files(root_dir):
+    """按遍历顺序收集待合并文件 (路径, 注释符号)"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_DIRS]
+        for filename in filenames:
+            if is_generated_file(os.path.join(dirpath, filename)):
+                continue
+            comment_symbol = get_comment_symbol(filename)
+            if comment_symbol:
+                files.append((os.path.join(dirpath, filename), comment_symbol))
+    return files
+
+def load_hash_cache(cache_path=HASH_CACHE_FILE):
+    try:
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'files': {}, 'bundles': {}, 'outputs': []}
+
+def save_hash_cache(cache, cache_path=HASH_CACHE_FILE):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+def hash_files(paths, stat_cache):
+    """stat 命中 (size, mtime_ns) 的文件直接复用哈希，其余在线程池中并行计算"""
+    hashes, misses, stats = {}, [], {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            logging.warning(f"跳过文件 {path}: {str(e)}")
+            continue
+        stats[path] = (st.st_size, st.st_mtime_ns)
+        cached = stat_cache.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            hashes[path] = cached[2]
+        else:
+            misses.append(path)
+
+    def _hash(path):
+        try:
+            return path, file_hash(path)
+        except OSError as e:
+            logging.warning(f"跳过文件 {path}: {str(e)}")
+            return path, None
+
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        for path, digest in pool.map(_hash, misses):
+            if digest is not None:
+                hashes[path] = digest
+
+    new_cache = {p: [*stats[p], h] for p, h in hashes.items()}
+    return hashes, new_cache, len(misses)
+
+def _frame_encoder(codec):
+    """每个文件独立成帧，便于按偏移单独解压"""
+    if codec == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd 压缩需要安装 zstandard 包")
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+def _frame_decode(codec, data):
+    if codec == 'gzip':
+        return zlib.decompress(data, 31)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+def bundle_number(name):
+    return int(re.match(r'\D*(\d+)', name).group(1))
+
+def bundle_signature(codec, members):
+    """分卷内容由 codec 与有序成员 [(相对路径, 哈希)] 唯一确定"""
+    return hashlib.blake2b(json.dumps([codec, members]).encode('utf-8'), digest_size=16).hexdigest()
+
+def load_checkpoint(checkpoint_path=CHECKPOINT_FILE):
+    """上次中断的运行中已完整写出的分卷记录 {分卷名: 记录}"""
+    records = {}
     try:
-        with open(CHECKPOINT_FILE, 'a') as progress:
-            for dirpath, dirnames, filenames in os.walk(root_dir):
-                dirnames[:] = [d for d in dirnames if d not in EXCLUDE_DIRS]
-                
-                for filename in filenames:
-                    file_path = os.path.join(dirpath, filename)
-                    comment_symbol = get_comment_symbol(filename)
-                    if not comment_symbol:
-                        continue
-
-                    try:
-                        file_hash_value = file_hash(file_path)
-                        if file_hash_value in processed_hashes:
-                            continue
-                        
-                        header = f"{comment_symbol} File: {filename}\n{comment_symbol}\n"
-                        content_chunk = [header]
-                        
-                        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                            for line in f:
-                                content_chunk.append(line)
-                                current_chunk_size = sum(len(c) for c in content_chunk)
-                                
-                                if current_chunk_size >= CHUNK_SIZE:
-                                    if current_output is None or current_size + current_chunk_size > MAX_SIZE:
-                                        if current_output:
-                                            current_output.close()
-                                        output_path = OUTPUT_TEMPLATE.format(code_num)
-                                        current_output = open(output_path, 'w', encoding='utf-8')
-                                        code_num += 1
-                                        current_size = 0
-                                    write_chunk(current_output, content_chunk)
-                                    current_size += current_chunk_size
-                                    content_chunk = []
-                            
-                            if content_chunk:
-                                if current_output is None or current_size + sum(len(c) for c in content_chunk) > MAX_SIZE:
-                                    if current_output:
-                                        current_output.close()
-                                    output_path = OUTPUT_TEMPLATE.format(code_num)
-                                    current_output = open(output_path, 'w', encoding='utf-8')
-                                    code_num += 1
-                                    current_size = 0
-                                write_chunk(current_output, content_chunk)
-                                current_size += sum(len(c) for c in content_chunk)
-                                
-                        progress.write(f"{file_hash_value}\n")
-                        progress.flush()
-                        processed_hashes.add(file_hash_value)
-                        
-                    except (UnicodeDecodeError, OSError) as e:
-                        logging.warning(f"跳过文件 {file_path}: {str(e)}")
-                        continue
-
-    finally:
-        if current_output:
-            current_output.close()
-        if os.path.exists(CHECKPOINT_FILE):
-            os.remove(CHECKPOINT_FILE)
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # 中断时写了一半的行
+                records[record['bundle']] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+def plan_bundles(units, previous, output_template):
+    """把唯一内容单元分配到分卷: [(分卷名, [单元...])]
+
+    单元为 (相对路径, 哈希, 预估大小)。``previous`` 为上次的分卷记录:
+    成员仍然存在的分卷保留原有成员(未变化的分卷因此可以原样复用)，
+    新增或修改的单元优先填入本来就要重写的分卷，放不下再开新分卷。
+    """
+    by_key = {(u[0], u[1]): u for u in units}
+    plan, dirty, assigned = [], [], set()
+    for name in sorted(previous, key=bundle_number):
+        members = [tuple(m) for m in previous[name]['members']]
+        kept = [by_key[m] for m in members if m in by_key]
+        if not kept:
+            continue
+        plan.append((name, kept))
+        assigned.update((u[0], u[1]) for u in kept)
+        if len(kept) != len(members):
+            dirty.append(len(plan) - 1)
+    next_number = max((bundle_number(name) for name, _ in plan), default=0) + 1
+    sizes = {i: sum(u[2] for u in plan[i][1]) for i in dirty}
+    current = None
+    for unit in units:
+        if (unit[0], unit[1]) in assigned:
+            continue
+        target = next((i for i in dirty if sizes[i] == 0 or sizes[i] + unit[2] <= MAX_SIZE), None)
+        if target is None:
+            plan.append((output_template.format(next_number), []))
+            next_number += 1
+            target = len(plan) - 1
+            dirty.append(target)
+            sizes[target] = 0
+        plan[target][1].append(unit)
+        sizes[target] += unit[2]
+        # 写满的分卷不再参与填充
+        if sizes[target] >= MAX_SIZE:
+            dirty.remove(target)
+    return plan
+
+def write_bundle(name, units, sources, codec):
+    """写出一个分卷(先写临时文件再原子替换)，返回其记录
+
+    记录中的成员哈希为实际写入字节的哈希；文件在哈希之后又被修改时与计划不同，
+    下次运行会因签名不符而重写该分卷。
+    """
+    tmp_path = name + '.tmp'
+    members, entries, offset = [], [], 0
+    with open(tmp_path, 'wb', buffering=WRITE_BUFFER) as out:
+        for rel_path, planned_hash, _ in units:
+            file_path, comment_symbol = sources[(rel_path, planned_hash)]
+            header = f"{comment_symbol} File: {rel_path}\n{comment_symbol}\n".encode('utf-8')
+            encoder = _frame_encoder(codec)
+            encode = encoder.compress if encoder else (lambda b: b)
+            start = offset
+            try:
+                offset += _write(out, encode(header))
+                # 原始字节原样写入(保留 CRLF 与非 UTF-8 字节)，哈希的正是写入的字节
+                h = hashlib.blake2b(digest_size=16)
+                with open(file_path, 'rb') as f:
+                    while chunk := f.read(READ_SIZE):
+                        h.update(chunk)
+                        offset += _write(out, encode(chunk))
+                if encoder:
+                    offset += _write(out, encoder.flush())
+            except OSError as e:
+                if not os.path.exists(file_path):
+                    # 哈希之后被删除: 回退已写出的部分，成员记为缺失(下次运行签名不符会重写)
+                    logging.warning(f"跳过文件 {file_path}: {str(e)}")
+                    out.seek(start)
+                    out.truncate()
+                    offset = start
+                    members.append([rel_path, None])
+                    entries.append(None)
+                    continue
+                raise
+            if h.hexdigest() != planned_hash:
+                logging.warning(f"文件在合并过程中发生变化: {file_path}")
+            members.append([rel_path, h.hexdigest()])
+            entries.append({'offset': start, 'length': offset - start, 'header_length': len(header)})
+    os.replace(tmp_path, name)
+    return {'bundle': name, 'signature': bundle_signature(codec, members),
+            'members': members, 'entries': entries}
+
+def _write(output_file, data):
+    if data:
+        write_chunk(output_file, data)
+    return len(data)
+
+def merge_files(root_dir, incremental=False, codec='none'):
+    """合并源码为分卷 + 索引
+
+    内容相同的文件只存一份。``incremental`` 时沿用上次的分卷划分，只重写成员有变化的分卷；
+    每写完一个分卷即记入进度文件，中断后再次运行会复用已完成的分卷。
+    不再对应任何源文件的旧分卷会被删除。
+    """
+    output_template = OUTPUT_TEMPLATE + CODEC_SUFFIXES[codec]
+    _frame_encoder(codec)  # 缺少可选依赖时在写任何输出之前失败
+
+    files = collect_files(root_dir)
+    cache = load_hash_cache()
+    hashes, stat_cache, changed = hash_files([p for p, _ in files], cache['files'] if incremental else {})
+    if incremental:
+        logging.info(f"{len(files)} 个文件，{changed} 个需要重新计算哈希")
+
+    # 唯一内容单元: 同一哈希只存一次，合并头使用第一次出现的路径
+    units, sources, first_path = [], {}, {}
+    for file_path, comment_symbol in files:
+        digest = hashes.get(file_path)
+        if digest is None or digest in first_path:
+            continue
+        rel_path = os.path.relpath(file_path, root_dir).replace(os.sep, '/')
+        first_path[digest] = rel_path
+        header_size = len(f"{comment_symbol} File: {rel_path}\n{comment_symbol}\n".encode('utf-8'))
+        units.append((rel_path, digest, header_size + stat_cache[file_path][0]))
+        sources[(rel_path, digest)] = (file_path, comment_symbol)
+
+    previous = cache.get('bundles', {}) if cache.get('codec', 'none') == codec else {}
+    checkpoint = load_checkpoint()
+    plan = plan_bundles(units, previous if incremental else {}, output_template)
+
+    bundles, rewritten = {}, 0
+    with open(CHECKPOINT_FILE, 'a', encoding='utf-8') as progress:
+        for name, members in plan:
+            signature = bundle_signature(codec, [[u[0], u[1]] for u in members])
+            # 中断运行写出的记录反映磁盘上的最新内容，优先于上次完成时的缓存
+            record = checkpoint.get(name) or (previous.get(name) if incremental else None)
+            if not record or record['signature'] != signature or not os.path.exists(name):
+                record = write_bundle(name, members, sources, codec)
+                progress.write(json.dumps(record) + '\n')
+                progress.flush()
+                rewritten += 1
+            bundles[name] = record
+    logging.info(f"{len(plan)} 个分卷，重写 {rewritten} 个")
+
+    # 删除不再对应任何源文件的旧输出(上次的分卷与中断运行留下的分卷)
+    for name in set(cache.get('outputs', [])) | set(previous) | set(checkpoint):
+        if name != INDEX_FILE and name not in bundles and is_generated_file(name):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(name)
+
+    locations = {}
+    for name, members in plan:
+        record = bundles[name]
+        for (rel_path, planned_hash, _), (_, digest), entry in zip(members, record['members'], record['entries']):
+            if digest != planned_hash:
+                # 写入时内容已变化或文件已删除，下次运行重新计算该文件的哈希
+                stat_cache.pop(sources[(rel_path, planned_hash)][0], None)
+            if entry is not None:
+                locations[planned_hash] = {'hash': digest, 'bundle': name, **entry}
+    index = []
+    for file_path, _ in files:
+        digest = hashes.get(file_path)
+        if digest in locations:
+            rel_path = os.path.relpath(file_path, root_dir).replace(os.sep, '/')
+            index.append({'path': rel_path, **locations[digest]})
+
+    write_index(index, codec)
+    outputs = [name for name, _ in plan] + [INDEX_FILE]
+    save_hash_cache({'files': stat_cache, 'codec': codec, 'bundles': bundles, 'outputs': outputs})
+    os.remove(CHECKPOINT_FILE)
+    return outputs
+
+def write_index(entries, codec, index_path=INDEX_FILE):
+    """索引旁路文件: 首行为元信息，其后每个文件一行"""
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'version': INDEX_VERSION, 'codec': codec}) + '\n')
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, index_path)
+
+class BundleReader:
+    """通过索引随机读取分卷中的单个文件 (mmap 或 seek)"""
+
+    def __init__(self, index_path=INDEX_FILE, use_mmap=True):
+        self.base_dir = os.path.dirname(os.path.abspath(index_path))
+        self.use_mmap = use_mmap
+        self.entries = {}
+        self._maps = {}
+        with open(index_path, 'r', encoding='utf-8') as f:
+            meta = json.loads(f.readline())
+            if meta.get('version') != INDEX_VERSION:
+                raise ValueError(f"不支持的索引版本: {meta.get('version')}")
+            self.codec = meta['codec']
+            for line in f:
+                entry = json.loads(line)
+                self.entries[entry['path']] = entry
+
+    def paths(self):
+        return list(self.entries)
+
+    def _raw(self, entry):
+        bundle_path = os.path.join(self.base_dir, entry['bundle'])
+        start, length = entry['offset'], entry['length']
+        if not self.use_mmap:
+            with open(bundle_path, 'rb') as f:
+                f.seek(start)
+                return f.read(length)
+        if bundle_path not in self._maps:
+            with open(bundle_path, 'rb') as f:
+                self._maps[bundle_path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[bundle_path][start:start + length]
+
+    def read(self, rel_path):
+        """返回文件原始内容 (不含合并头)"""
+        entry = self.entries.get(rel_path)
+        if entry is None:
+            raise KeyError(f"索引中不存在: {rel_path}")
+        data = _frame_decode(self.codec, self._raw(entry))
+        return data[entry['header_length']:]
+
+    def read_text(self, rel_path):
+        return self.read(rel_path).decode('utf-8')
+
+    def close(self):
+        for m in self._maps.values():
+            m.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='合并源码文件为 code{N}.txt')
+    parser.add_argument('root', nargs='?', default='.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='复用 stat 缓存与上次的分卷划分，只重写内容有变化的分卷')
+    parser.add_argument('--compress', choices=sorted(CODEC_SUFFIXES), default='none',
+                        help='分卷压缩格式 (每个文件独立成帧)')
+    parser.add_argument('--extract', metavar='PATH',
+                        help='根据索引从已有分卷中提取单个文件并输出')
+    args = parser.parse_args()
     logging.basicConfig(level=logging.INFO)
-    merge_files('.')
+    if args.extract:
+        with BundleReader() as reader:
+            sys.stdout.buffer.write(reader.read(args.extract))
+    else:
+        merge_files(args.root, incremental=args.incremental, codec=args.compress)
@@ -5,27 +5,35 @@ Quantum Compiler CLI Package Initialization
 __version__ = "2.3.0"
 __all__ = ['main', 'commands', 'compile', 'verify', 'debug']
 
-from .main import cli
-from .commands import (
-    compile_cmd,
-    verify_cmd,
-    debug_cmd
-)
+# Everything is resolved on first attribute access so that importing the
+# package (e.g. for ``--help`` or ``healthcheck``) stays cheap.
+_LAZY_ATTRS = {
+    'cli': ('.main', 'cli'),
+    'compile_cmd': ('.main', 'compile_cmd'),
+    'verify_cmd': ('.main', 'verify_cmd'),
+    'debug_cmd': ('.main', 'debug_cmd'),
+}
+
+def __getattr__(name):
+    import importlib
+    if name in _LAZY_ATTRS:
+        module_name, attr = _LAZY_ATTRS[name]
+        return getattr(importlib.import_module(module_name, __name__), attr)
+    if name in ('main', 'commands'):
+        return importlib.import_module(f'.{name}', __name__)
+    if name in ('compile', 'verify', 'debug'):
+        return importlib.import_module(f'.commands.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def init_cli():
-    """Initialize CLI components"""
-    # Register all commands
+    """Initialize CLI components (call from the entry point, not at import)"""
+    # Commands are registered on the group by main.py itself
     from .main import cli
-    cli.add_command(compile_cmd)
-    cli.add_command(verify_cmd)
-    cli.add_command(debug_cmd)
-    
+
     # Configure logging
     import logging
     logging.basicConfig(
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         level=logging.INFO
     )
-
-# Auto-initialize when imported
-init_cli()
+    return cli
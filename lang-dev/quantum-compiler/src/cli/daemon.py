@@ -0,0 +1,334 @@
+"""
+Persistent compile daemon and its thin client.
+
+Wire format: every message is a 4-byte big-endian length followed by a
+UTF-8 JSON object. Requests look like ``{"op": "compile", "args": {...}}``;
+responses are ``{"ok": true, "result": ...}`` or
+``{"ok": false, "error": "...", "code": ...}``.
+
+compile/verify/run requests carry ``config_digest``, the hash of the client's
+config file; the daemon refuses with code ``config_mismatch`` when it was
+loaded from a different configuration, and the client then compiles locally.
+
+The CLI uses the ``run`` op: the daemon calls the same command function the
+CLI would run locally and returns ``{"stdout", "stderr", "exit_code"}``, so
+the client reproduces its output and exit status exactly.
+"""
+
+import io
+import os
+import sys
+import json
+import queue
+import socket
+import struct
+import logging
+import traceback
+import threading
+import socketserver
+import contextlib
+from typing import Dict, Any, Optional
+import click
+from .main import DEFAULT_SOCKET, load_config, config_digest
+
+DEFAULT_POLICY = '/opt/compiler/config/security.policy'
+MAX_MESSAGE = 64 * 1024 * 1024
+# Error code telling the client to compile locally instead
+CONFIG_MISMATCH = 'config_mismatch'
+
+logger = logging.getLogger('CompileDaemon')
+
+class DaemonError(Exception):
+    """Raised for protocol failures or errors reported by the daemon"""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+def send_message(sock: socket.socket, payload: Dict[str, Any]):
+    data = json.dumps(payload).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            raise DaemonError("connection closed mid-message")
+        buf.extend(chunk)
+    return bytes(buf)
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    header = sock.recv(4, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < 4:
+        raise DaemonError("truncated frame header")
+    (size,) = struct.unpack('!I', header)
+    if size > MAX_MESSAGE:
+        raise DaemonError(f"message too large: {size} bytes")
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+class _ThreadLocalStream(io.TextIOBase):
+    """Process-wide stdout/stderr replacement writing to a per-thread buffer while one is set,
+    so concurrent requests capture their own output without serialising on a lock"""
+
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+
+    @property
+    def _current(self):
+        return getattr(self._local, 'buffer', None) or self._target
+
+    def write(self, text):
+        return self._current.write(text)
+
+    def flush(self):
+        self._current.flush()
+
+    def writable(self):
+        return True
+
+    @contextlib.contextmanager
+    def capture(self):
+        self._local.buffer = buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+def _install_capture():
+    for name in ('stdout', 'stderr'):
+        if not isinstance(getattr(sys, name), _ThreadLocalStream):
+            setattr(sys, name, _ThreadLocalStream(getattr(sys, name)))
+
+def run_captured(func, *args) -> Dict[str, Any]:
+    """Run a CLI command function, returning its output and the exit status the CLI would have"""
+    _install_capture()
+    exit_code = 0
+    with sys.stdout.capture() as out, sys.stderr.capture() as err:
+        try:
+            func(*args)
+        except SystemExit as e:
+            if isinstance(e.code, int) or e.code is None:
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    return {'stdout': out.getvalue(), 'stderr': err.getvalue(), 'exit_code': exit_code}
+
+def _command(name: str):
+    if name == 'compile':
+        from .commands import compile
+        return lambda args, config: compile.run_compilation(args['input_file'], args['target'], config)
+    if name == 'verify':
+        from .commands import verify
+        return lambda args, config: verify.verify_contract(args['contract_file'], args.get('formal', False), config)
+    raise DaemonError(f"unknown command: {name}")
+
+class _PipelinePool:
+    """Fixed set of warm CompilerPipeline instances, one per concurrent request"""
+
+    def __init__(self, config: Dict[str, Any], size: int, digest: Optional[str] = None):
+        from ..core.compile import CompilerPipeline
+        self.config = config
+        self.digest = digest
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(size):
+            self._free.put(CompilerPipeline(config))
+
+    @contextlib.contextmanager
+    def lease(self):
+        pipeline = self._free.get()
+        try:
+            yield pipeline
+        finally:
+            self._free.put(pipeline)
+
+class _DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class CompileDaemon:
+    """Long-lived process serving compile/verify requests over a Unix socket"""
+
+    def __init__(self, config_path: str, socket_path: str = DEFAULT_SOCKET,
+                 max_concurrency: int = 4, policy_path: str = DEFAULT_POLICY,
+                 reload_interval: float = 2.0, request_timeout: float = 300.0):
+        self.config_path = config_path
+        self.socket_path = socket_path
+        self.max_concurrency = max_concurrency
+        self.policy_path = policy_path
+        self.reload_interval = reload_interval
+        self.request_timeout = request_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stop = threading.Event()
+        self._mtimes: Dict[str, float] = {}
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._load()
+
+    def _watched_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in (self.config_path, self.policy_path):
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _load(self):
+        """(Re)build config and warm pipelines; in-flight requests keep the old pool"""
+        self._mtimes = self._watched_mtimes()
+        digest = config_digest(self.config_path)
+        config = load_config(self.config_path)
+        self.pool = _PipelinePool(config, self.max_concurrency, digest)
+        logger.info("Loaded %d warm pipelines from %s", self.max_concurrency, self.config_path)
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            if self._watched_mtimes() != self._mtimes:
+                try:
+                    self._load()
+                except (Exception, SystemExit) as e:
+                    logger.error("Reload failed, keeping previous configuration: %s", e)
+                    self._mtimes = self._watched_mtimes()
+
+    def handle(self, request: Dict[str, Any]) -> Any:
+        op = request.get('op')
+        args = request.get('args', {})
+        if op == 'ping':
+            return 'pong'
+        if op == 'reload':
+            self._load()
+            return 'reloaded'
+        if not self._slots.acquire(timeout=self.request_timeout):
+            raise DaemonError("server busy")
+        try:
+            pool = self.pool
+            if args.get('config_digest') != pool.digest:
+                raise DaemonError(f"daemon was started with a different configuration ({self.config_path})",
+                                  CONFIG_MISMATCH)
+            if op == 'compile':
+                with pool.lease() as pipeline:
+                    if args.get('output'):
+                        return pipeline.compile_to(args['input_file'], {args['target']: args['output']})
+                    return pipeline.compile(args['input_file'], args['target'])
+            if op == 'run':
+                return run_captured(_command(args.get('command')), args, pool.config)
+            if op == 'verify':
+                # verify_contract reports on stdout; return what it printed
+                return run_captured(_command('verify'), args, pool.config)['stdout']
+            raise DaemonError(f"unknown op: {op}")
+        finally:
+            self._slots.release()
+
+    def serve_forever(self):
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = recv_message(self.request)
+                    except (DaemonError, ValueError) as e:
+                        send_message(self.request, {'ok': False, 'error': str(e)})
+                        return
+                    if request is None:
+                        return
+                    try:
+                        response = {'ok': True, 'result': daemon.handle(request)}
+                    except (Exception, SystemExit) as e:
+                        response = {'ok': False, 'error': str(e), 'code': getattr(e, 'code', None)}
+                    send_message(self.request, response)
+
+        if os.path.exists(self.socket_path):
+            if _daemon_alive(self.socket_path):
+                raise DaemonError(f"a compile daemon is already listening on {self.socket_path}")
+            # Stale socket left by a daemon that did not shut down cleanly
+            os.unlink(self.socket_path)
+        # Create the socket file owner-only from the start (no window with default permissions)
+        umask = os.umask(0o177)
+        try:
+            self._server = _DaemonServer(self.socket_path, Handler)
+        finally:
+            os.umask(umask)
+        threading.Thread(target=self._watch, name='config-watch', daemon=True).start()
+        logger.info("Compile daemon listening on %s", self.socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            # Only the daemon that bound the socket removes it
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+def _daemon_alive(socket_path: str) -> bool:
+    """True when a daemon answers ping on ``socket_path``"""
+    client = DaemonClient.connect(socket_path, timeout=2.0)
+    if client is None:
+        return False
+    with client:
+        try:
+            return client.request('ping') == 'pong'
+        except (DaemonError, OSError, ValueError):
+            return False
+
+class DaemonClient:
+    """Thin client; ``connect`` returns None when no daemon is running"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    @classmethod
+    def connect(cls, socket_path: str = DEFAULT_SOCKET, timeout: float = 300.0) -> Optional['DaemonClient']:
+        if not os.path.exists(socket_path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self, op: str, **args) -> Any:
+        send_message(self.sock, {'op': op, 'args': args})
+        response = recv_message(self.sock)
+        if response is None:
+            raise DaemonError("daemon closed the connection")
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'unknown error'), response.get('code'))
+        return response.get('result')
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+@click.command('serve')
+@click.option('--max-concurrency', default=4, show_default=True, help='最大并发请求数')
+@click.option('--reload-interval', default=2.0, show_default=True, help='配置文件变更检查间隔(秒)')
+@click.pass_context
+def serve_command(ctx, max_concurrency, reload_interval):
+    """启动常驻编译守护进程"""
+    daemon = CompileDaemon(
+        ctx.obj['config_path'],
+        socket_path=ctx.obj['socket'],
+        max_concurrency=max_concurrency,
+        reload_interval=reload_interval
+    )
+    daemon.serve_forever()
@@ -0,0 +1,58 @@
+"""
+Import-time profiling for the compiler CLI.
+
+Runs a fresh interpreter with ``-X importtime`` and reports the cumulative
+import cost of each module, so start-up regressions can be traced to the
+module that pulled in a heavy dependency.
+"""
+
+import os
+import re
+import sys
+import subprocess
+from typing import List, Tuple
+import click
+
+CLI_MODULE = 'src.cli.main'
+# quantum-compiler/ is the import root for ``src.cli``
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ('qiskit', 'qiskit_aer', 'numpy', 'scipy', 'onnxruntime', 'torch', 'tensorflow')
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure_imports(module: str = CLI_MODULE, cwd: str = PACKAGE_ROOT) -> List[Tuple[str, float, float, int]]:
+    """Return (module, self_seconds, cumulative_seconds, nesting) per imported module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return entries
+
+def total_import_time(entries: List[Tuple[str, float, float, int]]) -> float:
+    """Sum of cumulative time over top-level imports"""
+    return sum(cumulative for _, _, cumulative, nesting in entries if nesting == 0)
+
+def heavy_imports(entries: List[Tuple[str, float, float, int]]) -> List[str]:
+    return sorted({name for name, _, _, _ in entries if name.split('.')[0] in HEAVY_MODULES})
+
+@click.command('import-report')
+@click.option('--module', default=CLI_MODULE, show_default=True, help='要分析的模块')
+@click.option('--top', default=20, show_default=True, help='显示耗时最多的模块数')
+def import_report_command(module, top):
+    """导入耗时报告(按模块累计耗时排序)"""
+    entries = measure_imports(module)
+    click.echo(f"{'cumulative(ms)':>15}{'self(ms)':>10}  module")
+    for name, self_s, cumulative, _ in sorted(entries, key=lambda e: e[2], reverse=True)[:top]:
+        click.echo(f"{cumulative * 1000:>15.1f}{self_s * 1000:>10.1f}  {name}")
+    click.echo(f"总导入耗时: {total_import_time(entries) * 1000:.1f} ms")
+    heavy = heavy_imports(entries)
+    if heavy:
+        click.echo(f"重量级依赖: {', '.join(heavy)}")
@@ -1,8 +1,15 @@
 import click
-from .commands import compile, verify, debug
+import hashlib
+import importlib
 import json
+import os
 import sys
 
+# 命令模块(及其依赖的 qiskit)在分发时才导入，--help / healthcheck 保持轻量
+DEFAULT_SOCKET = os.environ.get('QC_DAEMON_SOCKET', '/tmp/quantum-compiler.sock')
+# 量子 IR 核心库(Dockerfile 从 src/core/quantum_ir 构建并安装)
+QUANTUM_CORE_LIB = os.environ.get('QC_QUANTUM_LIB', '/opt/compiler/lib/libquantum.so')
+
 def load_config(config_path):
     """加载配置文件"""
     try:
@@ -12,25 +19,86 @@ def load_config(config_path):
         print(f"加载配置文件失败: {str(e)}")
         sys.exit(1)
 
-@click.group()
-@click.option('--config', default='/opt/compiler/config/quantum.cfg', 
+def config_digest(config_path):
+    """配置文件内容哈希；客户端与守护进程据此确认使用同一份配置(文件不存在时为 None)"""
+    try:
+        with open(config_path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+def get_config(ctx):
+    """首次使用时才加载配置"""
+    if 'config' not in ctx.obj:
+        ctx.obj['config'] = load_config(ctx.obj['config_path'])
+    return ctx.obj['config']
+
+class LazyGroup(click.Group):
+    """按需导入子命令: lazy_subcommands = {名称: '模块:属性'}"""
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            module_name, attr = self.lazy_subcommands[cmd_name].split(':')
+            module = importlib.import_module(module_name, __package__)
+            return getattr(module, attr)
+        return super().get_command(ctx, cmd_name)
+
+def call_daemon(ctx, command, **args):
+    """在守护进程中执行与本地相同的命令函数，原样还原其输出与退出码(不返回)；
+    无可用守护进程、其配置与本地不一致、或连接中途失败/超时时返回 None(回退到本地执行)"""
+    if ctx.obj.get('no_daemon') or not os.path.exists(ctx.obj['socket']):
+        return None
+    from .daemon import DaemonClient, DaemonError
+    client = DaemonClient.connect(ctx.obj['socket'])
+    if client is None:
+        return None
+    with client:
+        try:
+            result = client.request('run', command=command,
+                                    config_digest=config_digest(ctx.obj['config_path']), **args)
+        except (DaemonError, OSError, ValueError):
+            # 配置不一致(config_mismatch)、繁忙、套接字失效、守护进程中途退出或超时
+            # (socket.timeout 是 OSError)；命令本身的失败已体现在 exit_code 中
+            return None
+    click.echo(result['stdout'], nl=False)
+    click.echo(result['stderr'], nl=False, err=True)
+    sys.exit(result['exit_code'])
+
+@click.group(cls=LazyGroup, lazy_subcommands={
+    'serve': '.daemon:serve_command',
+    'import-report': '.import_profile:import_report_command',
+})
+@click.option('--config', default='/opt/compiler/config/quantum.cfg',
              help='配置文件路径')
+@click.option('--socket', 'socket_path', default=DEFAULT_SOCKET,
+             help='编译守护进程套接字路径')
+@click.option('--no-daemon', is_flag=True, help='不使用守护进程，直接在本进程编译')
 @click.pass_context
-def cli(ctx, config):
+def cli(ctx, config, socket_path, no_daemon):
     """量子混合编译器命令行工具"""
     ctx.ensure_object(dict)
-    ctx.obj['config'] = load_config(config)
+    ctx.obj['config_path'] = config
+    ctx.obj['socket'] = socket_path
+    ctx.obj['no_daemon'] = no_daemon
 
 @cli.command()
 @click.argument('input_file')
-@click.option('--target', '-t', 
+@click.option('--target', '-t',
              type=click.Choice(['qasm', 'qobj', 'llvm', 'cuda']),
              default='qasm', help='目标输出格式')
 @click.pass_context
 def compile_cmd(ctx, input_file, target):
     """编译量子程序"""
-    config = ctx.obj['config']
-    compile.run_compilation(input_file, target, config)
+    call_daemon(ctx, 'compile', input_file=os.path.abspath(input_file), target=target)
+    from .commands import compile
+    compile.run_compilation(input_file, target, get_config(ctx))
 
 @cli.command()
 @click.argument('contract_file')
@@ -38,8 +106,9 @@ def compile_cmd(ctx, input_file, target):
 @click.pass_context
 def verify_cmd(ctx, contract_file, formal):
     """验证智能合约安全性"""
-    config = ctx.obj['config']
-    verify.verify_contract(contract_file, formal, config)
+    call_daemon(ctx, 'verify', contract_file=os.path.abspath(contract_file), formal=formal)
+    from .commands import verify
+    verify.verify_contract(contract_file, formal, get_config(ctx))
 
 @cli.command()
 @click.argument('circuit_file')
@@ -48,17 +117,36 @@ def verify_cmd(ctx, contract_file, formal):
 @click.pass_context
 def debug_cmd(ctx, circuit_file, hardware):
     """量子电路调试器"""
-    config = ctx.obj['config']
-    debug.start_debug_session(circuit_file, hardware, config)
+    from .commands import debug
+    debug.start_debug_session(circuit_file, hardware, get_config(ctx))
+
+@cli.command('healthcheck')
+@click.pass_context
+def healthcheck_cmd(ctx):
+    """Docker健康检查"""
+    sys.exit(healthcheck(ctx.obj['config_path'], ctx.obj['socket']))
 
-def healthcheck():
-    """Docker健康检查接口"""
+def healthcheck(config_path, socket_path=DEFAULT_SOCKET, core_library=QUANTUM_CORE_LIB):
+    """Docker健康检查接口: 量子 IR 核心库可加载、配置文件可读、守护进程套接字存在时须能应答 ping。
+
+    镜像中的编译器核心是 libquantum.so(Python 的 core 包并不随 CLI 分发)，
+    因此用 ctypes 加载该库代替导入 core，保持在启动预算之内。
+    """
+    import ctypes
     try:
-        from ..core import quantum_ir
-        return 0
-    except Exception as e:
-        print(f"健康检查失败: {str(e)}")
+        ctypes.CDLL(core_library)
+    except OSError as e:
+        print(f"健康检查失败: 无法加载量子 IR 核心库: {str(e)}")
+        return 1
+    if not os.access(config_path, os.R_OK):
+        print(f"健康检查失败: 配置文件不可读: {config_path}")
         return 1
+    if os.path.exists(socket_path):
+        from .daemon import _daemon_alive
+        if not _daemon_alive(socket_path):
+            print(f"健康检查失败: 守护进程无响应: {socket_path}")
+            return 1
+    return 0
 
 if __name__ == '__main__':
     cli(obj={})
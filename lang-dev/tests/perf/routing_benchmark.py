@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools', 'federated_learning'))
+
+from qiskit import QuantumCircuit
+from qiskit.transpiler import CouplingMap, PassManager
+from qiskit.transpiler.passes import SabreSwap
+from swap_router import SabreRouter
+
+def random_circuit(num_qubits, num_gates, two_qubit_ratio=0.6, seed=0):
+    rng = random.Random(seed)
+    qc = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        if rng.random() < two_qubit_ratio:
+            a, b = rng.sample(range(num_qubits), 2)
+            qc.cx(a, b)
+        else:
+            qc.h(rng.randrange(num_qubits))
+    return qc
+
+def run_routing_benchmark(sizes=((25, 2000), (64, 5000), (127, 10000)), seed=0):
+    """对比 SabreRouter 与 qiskit SabreSwap 的插入SWAP数和耗时"""
+    results = []
+    print(f"{'qubits':>7}{'gates':>8}{'ours_swaps':>12}{'ours_s':>9}{'qiskit_swaps':>14}{'qiskit_s':>10}")
+    for num_qubits, num_gates in sizes:
+        coupling_map = CouplingMap.from_grid(*_grid_shape(num_qubits))
+        qc = random_circuit(num_qubits, num_gates, seed=seed)
+
+        start = time.perf_counter()
+        router = SabreRouter.from_coupling_map(coupling_map)
+        ours = router.run(qc)
+        ours_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        routed = PassManager(SabreSwap(coupling_map, heuristic='lookahead', seed=seed)).run(
+            _widen(qc, coupling_map.size()))
+        qiskit_time = time.perf_counter() - start
+        qiskit_swaps = routed.count_ops().get('swap', 0)
+
+        print(f"{num_qubits:>7}{num_gates:>8}{ours.swap_count:>12}{ours_time:>9.2f}{qiskit_swaps:>14}{qiskit_time:>10.2f}")
+        results.append((num_qubits, num_gates, ours.swap_count, ours_time, qiskit_swaps, qiskit_time))
+    return results
+
+def _grid_shape(num_qubits):
+    rows = int(num_qubits ** 0.5)
+    return rows, -(-num_qubits // rows)
+
+def _widen(qc, size):
+    """SabreSwap 要求电路比特数与耦合图一致"""
+    if qc.num_qubits == size:
+        return qc
+    wide = QuantumCircuit(size)
+    return wide.compose(qc, qubits=range(qc.num_qubits))
+
+if __name__ == "__main__":
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    run_routing_benchmark(seed=seed)
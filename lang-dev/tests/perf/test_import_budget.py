@@ -0,0 +1,35 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+COMPILER_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'quantum-compiler')
+sys.path.insert(0, COMPILER_ROOT)
+
+pytest.importorskip('click')
+from src.cli.import_profile import CLI_MODULE, HEAVY_MODULES, measure_imports, total_import_time
+
+# 只能在命令分发时才导入的模块: 重量级依赖、守护进程与命令实现
+DEFERRED_MODULES = HEAVY_MODULES + ('src.cli.daemon', 'src.cli.commands', 'src.core')
+# 相对同一次运行中基线(裸解释器 + click)的允许倍数，不用绝对耗时以免在繁忙的 CI 上抖动
+BASELINE_FACTOR = float(os.environ.get('QC_IMPORT_FACTOR', '3'))
+
+def _loaded_modules(module):
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=COMPILER_ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+def test_cli_import_defers_heavy_modules():
+    loaded = _loaded_modules(CLI_MODULE)
+    deferred = sorted(name for name in loaded
+                      if any(name == m or name.startswith(m + '.') for m in DEFERRED_MODULES))
+    assert not deferred, f"CLI 启动时导入了应延迟的模块: {', '.join(deferred)}"
+
+def test_cli_import_close_to_click_baseline():
+    # 取多次最小值抑制噪声
+    cli = min(total_import_time(measure_imports()) for _ in range(3))
+    baseline = min(total_import_time(measure_imports('click')) for _ in range(3))
+    assert cli <= baseline * BASELINE_FACTOR, \
+        f"CLI 导入耗时 {cli * 1000:.1f} ms，超过 click 基线 {baseline * 1000:.1f} ms 的 {BASELINE_FACTOR:g} 倍"
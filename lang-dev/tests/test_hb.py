@@ -0,0 +1,112 @@
+import os
+import sys
+import hashlib
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'quantum-compiler', 'scripts'))
+
+import hb
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """源码在 src/，输出写入 out/ (merge_files 写当前目录)"""
+    src, out = tmp_path / 'src', tmp_path / 'out'
+    src.mkdir()
+    out.mkdir()
+    monkeypatch.chdir(out)
+    return str(src)
+
+@pytest.mark.parametrize('codec', ['none', 'gzip'])
+def test_bundle_round_trips_raw_bytes(workspace, codec):
+    files = {
+        'crlf.py': b'a = 1\r\nb = 2\r\n',
+        'latin1.txt': b'caf\xe9 \xff\xfe\n',
+        'sub/plain.c': b'int x;\n',
+    }
+    for rel, data in files.items():
+        write(os.path.join(workspace, rel), data)
+    hb.merge_files(workspace, codec=codec)
+    with hb.BundleReader() as reader:
+        assert sorted(reader.paths()) == sorted(files)
+        for rel, data in files.items():
+            assert reader.read(rel) == data
+            assert reader.entries[rel]['hash'] == hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def bundle_stamps(outputs):
+    return {name: os.stat(name).st_ino for name in outputs if name != hb.INDEX_FILE}
+
+def read_all(workspace):
+    with hb.BundleReader() as reader:
+        return {rel: reader.read(rel) for rel in reader.paths()}
+
+def sources(workspace):
+    result = {}
+    for dirpath, _, filenames in os.walk(workspace):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, workspace).replace(os.sep, '/')] = f.read()
+    return result
+
+@pytest.fixture
+def many_bundles(workspace, monkeypatch):
+    # 每个分卷约放两个文件
+    monkeypatch.setattr(hb, 'MAX_SIZE', 250)
+    for i in range(8):
+        write(os.path.join(workspace, f'f{i}.py'), (f'# {i}\n' * 20).encode())
+    return workspace
+
+def test_incremental_rewrites_only_changed_bundles(many_bundles):
+    outputs = hb.merge_files(many_bundles, incremental=True)
+    assert len(outputs) > 3
+    before = bundle_stamps(outputs)
+    write(os.path.join(many_bundles, 'f5.py'), b'changed\r\n')
+
+    again = hb.merge_files(many_bundles, incremental=True)
+    after = bundle_stamps(again)
+    rewritten = [name for name in after if after[name] != before.get(name)]
+    assert len(rewritten) == 1
+    assert read_all(many_bundles) == sources(many_bundles)
+
+def test_incremental_deletes_outputs_of_removed_sources(many_bundles):
+    outputs = hb.merge_files(many_bundles, incremental=True)
+    with hb.BundleReader() as reader:
+        doomed = reader.entries['f0.py']['bundle']
+        mates = [rel for rel, entry in reader.entries.items() if entry['bundle'] == doomed]
+    for rel in mates:
+        os.remove(os.path.join(many_bundles, rel))
+    os.rename(os.path.join(many_bundles, 'f7.py'), os.path.join(many_bundles, 'g7.py'))
+
+    again = hb.merge_files(many_bundles, incremental=True)
+    assert doomed not in again and not os.path.exists(doomed)
+    assert sorted(n for n in os.listdir('.') if hb.OUTPUT_PATTERN.fullmatch(n)) == \
+        sorted(n for n in again if n != hb.INDEX_FILE)
+    assert read_all(many_bundles) == sources(many_bundles)
+
+def test_resume_after_interruption_keeps_completed_bundles(many_bundles, monkeypatch):
+    real_write = hb.write_bundle
+    calls = []
+
+    def crash_on_third(*args):
+        calls.append(args[0])
+        if len(calls) == 3:
+            raise OSError("disk full")
+        return real_write(*args)
+
+    monkeypatch.setattr(hb, 'write_bundle', crash_on_third)
+    with pytest.raises(OSError):
+        hb.merge_files(many_bundles)
+    assert os.path.exists(hb.CHECKPOINT_FILE)
+    done = {name: os.stat(name).st_ino for name in calls[:2]}
+
+    monkeypatch.setattr(hb, 'write_bundle', real_write)
+    outputs = hb.merge_files(many_bundles)
+    assert {name: os.stat(name).st_ino for name in done} == done
+    assert not os.path.exists(hb.CHECKPOINT_FILE)
+    assert read_all(many_bundles) == sources(many_bundles)
+    assert len(outputs) == len(set(outputs))
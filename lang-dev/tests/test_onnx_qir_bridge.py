@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+onnx = pytest.importorskip('onnx')
+pytest.importorskip('qiskit')
+from onnx import helper
+from phase4.tools import onnx_qir_bridge
+from phase4.tools.onnx_qir_bridge import ONNXQIRConverter
+
+@pytest.fixture
+def model_path(tmp_path):
+    """gemm(alpha=1) -> relu -> gemm(alpha=1) -> gemm(alpha=2)"""
+    nodes = [
+        helper.make_node('Gemm', ['x', 'w0'], ['a'], name='gemm0', alpha=1.0),
+        helper.make_node('Relu', ['a'], ['b'], name='relu'),
+        helper.make_node('Gemm', ['b', 'w1'], ['c'], name='gemm1', alpha=1.0),
+        helper.make_node('Gemm', ['c', 'w2'], ['y'], name='gemm2', alpha=2.0),
+    ]
+    path = str(tmp_path / 'model.onnx')
+    onnx.save(helper.make_model(helper.make_graph(nodes, 'mlp', [], [])), path)
+    return path
+
+def convert(path, **kwargs):
+    out = io.StringIO()
+    stats = ONNXQIRConverter().convert_model(path, out, **kwargs)
+    return out.getvalue(), stats
+
+def test_identical_layers_share_one_function(model_path):
+    qir, stats = convert(model_path)
+    assert stats == {'nodes': 4, 'functions': 2, 'passthrough': [('Relu', 'relu')]}
+    assert qir.count('define void @gemm_layer_') == 2
+    main = qir[qir.index('define void @main()'):]
+    assert main.count('call void @gemm_layer_0()') == 2
+    assert main.count('call void @gemm_layer_1()') == 1
+
+def test_passthrough_comment_keeps_node_order(model_path):
+    qir, _ = convert(model_path)
+    main = qir[qir.index('define void @main()'):].splitlines()
+    assert main[1:5] == ['  call void @gemm_layer_0()', '  ; passthrough: Relu relu',
+                         '  call void @gemm_layer_0()', '  call void @gemm_layer_1()']
+
+def test_small_models_convert_serially_by_default(model_path, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('process pool started for a small model')
+    monkeypatch.setattr(onnx_qir_bridge, 'ProcessPoolExecutor', no_pool)
+    qir, _ = convert(model_path)
+    assert qir.startswith('; QIR Version: 1.2\n')
+
+def test_parallel_output_matches_serial(model_path):
+    assert convert(model_path, workers=2) == convert(model_path, workers=1)
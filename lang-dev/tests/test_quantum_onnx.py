@@ -0,0 +1,55 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+onnx = pytest.importorskip('onnx')
+pytest.importorskip('onnxruntime')
+pytest.importorskip('qiskit')
+from onnx import helper, TensorProto
+from phase4.ai import quantum_onnx, session_factory
+
+def build_hybrid_model(path):
+    """x -> QuantumConv(quantum 域) -> Relu -> y"""
+    x = helper.make_tensor_value_info('x', TensorProto.FLOAT, [None, 4])
+    y = helper.make_tensor_value_info('y', TensorProto.FLOAT, [None, 2])
+    qconv = helper.make_node('QuantumConv', ['x'], ['q'], name='qconv', domain='quantum', qubits=2, depth=1)
+    relu = helper.make_node('Relu', ['q'], ['y'], name='relu')
+    graph = helper.make_graph([qconv, relu], 'hybrid', [x], [y])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13),
+                                                    helper.make_opsetid('quantum', 1)])
+    onnx.save(model, path)
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_factory, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(quantum_onnx, 'CACHE_DIR', str(tmp_path / 'cache'))
+    session_factory.clear_sessions()
+    model_path = str(tmp_path / 'hybrid.onnx')
+    build_hybrid_model(model_path)
+    return quantum_onnx.QuantumONNXRuntime(model_path, providers=['CPUExecutionProvider'])
+
+def test_quantum_nodes_bound_to_one_kernel(runtime):
+    assert [node.name for node in runtime.quantum_nodes] == ['qconv']
+    assert runtime.kernel.node_keys == {'qconv': ('QuantumConv', 2, 1)}
+    assert runtime.input_names == ['q']
+
+def test_infer_end_to_end(runtime):
+    batch = np.random.default_rng(0).standard_normal((5, 4)).astype(np.float32)
+    (output,) = runtime.infer({'x': batch})
+    expected = np.maximum(runtime.kernel.execute('qconv', batch), 0)
+    assert output.shape == (5, 2)
+    np.testing.assert_allclose(output, expected, rtol=1e-5, atol=1e-6)
+
+def test_encode_rejects_features_beyond_amplitudes():
+    with pytest.raises(ValueError):
+        quantum_onnx.QuantumOpKernel._encode(np.ones((2, 5), dtype=np.float32), 2)
+    states = quantum_onnx.QuantumOpKernel._encode(np.array([[3, 4, 0], [0, 0, 0]], dtype=np.float32), 2)
+    np.testing.assert_allclose(states, [[0.6, 0.8, 0, 0], [1, 0, 0, 0]])
+
+def test_bind_rejects_unsupported_quantum_op(runtime):
+    pool = helper.make_node('QuantumPool', ['x'], ['p'], name='qpool', domain='quantum', qubits=2)
+    with pytest.raises(NotImplementedError, match='QuantumPool'):
+        runtime.kernel.bind(pool)
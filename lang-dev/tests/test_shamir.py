@@ -0,0 +1,20 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools', 'federated_learning'))
+
+from shamir import ShamirSharing
+
+def test_secret_sharing_name_used_by_trainer():
+    # conflict_model_train.py imports this name
+    from shamir import ShamirSecretSharing
+    assert ShamirSecretSharing is ShamirSharing
+
+def test_split_and_reconstruct_round_trip():
+    secret = np.linspace(-3.5, 7.25, 1000).reshape(10, 100)
+    scheme = ShamirSharing(threshold=3, num_shares=5)
+    shares = scheme.split(secret)
+    assert shares.shape == (5, 10, 100)
+    recovered = scheme.reconstruct([shares[4], shares[1], shares[2]], indices=[4, 1, 2])
+    np.testing.assert_allclose(recovered, secret, atol=1 / scheme.scale)
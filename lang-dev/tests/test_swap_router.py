@@ -0,0 +1,52 @@
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools', 'federated_learning'))
+
+from swap_router import SabreRouter
+
+def fake_circuit(num_qubits, num_clbits, ops):
+    """只带 run() 用到字段的电路: ops 为 (name, qubits, clbits, condition)"""
+    qubits = [object() for _ in range(num_qubits)]
+    clbits = [object() for _ in range(num_clbits)]
+    data = [SimpleNamespace(operation=SimpleNamespace(name=name, condition=cond(clbits) if cond else None),
+                            qubits=[qubits[q] for q in qs], clbits=[clbits[c] for c in cs])
+            for name, qs, cs, cond in ops]
+    return SimpleNamespace(num_qubits=num_qubits, qubits=qubits, clbits=clbits, data=data)
+
+def test_condition_clbits_order_after_measure():
+    # measure q0 -> c0, 然后 c_if(c0) 的 x 作用在 q2 上; 中间 cx(0, 2) 需要 SWAP
+    circuit = fake_circuit(3, 1, [
+        ('measure', [0], [0], None),
+        ('cx', [0, 2], [], None),
+        ('x', [2], [], lambda c: (c[0], 1)),
+        ('x', [1], [], lambda c: (c, 1)),
+    ])
+    gates, wires, barriers, _ = SabreRouter.circuit_wires(circuit)
+    assert wires[2] == (2, 3)
+    assert wires[3] == (1, 3)
+
+    router = SabreRouter([(0, 1), (1, 2)])
+    result = router.route(gates, 3, None, wires, barriers)
+    order = [index for kind, index, _ in result.ops if kind == 'gate']
+    assert order.index(0) < order.index(2)
+    assert order.index(0) < order.index(3)
+    assert sorted(order) == [0, 1, 2, 3]
+
+def test_run_routes_measure_and_c_if():
+    pytest.importorskip('qiskit')
+    from qiskit import QuantumCircuit
+    from qiskit.circuit.library import XGate
+    if not hasattr(XGate(), 'c_if'):
+        pytest.skip('qiskit 版本不支持 c_if')
+    circuit = QuantumCircuit(3, 1)
+    circuit.measure(0, 0)
+    circuit.cx(0, 2)
+    circuit.x(1).c_if(circuit.cregs[0], 1)
+    result = SabreRouter([(0, 1), (1, 2)]).run(circuit)
+    names = [inst.operation.name for inst in result.circuit.data]
+    assert names.index('measure') < names.index('x')
+    conditioned = next(inst.operation for inst in result.circuit.data if inst.operation.name == 'x')
+    assert conditioned.condition[0] == result.circuit.cregs[0]
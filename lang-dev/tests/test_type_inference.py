@@ -0,0 +1,77 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'ai_assist', 'type_inference'))
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('quantum_integration')
+import inference_service
+from inference_service import TypeInferenceEngine, decode_batch, decode_predictions, snippet_key
+
+class FakeExtractor:
+    """(2, 3) 量子特征，首元素编码片段长度，用于检查形状与行序"""
+    calls = []
+
+    def extract(self, code_snippet):
+        self.calls.append(code_snippet)
+        features = np.zeros((2, 3), dtype=np.float32)
+        features[0, 0] = len(code_snippet)
+        return features
+
+class FakeSession:
+    def __init__(self):
+        self.batches = []
+
+    def run(self, output_names, inputs):
+        quantum, ast = inputs['quantum_input'], inputs['ast_input']
+        assert quantum.shape[1:] == (2, 3) and ast.shape[1:] == (4,)
+        self.batches.append(len(quantum))
+        # 片段长度的奇偶决定类别 dynamic / static
+        logits = np.zeros((len(quantum), 3), dtype=np.float32)
+        logits[np.arange(len(quantum)), (quantum[:, 0, 0] % 2).astype(int)] = 1
+        return [logits]
+
+@pytest.fixture
+def engine(monkeypatch):
+    session = FakeSession()
+    FakeExtractor.calls = []
+    monkeypatch.setattr(inference_service, 'get_session', lambda *args, **kwargs: session)
+    monkeypatch.setattr(inference_service, 'QuantumFeatureExtractor', FakeExtractor)
+    monkeypatch.setattr(inference_service, 'parse_ast',
+                        lambda code_snippet: np.ones(4, dtype=np.float32), raising=False)
+    engine = TypeInferenceEngine(cache_size=3, max_batch_size=2)
+    yield engine
+    engine.close()
+
+def test_snippet_key_normalizes_line_endings_only():
+    assert snippet_key('x = 1\r\ny = 2\r') == snippet_key('x = 1\ny = 2\n')
+    assert snippet_key('if x:\n    y') != snippet_key('if x:\n  y')
+    assert snippet_key('x = 1') != snippet_key('x = 1 ')
+
+def test_batched_inference_matches_rows_and_chunks(engine):
+    snippets = ['ab', 'abc', 'abcd', 'a']
+    assert engine.infer_types(snippets) == ['dynamic', 'static', 'dynamic', 'static']
+    assert engine.session.batches == [2, 2]
+
+def test_cache_deduplicates_and_evicts(engine):
+    # 两种换行写法共享一个缓存键，只提取一次特征(首次出现的写法，长度 4)
+    assert engine.infer_types(['a\r\nb', 'a\nb', 'abc']) == ['dynamic', 'dynamic', 'static']
+    assert sorted(FakeExtractor.calls) == ['a\r\nb', 'abc']
+    assert engine.infer_type('abc') == 'static'
+    assert len(FakeExtractor.calls) == 2
+    engine.infer_types(['x', 'xy', 'xyz'])
+    # cache_size=3: 'a\nb' 与 'abc' 已被淘汰
+    engine.infer_type('a\nb')
+    assert FakeExtractor.calls[-1] == 'a\nb'
+    engine.clear_cache()
+    engine.infer_type('xyz')
+    assert FakeExtractor.calls[-1] == 'xyz'
+
+def test_decode_batch_matches_per_row_decode():
+    logits = np.array([[0.1, 0.7, 0.2], [0.9, 0.05, 0.05], [0.2, 0.3, 0.5]])
+    assert decode_batch(logits) == ['static', 'dynamic', 'generic']
+    assert decode_batch(logits) == [decode_predictions(row) for row in logits]
@@ -0,0 +1,158 @@
+"""
+Gradient / model-update compression for federated rounds.
+
+Pipeline per tensor: delta against the last global model -> add the
+error-feedback residual -> top-k sparsification -> int8 (optionally
+stochastic) quantization of the kept values. Indices are sorted and sent
+as gaps in the narrowest unsigned dtype. The server sums compressed
+updates with one ``np.bincount`` per tensor and never densifies per client.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import numpy as np
+
+@dataclass
+class CompressedTensor:
+    shape: tuple
+    gaps: Optional[np.ndarray]   # None means dense (all elements, in order)
+    values: np.ndarray           # int8 codes, or float16/float32 raw values
+    scale: float = 1.0
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape)) if self.shape else 1
+
+    @property
+    def nbytes(self) -> int:
+        return (self.gaps.nbytes if self.gaps is not None else 0) + self.values.nbytes + 8
+
+    def indices(self) -> np.ndarray:
+        return np.cumsum(self.gaps, dtype=np.int64) if self.gaps is not None else np.arange(self.size)
+
+    def dequantized(self) -> np.ndarray:
+        if self.values.dtype == np.int8:
+            return self.values.astype(np.float32) * np.float32(self.scale)
+        return self.values.astype(np.float32)
+
+    def to_dense(self) -> np.ndarray:
+        out = np.zeros(self.size, dtype=np.float32)
+        out[self.indices()] = self.dequantized()
+        return out.reshape(self.shape)
+
+def _narrow_uint(values: np.ndarray) -> np.ndarray:
+    top = int(values.max()) if values.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values.astype(np.uint64)
+
+class GradientCompressor:
+    """Per-client compressor; keeps one error-feedback residual per tensor
+
+    ``topk_ratio=1.0`` disables sparsification, ``quant_bits=None`` sends
+    float16 values. Tensors smaller than ``min_sparse_size`` stay dense.
+    """
+
+    def __init__(self, topk_ratio: float = 0.01, quant_bits: Optional[int] = 8,
+                 stochastic: bool = True, error_feedback: bool = True,
+                 min_sparse_size: int = 1024, seed: Optional[int] = None):
+        if not 0 < topk_ratio <= 1:
+            raise ValueError("topk_ratio must be in (0, 1]")
+        if quant_bits not in (None, 8):
+            raise ValueError("only 8-bit quantization is supported")
+        self.topk_ratio = topk_ratio
+        self.quant_bits = quant_bits
+        self.stochastic = stochastic
+        self.error_feedback = error_feedback
+        self.min_sparse_size = min_sparse_size
+        self.rng = np.random.default_rng(seed)
+        self.residuals: List[Optional[np.ndarray]] = []
+
+    def _quantize(self, values: np.ndarray):
+        if self.quant_bits is None:
+            return values.astype(np.float16), 1.0
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        scaled = values / np.float32(scale)
+        if self.stochastic:
+            # Unbiased: round up with probability equal to the fractional part
+            scaled = np.floor(scaled + self.rng.random(scaled.shape, dtype=np.float32))
+        else:
+            scaled = np.rint(scaled)
+        return np.clip(scaled, -127, 127).astype(np.int8), scale
+
+    def compress_tensor(self, position: int, update: np.ndarray) -> CompressedTensor:
+        flat = np.asarray(update, dtype=np.float32).ravel()
+        while len(self.residuals) <= position:
+            self.residuals.append(None)
+        residual = self.residuals[position]
+        if self.error_feedback and residual is not None:
+            flat = flat + residual
+
+        k = max(1, int(flat.size * self.topk_ratio))
+        if k >= flat.size or flat.size < self.min_sparse_size:
+            indices = None
+            kept = flat
+        else:
+            indices = np.argpartition(np.abs(flat), flat.size - k)[flat.size - k:]
+            indices.sort()
+            kept = flat[indices]
+        values, scale = self._quantize(kept)
+        gaps = None if indices is None else _narrow_uint(np.diff(indices, prepend=0))
+        compressed = CompressedTensor(tuple(np.shape(update)), gaps, values, scale)
+
+        if self.error_feedback:
+            sent = compressed.dequantized()
+            if indices is None:
+                residual = flat - sent
+            else:
+                residual = flat.copy()
+                residual[indices] -= sent
+            self.residuals[position] = residual
+        return compressed
+
+    def compress(self, updates: Sequence[np.ndarray]) -> List[CompressedTensor]:
+        return [self.compress_tensor(i, u) for i, u in enumerate(updates)]
+
+    def encode_model(self, weights: Sequence[np.ndarray],
+                     global_weights: Sequence[np.ndarray]) -> List[CompressedTensor]:
+        """Delta-encode local weights against the last global model, then compress"""
+        return self.compress([np.asarray(w, dtype=np.float32) - np.asarray(g, dtype=np.float32)
+                              for w, g in zip(weights, global_weights)])
+
+def decompress(payload: Sequence[CompressedTensor]) -> List[np.ndarray]:
+    return [t.to_dense() for t in payload]
+
+def payload_bytes(payload: Sequence[CompressedTensor]) -> int:
+    return sum(t.nbytes for t in payload)
+
+def aggregate_compressed(payloads: Sequence[Sequence[CompressedTensor]],
+                         client_weights: Optional[Sequence[float]] = None) -> List[np.ndarray]:
+    """Weighted mean of compressed client updates, accumulated sparse-to-dense once per tensor"""
+    if not payloads:
+        return []
+    if client_weights is None:
+        client_weights = [1.0] * len(payloads)
+    total = float(sum(client_weights))
+    result = []
+    for position, first in enumerate(payloads[0]):
+        acc = np.zeros(first.size, dtype=np.float64)
+        indices, values = [], []
+        for payload, weight in zip(payloads, client_weights):
+            tensor = payload[position]
+            factor = weight / total
+            if tensor.gaps is None:
+                acc += tensor.dequantized() * factor
+            else:
+                indices.append(tensor.indices())
+                values.append(tensor.dequantized() * factor)
+        if indices:
+            # One bincount over every sparse client's entries: a single dense pass per tensor
+            acc += np.bincount(np.concatenate(indices), weights=np.concatenate(values),
+                               minlength=first.size)
+        result.append(acc.astype(np.float32).reshape(first.shape))
+    return result
+
+def apply_update(global_weights: Sequence[np.ndarray], update: Sequence[np.ndarray]) -> List[np.ndarray]:
+    return [np.asarray(g, dtype=np.float32) + u for g, u in zip(global_weights, update)]
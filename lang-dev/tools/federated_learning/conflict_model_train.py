@@ -1,5 +1,6 @@
 import tensorflow as tf
 from federated import FederatedClient
+from compression import GradientCompressor
 import sys
 
 try:
@@ -18,8 +19,10 @@ class ConflictDetectorTrainer:
             tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(64)),
             tf.keras.layers.Dense(3, activation='softmax')
         ])
-        
-    def federated_update(self, client_data):
+        # 跨轮次保留误差反馈残差
+        self.compressor = GradientCompressor()
+
+    def _train_round(self, client_data):
         client = FederatedClient(config='config.yaml')
         global_weights = client.get_global_model()
         self.model.set_weights(global_weights)
@@ -31,8 +34,17 @@ class ConflictDetectorTrainer:
         )
         
         self.model.fit(client_data, epochs=5)
+        return global_weights
+
+    def federated_update(self, client_data):
+        self._train_round(client_data)
         return self.model.get_weights()
 
+    def federated_update_compressed(self, client_data):
+        global_weights = self._train_round(client_data)
+        # 只上传相对全局模型的增量 (top-k + int8)
+        return self.compressor.encode_model(self.model.get_weights(), global_weights)
+
 def load_training_data():
     # 数据加载实现
     pass
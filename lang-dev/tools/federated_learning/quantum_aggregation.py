@@ -3,6 +3,9 @@ from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit.crypto.bb84 import BB84
 from qiskit.crypto.kyber import Kyber
 import numpy as np
+from swap_router import SabreRouter
+from shamir import ShamirSharing
+from compression import aggregate_compressed, apply_update
 
 class QuantumAggregator:
     def __init__(self, backend_name='ibmq_montreal'):
@@ -10,24 +13,27 @@ class QuantumAggregator:
         self.backend = self.service.backend(backend_name)
         self.bb84 = BB84()
         self.kyber = Kyber()
+        self._swap_router = None
+
+    def _router(self):
+        """按后端耦合图构建一次路由器(距离矩阵只预计算一次)，各聚合轮次复用"""
+        if self._swap_router is None:
+            self._swap_router = SabreRouter.from_coupling_map(self.backend.coupling_map)
+        return self._swap_router
+
+    def aggregate_compressed(self, payloads, global_weights, client_weights=None):
+        """直接在压缩形式上聚合客户端增量，返回新的全局模型"""
+        return apply_update(global_weights, aggregate_compressed(payloads, client_weights))
 
     def _apply_hardware_optimization(self, qc):
-        optimized = qc.copy()
-        cmap = [[0,1],[1,2],[2,3],[3,4],[4,5],[5,6],[6,7],[7,8],[8,9],[9,10]]
-        for gate in qc.data:
-            if len(gate.qubits) == 2:
-                q1, q2 = gate.qubits[0].index, gate.qubits[1].index
-                if [q1,q2] not in cmap:
-                    path = self._find_shortest_path(q1, q2, cmap)
-                    for swap in path:
-                        optimized.swap(swap[0], swap[1])
-        return optimized
+        result = self._router().run(qc)
+        self.last_layout = result.final_layout
+        return result.circuit
 
 class SecureQuantumAggregator(QuantumAggregator):
-    def __init__(self, backend_name='ibmq_montreal'):
+    def __init__(self, backend_name='ibmq_montreal', threshold=3, num_shares=5):
         super().__init__(backend_name)
-        from cryptography.hazmat.primitives.secret_sharing import ShamirSharedSecret
-        self.shamir = ShamirSharedSecret(threshold=3)
+        self.shamir = ShamirSharing(threshold=threshold, num_shares=num_shares)
         
     def hybrid_aggregate(self, gradients):
         shares = [self.shamir.split(g.numpy()) for g in gradients]
@@ -0,0 +1,177 @@
+"""
+Vectorised Shamir secret sharing of float tensors over GF(p).
+
+Values are fixed-point encoded (``frac_bits`` fractional bits) into the
+field p = 2^31 - 1, so every product of two field elements fits in uint64
+and whole arrays are processed with NumPy modular arithmetic. Shares are
+stored as uint32 with shape ``(num_shares, *secret.shape)``; share ``i`` is
+the polynomial evaluated at x = i + 1. Shares are additively homomorphic:
+summing parties' shares element-wise shares the sum of the secrets.
+"""
+
+import os
+from functools import lru_cache
+from typing import Iterable, Iterator, Sequence, Tuple, Optional, Callable
+import numpy as np
+
+PRIME = (1 << 31) - 1
+DEFAULT_CHUNK = 1 << 22  # elements per streamed chunk
+CACHE_BLOCK = 1 << 15
+
+def _random_field(count: int, prime: int, randbytes: Callable[[int], bytes]) -> np.ndarray:
+    """Uniform field elements from a CSPRNG (rejection-sampled 31-bit words)"""
+    out = np.frombuffer(randbytes(4 * count), dtype=np.uint32) & np.uint32(0x7FFFFFFF)
+    out = out.astype(np.uint64)
+    bad = out >= prime
+    while bad.any():
+        out[bad] = (np.frombuffer(randbytes(4 * int(bad.sum())), dtype=np.uint32)
+                    & np.uint32(0x7FFFFFFF)).astype(np.uint64)
+        bad = out >= prime
+    return out
+
+@lru_cache(maxsize=64)
+def lagrange_at_zero(xs: Tuple[int, ...], prime: int = PRIME) -> Tuple[int, ...]:
+    """Coefficients l_i with f(0) = sum(l_i * f(x_i)) mod p"""
+    coefficients = []
+    for i, xi in enumerate(xs):
+        num, den = 1, 1
+        for j, xj in enumerate(xs):
+            if i != j:
+                num = num * xj % prime
+                den = den * (xj - xi) % prime
+        coefficients.append(num * pow(den, prime - 2, prime) % prime)
+    return tuple(coefficients)
+
+class ShamirSharing:
+    """(threshold, num_shares) Shamir scheme over whole NumPy arrays"""
+
+    def __init__(self, threshold: int = 3, num_shares: int = 5, frac_bits: int = 16,
+                 prime: int = PRIME, randbytes: Callable[[int], bytes] = os.urandom):
+        if not 1 <= threshold <= num_shares:
+            raise ValueError("threshold must be between 1 and num_shares")
+        if num_shares >= prime:
+            raise ValueError("num_shares must be smaller than the field prime")
+        if prime >= 1 << 32:
+            raise ValueError("prime must fit in 32 bits so products fit in uint64")
+        self.threshold = threshold
+        self.num_shares = num_shares
+        self.frac_bits = frac_bits
+        self.prime = prime
+        self.randbytes = randbytes
+        self.scale = float(1 << frac_bits)
+        # Largest magnitude whose encoding stays on the correct side of p/2
+        self.max_abs = (prime // 2) / self.scale
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        if values.size and np.abs(values).max() > self.max_abs:
+            raise ValueError(f"Values exceed the fixed-point range ±{self.max_abs:g}")
+        fixed = np.rint(values * self.scale).astype(np.int64)
+        np.add(fixed, self.prime, out=fixed, where=fixed < 0)
+        return fixed.view(np.uint64)
+
+    def decode(self, field: np.ndarray) -> np.ndarray:
+        field = np.asarray(field).astype(np.int64)
+        signed = np.where(field > self.prime // 2, field - self.prime, field)
+        return signed / self.scale
+
+    def split(self, secret: np.ndarray) -> np.ndarray:
+        """Shares of a float array, shape ``(num_shares, *secret.shape)``"""
+        secret = np.asarray(secret)
+        flat = self.encode(secret.ravel())
+        return self._split_field(flat).reshape((self.num_shares,) + secret.shape)
+
+    def _split_field(self, flat: np.ndarray) -> np.ndarray:
+        shares = np.empty((self.num_shares, flat.size), dtype=np.uint32)
+        # Cache-sized blocks keep the Horner temporaries in L2
+        for start in range(0, flat.size, CACHE_BLOCK):
+            stop = min(start + CACHE_BLOCK, flat.size)
+            self._split_block(flat[start:stop], shares[:, start:stop])
+        return shares
+
+    def _split_block(self, secret: np.ndarray, shares: np.ndarray):
+        p = np.uint64(self.prime)
+        coefficients = [_random_field(secret.size, self.prime, self.randbytes)
+                        for _ in range(self.threshold - 1)]
+        acc = np.empty(secret.size, dtype=np.uint64)
+        for i in range(self.num_shares):
+            x = np.uint64(i + 1)
+            # Horner: ((c_{t-1} x + c_{t-2}) x + ... ) x + secret
+            if coefficients:
+                acc[:] = coefficients[-1]
+                for c in reversed(coefficients[:-1]):
+                    np.multiply(acc, x, out=acc)
+                    np.add(acc, c, out=acc)
+                    np.remainder(acc, p, out=acc)
+                np.multiply(acc, x, out=acc)
+                np.add(acc, secret, out=acc)
+                np.remainder(acc, p, out=acc)
+            else:
+                acc[:] = secret
+            shares[i] = acc
+
+    def reconstruct_field(self, shares: Sequence[np.ndarray], indices: Sequence[int]) -> np.ndarray:
+        if len(indices) < self.threshold:
+            raise ValueError(f"Need at least {self.threshold} shares, got {len(indices)}")
+        indices = tuple(indices[:self.threshold])
+        p = np.uint64(self.prime)
+        weights = lagrange_at_zero(tuple(i + 1 for i in indices), self.prime)
+        acc = np.zeros(np.shape(shares[0]), dtype=np.uint64)
+        term = np.empty_like(acc)
+        for share, weight in zip(shares, weights):
+            np.multiply(np.asarray(share, dtype=np.uint64), np.uint64(weight), out=term)
+            np.add(acc, term, out=acc)
+            np.remainder(acc, p, out=acc)
+        return acc
+
+    def reconstruct(self, shares: Sequence[np.ndarray], indices: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Recover the float array from ``threshold`` shares (share indices are 0-based)"""
+        indices = list(range(len(shares))) if indices is None else list(indices)
+        return self.decode(self.reconstruct_field(shares, indices))
+
+    def add_shares(self, *shares: np.ndarray) -> np.ndarray:
+        """Element-wise sum of several parties' shares (same share index)"""
+        acc = np.zeros(np.shape(shares[0]), dtype=np.uint64)
+        for share in shares:
+            np.add(acc, np.asarray(share, dtype=np.uint64), out=acc)
+            np.remainder(acc, np.uint64(self.prime), out=acc)
+        return acc.astype(np.uint32)
+
+    def split_stream(self, chunks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """Share an iterable of chunks; yields ``(num_shares, chunk_size)`` per chunk"""
+        for chunk in chunks:
+            yield self._split_field(self.encode(np.asarray(chunk).ravel()))
+
+    def split_to_files(self, secret: np.ndarray, paths: Sequence[str],
+                       chunk_size: int = DEFAULT_CHUNK) -> None:
+        """Share an array (e.g. an ``np.memmap``) into one ``.npy`` file per party, chunk by chunk"""
+        if len(paths) != self.num_shares:
+            raise ValueError(f"Expected {self.num_shares} output paths, got {len(paths)}")
+        flat = secret.reshape(-1)
+        outputs = [np.lib.format.open_memmap(path, mode='w+', dtype=np.uint32, shape=secret.shape)
+                   for path in paths]
+        try:
+            for start in range(0, flat.size, chunk_size):
+                stop = min(start + chunk_size, flat.size)
+                shares = self._split_field(self.encode(flat[start:stop]))
+                for out, share in zip(outputs, shares):
+                    out.reshape(-1)[start:stop] = share
+        finally:
+            for out in outputs:
+                out.flush()
+
+    def reconstruct_from_files(self, paths: Sequence[str], indices: Sequence[int], out_path: str,
+                               chunk_size: int = DEFAULT_CHUNK) -> np.ndarray:
+        """Chunked reconstruction of ``.npy`` shares into a float64 ``.npy`` memmap"""
+        shares = [np.load(path, mmap_mode='r') for path in paths]
+        result = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float64, shape=shares[0].shape)
+        flats = [s.reshape(-1) for s in shares]
+        out = result.reshape(-1)
+        for start in range(0, out.size, chunk_size):
+            stop = min(start + chunk_size, out.size)
+            out[start:stop] = self.reconstruct([f[start:stop] for f in flats], indices)
+        result.flush()
+        return result
+
+# Name used by conflict_model_train.py
+ShamirSecretSharing = ShamirSharing
@@ -0,0 +1,292 @@
+"""
+SABRE-style SWAP routing for arbitrary coupling maps.
+
+All-pairs distances are computed once per router; routing keeps a live
+logical-to-physical layout and picks SWAPs by a lookahead score over the
+front layer plus an extended set of upcoming two-qubit gates.
+"""
+
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple, Optional, Iterable
+import numpy as np
+
+# (kind, index, physical qubits): kind is 'gate' (index into the input) or 'swap'
+RoutedOp = Tuple[str, int, Tuple[int, ...]]
+
+def distance_matrix(num_physical: int, edges: Iterable[Tuple[int, int]]) -> np.ndarray:
+    """BFS from every node over the undirected coupling graph; -1 marks unreachable"""
+    adjacency: List[List[int]] = [[] for _ in range(num_physical)]
+    for a, b in edges:
+        if b not in adjacency[a]:
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+    dist = np.full((num_physical, num_physical), -1, dtype=np.int32)
+    for source in range(num_physical):
+        row = dist[source]
+        row[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for nxt in adjacency[node]:
+                if row[nxt] < 0:
+                    row[nxt] = row[node] + 1
+                    queue.append(nxt)
+    return dist
+
+def _physical_pairs(pairs, l2p, dist):
+    phys = [(l2p[a], l2p[b]) for a, b in pairs]
+    touching: Dict[int, List[int]] = {}
+    base = 0
+    for k, (x, y) in enumerate(phys):
+        base += dist[x][y]
+        touching.setdefault(x, []).append(k)
+        touching.setdefault(y, []).append(k)
+    return phys, base, touching
+
+def _swap_delta(phys, touching, p1, p2, dist) -> int:
+    """Change in summed distance if physical qubits p1 and p2 exchange contents"""
+    delta = 0
+    for here, there in ((p1, p2), (p2, p1)):
+        for k in touching.get(here, ()):
+            x, y = phys[k]
+            other = y if x == here else x
+            if other != there:
+                delta += dist[there][other] - dist[here][other]
+    return delta
+
+@dataclass
+class RoutingResult:
+    ops: List[RoutedOp]
+    initial_layout: List[int]
+    final_layout: List[int]
+    swap_count: int = 0
+    circuit: Optional[object] = field(default=None, repr=False)
+
+class SabreRouter:
+    """Lookahead SWAP router; build once per coupling map and reuse across circuits"""
+
+    def __init__(self, edges: Iterable[Tuple[int, int]], num_physical: Optional[int] = None,
+                 extended_size: int = 20, extended_weight: float = 0.5,
+                 decay_delta: float = 0.001, decay_reset: int = 5, seed: int = 0):
+        self.edges = sorted({(min(a, b), max(a, b)) for a, b in edges if a != b})
+        self.num_physical = num_physical or (max(max(e) for e in self.edges) + 1 if self.edges else 0)
+        self.dist = distance_matrix(self.num_physical, self.edges)
+        self._dist_rows = self.dist.tolist()
+        self.neighbors: List[List[int]] = [[] for _ in range(self.num_physical)]
+        for a, b in self.edges:
+            self.neighbors[a].append(b)
+            self.neighbors[b].append(a)
+        self.extended_size = extended_size
+        self.extended_weight = extended_weight
+        self.decay_delta = decay_delta
+        self.decay_reset = decay_reset
+        self.seed = seed
+
+    @classmethod
+    def from_coupling_map(cls, coupling_map, **kwargs) -> 'SabreRouter':
+        """Accepts a qiskit CouplingMap or a plain edge list"""
+        if hasattr(coupling_map, 'get_edges'):
+            return cls(coupling_map.get_edges(), coupling_map.size(), **kwargs)
+        return cls(coupling_map, **kwargs)
+
+    def _shortest_path(self, a: int, b: int) -> List[int]:
+        dist_b = self._dist_rows[b]
+        path = [a]
+        while path[-1] != b:
+            node = path[-1]
+            path.append(next(n for n in self.neighbors[node] if dist_b[n] == dist_b[node] - 1))
+        return path
+
+    def route(self, gates: Sequence[Tuple[int, ...]], num_logical: int,
+              initial_layout: Optional[Sequence[int]] = None,
+              wires: Optional[Sequence[Tuple[int, ...]]] = None,
+              barriers: Iterable[int] = ()) -> RoutingResult:
+        """Route gates given as tuples of logical qubits
+
+        ``wires`` optionally lists every wire a gate orders against (qubits
+        plus classical bits offset past the qubits); it defaults to ``gates``.
+        Indices in ``barriers`` never block; any other gate on more than two
+        qubits is rejected, so decompose the circuit first.
+        """
+        if num_logical > self.num_physical:
+            raise ValueError(f"Circuit needs {num_logical} qubits, coupling map has {self.num_physical}")
+        l2p = list(initial_layout) if initial_layout is not None else list(range(self.num_physical))
+        p2l = [-1] * self.num_physical
+        for logical, physical in enumerate(l2p):
+            p2l[physical] = logical
+        initial = l2p[:num_logical]
+        dist = self._dist_rows
+        barriers = set(barriers)
+        for index, g in enumerate(gates):
+            if len(g) > 2 and index not in barriers:
+                raise ValueError(f"Gate {index} acts on {len(g)} qubits; decompose to 1- and 2-qubit gates first")
+            if len(g) == 2 and dist[l2p[g[0]]][l2p[g[1]]] < 0:
+                raise ValueError(f"Qubits {g[0]} and {g[1]} are disconnected in the coupling map")
+
+        # Dependency DAG: predecessor = previous gate on each wire
+        wires = wires if wires is not None else gates
+        successors: List[List[int]] = [[] for _ in gates]
+        pending = [0] * len(gates)
+        last: Dict[int, int] = {}
+        for index, gate_wires in enumerate(wires):
+            preds = {last[w] for w in gate_wires if w in last}
+            for p in preds:
+                successors[p].append(index)
+            pending[index] = len(preds)
+            for w in gate_wires:
+                last[w] = index
+
+        rng = random.Random(self.seed)
+        front = [i for i, n in enumerate(pending) if n == 0]
+        decay = [1.0] * self.num_physical
+        ops: List[RoutedOp] = []
+        swaps = 0
+        since_progress = 0
+        swaps_since_reset = 0
+        limit = 10 * max(self.num_physical, 1)
+        front_changed = True
+        front_pairs: List[Tuple[int, ...]] = []
+        extended: List[Tuple[int, ...]] = []
+
+        def executable(i):
+            g = gates[i]
+            if len(g) != 2 or i in barriers:
+                return True
+            return dist[l2p[g[0]]][l2p[g[1]]] == 1
+
+        def do_swap(p1, p2):
+            nonlocal swaps
+            l1, l2 = p2l[p1], p2l[p2]
+            p2l[p1], p2l[p2] = l2, l1
+            if l1 >= 0:
+                l2p[l1] = p2
+            if l2 >= 0:
+                l2p[l2] = p1
+            ops.append(('swap', -1, (p1, p2)))
+            swaps += 1
+
+        while front:
+            ready = [i for i in front if executable(i)]
+            if ready:
+                ready_set = set(ready)
+                front = [i for i in front if i not in ready_set]
+                for i in ready:
+                    ops.append(('gate', i, tuple(l2p[q] for q in gates[i])))
+                    for s in successors[i]:
+                        pending[s] -= 1
+                        if pending[s] == 0:
+                            front.append(s)
+                since_progress = 0
+                front_changed = True
+                decay = [1.0] * self.num_physical
+                continue
+
+            if since_progress >= limit:
+                # Release valve: walk the first blocked gate together along a shortest path
+                blocked = next(i for i in front if i not in barriers)
+                a, b = gates[blocked]
+                path = self._shortest_path(l2p[a], l2p[b])
+                for k in range(len(path) - 2):
+                    do_swap(path[k], path[k + 1])
+                since_progress = 0
+                continue
+
+            if front_changed:
+                front_pairs = [gates[i] for i in front if len(gates[i]) == 2 and i not in barriers]
+                extended = self._extended_set(front, successors, gates)
+                front_changed = False
+            front_phys, front_base, front_touch = _physical_pairs(front_pairs, l2p, dist)
+            ext_phys, ext_base, ext_touch = _physical_pairs(extended, l2p, dist)
+            candidates = set()
+            for x, y in front_phys:
+                for p in (x, y):
+                    for n in self.neighbors[p]:
+                        candidates.add((min(p, n), max(p, n)))
+
+            # Only pairs touching the swapped qubits change distance
+            best_score, best = None, []
+            for p1, p2 in sorted(candidates):
+                score = (front_base + _swap_delta(front_phys, front_touch, p1, p2, dist)) / len(front_phys)
+                if ext_phys:
+                    score += self.extended_weight * \
+                        (ext_base + _swap_delta(ext_phys, ext_touch, p1, p2, dist)) / len(ext_phys)
+                score *= max(decay[p1], decay[p2])
+                if best_score is None or score < best_score - 1e-12:
+                    best_score, best = score, [(p1, p2)]
+                elif abs(score - best_score) <= 1e-12:
+                    best.append((p1, p2))
+            p1, p2 = rng.choice(best)
+            do_swap(p1, p2)
+            since_progress += 1
+            swaps_since_reset += 1
+            if swaps_since_reset >= self.decay_reset:
+                decay = [1.0] * self.num_physical
+                swaps_since_reset = 0
+            else:
+                decay[p1] += self.decay_delta
+                decay[p2] += self.decay_delta
+
+        return RoutingResult(ops, initial, l2p[:num_logical], swaps)
+
+    def _extended_set(self, front, successors, gates) -> List[Tuple[int, int]]:
+        """Next ``extended_size`` two-qubit gates reachable from the front layer"""
+        extended = []
+        seen = set(front)
+        queue = deque(s for i in front for s in successors[i])
+        while queue and len(extended) < self.extended_size:
+            i = queue.popleft()
+            if i in seen:
+                continue
+            seen.add(i)
+            if len(gates[i]) == 2:
+                extended.append(gates[i])
+            queue.extend(successors[i])
+        return extended
+
+    @staticmethod
+    def circuit_wires(circuit):
+        """(gates, wires, barriers, clbit_index) for ``route``: a gate's wires are its qubits,
+        its clbits and the clbits of its classical condition (offset past the qubits)"""
+        num_qubits = circuit.num_qubits
+        qubit_index = {q: i for i, q in enumerate(circuit.qubits)}
+        clbit_index = {c: num_qubits + i for i, c in enumerate(circuit.clbits)}
+        gates, wires, barriers = [], [], []
+        for instruction in circuit.data:
+            qubits = tuple(qubit_index[q] for q in instruction.qubits)
+            clbits = tuple(clbit_index[c] for c in instruction.clbits)
+            condition = getattr(instruction.operation, 'condition', None)
+            if condition:
+                # A c_if gate must stay after the measurements writing its condition bits
+                target = condition[0]
+                bits = target if hasattr(target, '__len__') else [target]
+                clbits += tuple(clbit_index[c] for c in bits if clbit_index[c] not in clbits)
+            if instruction.operation.name == 'barrier':
+                barriers.append(len(gates))
+            gates.append(qubits)
+            wires.append(qubits + clbits)
+        return gates, wires, barriers, clbit_index
+
+    def run(self, circuit, initial_layout: Optional[Sequence[int]] = None) -> RoutingResult:
+        """Route a QuantumCircuit onto the physical qubits of the coupling map"""
+        from qiskit import QuantumCircuit, QuantumRegister
+        num_qubits = circuit.num_qubits
+        gates, wires, barriers, clbit_index = self.circuit_wires(circuit)
+        result = self.route(gates, num_qubits, initial_layout, wires, barriers)
+
+        # Keep the classical registers so c_if conditions still resolve in the routed circuit
+        if circuit.cregs and sum(reg.size for reg in circuit.cregs) == circuit.num_clbits:
+            routed = QuantumCircuit(QuantumRegister(self.num_physical, 'q'), *circuit.cregs, name=circuit.name)
+        else:
+            routed = QuantumCircuit(self.num_physical, circuit.num_clbits, name=circuit.name)
+        data = circuit.data
+        for kind, index, physical in result.ops:
+            if kind == 'swap':
+                routed.swap(*physical)
+                continue
+            instruction = data[index]
+            routed.append(instruction.operation, [routed.qubits[p] for p in physical],
+                          [routed.clbits[clbit_index[c] - num_qubits] for c in instruction.clbits])
+        result.circuit = routed
+        return result
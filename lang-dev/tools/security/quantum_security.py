@@ -1,21 +1,117 @@
+import threading
+from collections import deque
 from qiskit import QuantumCircuit, Aer
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
+KEY_LENGTH = 32
+# HKDF 单次最多输出 255 个哈希块
+HKDF_MAX_KEYS = 255
+
 class QuantumKeyExchange:
-    def __init__(self, qubits=8):
+    def __init__(self, qubits=8, raw_bits=256):
         self.simulator = Aer.get_backend('aer_simulator')
         self.qubits = qubits
-        
+        # 每个原始密钥由 ceil(raw_bits / qubits) 次测量拼接而成
+        self.shots_per_key = -(-raw_bits // qubits)
+        self._circuit = None
+
+    def _key_circuit(self):
+        if self._circuit is None:
+            qc = QuantumCircuit(self.qubits)
+            qc.h(range(self.qubits))
+            qc.measure_all()
+            self._circuit = qc
+        return self._circuit
+
+    def raw_keys(self, count):
+        """一个模拟作业生成 count 个原始密钥(逐shot记录测量结果)"""
+        result = self.simulator.run(self._key_circuit(), shots=count * self.shots_per_key, memory=True).result()
+        memory = result.get_memory()
+        keys = []
+        for k in range(count):
+            bits = ''.join(memory[k * self.shots_per_key:(k + 1) * self.shots_per_key]).replace(' ', '')
+            keys.append(int(bits, 2).to_bytes(-(-len(bits) // 8), 'big'))
+        return keys
+
+    def derive_keys(self, raw_keys):
+        """批量HKDF: 每组最多255个原始密钥拼接后一次展开，按32字节切分"""
+        keys = []
+        for start in range(0, len(raw_keys), HKDF_MAX_KEYS):
+            group = raw_keys[start:start + HKDF_MAX_KEYS]
+            okm = HKDF(
+                algorithm=hashes.SHA3_256(),
+                length=KEY_LENGTH * len(group),
+                salt=None,
+                info=b'quantum-key'
+            ).derive(b''.join(group))
+            keys.extend(okm[i:i + KEY_LENGTH] for i in range(0, len(okm), KEY_LENGTH))
+        return keys
+
+    def generate_keys(self, count):
+        return self.derive_keys(self.raw_keys(count))
+
     def generate_key(self):
-        qc = QuantumCircuit(self.qubits)
-        qc.h(range(self.qubits))
-        qc.measure_all()
-        result = self.simulator.run(qc).result()
-        raw_key = ''.join(str(b) for b in result.get_counts().most_frequent())
-        return HKDF(
-            algorithm=hashes.SHA3_256(),
-            length=32,
-            salt=None,
-            info=b'quantum-key'
-        ).derive(raw_key.encode())
+        return self.generate_keys(1)[0]
+
+class KeyPool:
+    """预生成密钥池: 低于 low_water 时由后台线程补充到 capacity，取密钥为 O(1)"""
+
+    def __init__(self, exchange=None, capacity=1024, low_water=256, batch_size=HKDF_MAX_KEYS):
+        if not 0 <= low_water < capacity:
+            raise ValueError("low_water must be in [0, capacity)")
+        self.exchange = exchange or QuantumKeyExchange()
+        self.capacity = capacity
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self._keys = deque()
+        self._cond = threading.Condition()
+        self._refill = threading.Event()
+        self._stop = threading.Event()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name='key-pool-refill', daemon=True)
+        self._refill.set()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._refill.wait()
+            if self._stop.is_set():
+                break
+            self._refill.clear()
+            while not self._stop.is_set():
+                with self._cond:
+                    missing = self.capacity - len(self._keys)
+                if missing <= 0:
+                    break
+                try:
+                    keys = self.exchange.generate_keys(min(missing, self.batch_size))
+                except Exception as e:
+                    # 通知等待者，避免无限阻塞
+                    with self._cond:
+                        self.error = e
+                        self._cond.notify_all()
+                    break
+                with self._cond:
+                    self.error = None
+                    self._keys.extend(keys)
+                    self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """取出一个密钥；池空时等待补充，超时则同步生成"""
+        with self._cond:
+            if not self._keys:
+                self._refill.set()
+                self._cond.wait_for(lambda: self._keys or self.error is not None, timeout)
+            key = self._keys.popleft() if self._keys else None
+            if len(self._keys) < self.low_water:
+                self._refill.set()
+        return key if key is not None else self.exchange.generate_key()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        self._stop.set()
+        self._refill.set()
+        self._thread.join()